@@ -1,31 +1,73 @@
+import time
+_started = time.perf_counter()
+import os
+import tempfile
 import streamlit as st
 
+# Plotly, pandas and the report exporter are imported on first use, see
+# bench/startup_profile.py for the cold start budget
 from data_manager import DataManager
-from utils import export_utils
-from utils.ui_components import KPICards, ChartComponents, FilterPanel, Tables
+from utils import out_of_core
+from utils.ui_components import KPICards, ChartComponents, FilterPanel, ProfilePanel, Tables
 import utils.data_utils as data_utils
 
+PROFILE = data_utils.PROFILE
+PROFILE.start_run()
+# only the first run of a process actually imports anything
+PROFILE.record("imports", time.perf_counter() - _started)
+
 # Init Data
 @st.cache_resource
 def load_data():
-    return DataManager("data/kpi_dataset_small.json")
-    #return DataManager("data/kpi_dataset_large.json")
-data_manager = load_data()
+    # e.g. KPI_DATASET=data/kpi_dataset_large.json, a file from bench/generate_dataset.py
+    # or a directory of per-month files (bench/partition_dataset.py);
+    # KPI_VALIDATE=report keeps rows failing validation, off skips it;
+    # KPI_STREAMING=1 keeps the transactions on disk (see utils/out_of_core.py)
+    return DataManager(
+        os.environ.get("KPI_DATASET", "data/kpi_dataset_small.json"),
+        validate=os.environ.get("KPI_VALIDATE", "quarantine"),
+        streaming=out_of_core.ENABLED,
+    )
+with PROFILE.stage("load_data"):
+    data_manager = load_data()
+
+# New transaction/daily metric files dropped into KPI_INCOMING_DIR are appended
+# in place; cached results for date ranges before the new data stay valid
+if os.environ.get("KPI_INCOMING_DIR"):
+    with PROFILE.stage("ingest") as record:
+        changed = data_manager.ingest_dir(os.environ["KPI_INCOMING_DIR"])
+        if changed:
+            data_utils.RESULTS.carry_over(changed["previous_version"], changed["version"], changed["since"], changed["stale"])
+            record.update(rows=changed["transactions"], version=changed["version"])
+
+# Everything below reads this one snapshot, so another session's ingest in the
+# meantime cannot mix two versions of the data into one page
+snapshot = data_manager.snapshot
     
 kpi_ui = KPICards()
 chart_ui = ChartComponents()
 tables_ui = Tables()
-filter_panel = FilterPanel(data_manager)
+filter_panel = FilterPanel(snapshot)
 
 # --- FILTER PANEL ---
 filters = filter_panel.render()
 
 # --- DATA PROCESSING ---
-df = data_utils.process_and_filter(data_manager.transactions_df, filters)
-trend_label = data_utils.get_trend(df)
+# KPIs, summary and charts are answered from the pre-aggregated cube, and
+# cached per snapshot version and filters (see utils/result_cache.py)
+with PROFILE.stage("filter_cells") as record:
+    cells = data_utils.filter_cells(snapshot.cube, filters)
+    record["rows"] = cells.height
+with PROFILE.stage("summary", rows=cells.height):
+    # merged from the per-day partials in range rather than from every cell's customer set
+    summary = data_utils.summarize_partials(snapshot.partials, filters, snapshot.daily_metrics_df)
+    # the KPI cards' deltas: previous period of the same length and same dates last year
+    comparison = data_utils.compare_partials(snapshot.partials, filters, snapshot.daily_metrics_df)
+    enriched_metrics = data_utils.enrich_cells(cells, snapshot.daily_metrics_df)
 
-enriched_metrics = data_utils.get_enriched_metrics(df, data_manager.daily_metrics_df)
-summary, enriched_metric = data_utils.get_summary(df, data_manager.daily_metrics_df)
+# Raw rows are only needed for the transaction table, which pages through
+# this lazy query, and for the export, which collects it on demand
+transactions_query = data_utils.build_filter_query(snapshot.transactions_lf, filters, date_index=snapshot.date_index)
 
 # --- UI RENDERING ---
 st.set_page_config(layout="wide", page_title="Business Performance Dashboard")
@@ -33,32 +75,57 @@ col_title, col_export = st.columns([3, 1])
 
 with col_title:
     st.title("Business Performance Dashboard")
+    quarantined = sum(df.height for df in data_manager.quarantine.values())
+    if quarantined:
+        kept = "kept" if data_manager.validate == "report" else "left out"
+        st.caption(f"{quarantined:,} rows failed validation and were {kept} (see DataManager.validation)")
 
 with col_export:
     st.write("")
     if st.button("Export Report", use_container_width=True):
-        report_html = export_utils.generate_fully_interactive_report(
-            data_manager, 
-            df
-        )
-        st.download_button(
-            label="Download HTML Report",
-            data=report_html,
-            file_name="dashboard_report.html",
-            mime="text/html",
-            use_container_width=True
-        )
+        from utils import export_utils
+        # streamed to a temporary file from the filter query, so only the
+        # finished report is held in memory, for the download
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as report, PROFILE.stage("report_export") as record:
+            try:
+                export_utils.write_report(
+                    report, snapshot, transactions_query, rollup=True,
+                    assets=os.environ.get("KPI_REPORT_ASSETS", "cdn"), partial_plotly=True
+                )
+            except FileNotFoundError as e:
+                # KPI_REPORT_ASSETS=inline without the vendored files
+                st.error(f"Report export failed: {e}")
+            else:
+                report.flush()
+                record["bytes"] = report.tell()
+                report.buffer.seek(0)
+                st.download_button(
+                    label="Download HTML Report",
+                    data=report.buffer.read(),
+                    file_name="dashboard_report.html",
+                    mime="text/html",
+                    use_container_width=True
+                )
 st.markdown("---")
 
 # KPI Cards
-kpi_ui.display(summary, trend_label)
+kpi_ui.display(summary, comparison=comparison)
 
 # Graphs
-chart_ui.display_grid(df)
+chart_ui.display_grid(cells)
 st.markdown("---")
 
 # Tables
-tables_ui.render(df, summary, enriched_metrics)
+tables_ui.render(transactions_query, summary, enriched_metrics)
+
+# Result cache counters, for scraping by monitoring
+if os.environ.get("KPI_RESULT_CACHE_STATS_FILE"):
+    data_utils.RESULTS.write_stats(os.environ["KPI_RESULT_CACHE_STATS_FILE"])
+
+# Stage timings of this rerun (KPI_PROFILE=1, KPI_PROFILE_FILE=path for JSON lines)
+run = PROFILE.finish_run()
+if PROFILE.enabled:
+    ProfilePanel.render(PROFILE, run)
 
 # # Export Report
 # if st.sidebar.button("Export Full Local Report"):
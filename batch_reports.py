@@ -0,0 +1,127 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import re
+import time
+from data_manager import DataManager, LOADERS
+from utils import data_utils, export_utils
+from utils.downsampling import MAX_POINTS
+from utils.report_assets import ASSET_MODES
+from utils.report_payload import PAYLOAD_FORMATS
+
+# One HTML report per region x segment, rendered by a pool of worker processes.
+# The parent loads the dataset first, which writes the columnar cache; workers
+# then open the same memory-mapped cache files, so the data pages are shared
+# through the OS page cache instead of being parsed again per process.
+# Workers are spawned rather than forked: forking a process whose Polars
+# thread pool is running can deadlock.
+
+_dm = None
+
+
+def _init_worker(path, loader):
+    global _dm
+    _dm = DataManager(path, loader=loader)
+
+
+def _slug(value):
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+
+
+def build_jobs(dm, out_dir, start_date, end_date, options):
+    segments = getattr(dm.filters_config, "availableSegments", ["Enterprise", "SMB", "Individual"])
+    jobs = []
+    for region in dm.filters_config.availableRegions:
+        for segment in segments:
+            filters = {
+                "start_date": start_date,
+                "end_date": end_date,
+                "selected_regions": [region],
+                "selected_categories": dm.filters_config.availableCategories,
+                "selected_segment": segment,
+            }
+            path = os.path.join(out_dir, f"report_{_slug(region)}_{_slug(segment)}.html")
+            jobs.append((region, segment, path, filters, options))
+    return jobs
+
+
+def render(job):
+    region, segment, path, filters, options = job
+    started = time.perf_counter()
+    # collected directly: every job filters differently, so caching the frames
+    # would only keep each worker's past reports in memory
+    df = data_utils.build_filter_query(_dm.transactions_lf, filters, date_index=_dm.date_index).collect()
+    filtered = time.perf_counter()
+    export_utils.write_report(path, _dm, df, **options)
+    finished = time.perf_counter()
+    return {
+        "region": region,
+        "segment": segment,
+        "rows": df.height,
+        "filter_seconds": round(filtered - started, 3),
+        "render_seconds": round(finished - filtered, 3),
+        "bytes": os.path.getsize(path),
+        "path": path,
+        "pid": os.getpid(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write one HTML report per region x segment combination.")
+    parser.add_argument("path", nargs="?", default="data/kpi_dataset_large.json")
+    parser.add_argument("out_dir", nargs="?", default="reports")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="1 renders in this process")
+    parser.add_argument("--loader", choices=LOADERS, default="stream")
+    parser.add_argument("--start-date", type=datetime.date.fromisoformat, help="default: start of the dataset")
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat, help="default: end of the dataset")
+    parser.add_argument("--payload", choices=PAYLOAD_FORMATS, default="columnar")
+    parser.add_argument("--rollup", action="store_true")
+    parser.add_argument("--assets", choices=ASSET_MODES, default="cdn")
+    parser.add_argument("--partial-plotly", action="store_true")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dm = DataManager(args.path, loader=args.loader)
+    os.makedirs(args.out_dir, exist_ok=True)
+    options = {
+        "max_points": args.max_points,
+        "payload": args.payload,
+        "rollup": args.rollup,
+        "assets": args.assets,
+        "partial_plotly": args.partial_plotly,
+    }
+    jobs = build_jobs(
+        dm, args.out_dir,
+        args.start_date or datetime.date.fromisoformat(dm.metadata.dateRange.start),
+        args.end_date or datetime.date.fromisoformat(dm.metadata.dateRange.end),
+        options,
+    )
+
+    results = []
+    if args.workers <= 1:
+        _dm = dm
+        for job in jobs:
+            results.append(render(job))
+            print(json.dumps(results[-1]), flush=True)
+    else:
+        # split the cores between workers instead of every worker using all of them
+        os.environ.setdefault("POLARS_MAX_THREADS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(args.workers, initializer=_init_worker, initargs=(args.path, args.loader)) as pool:
+            for result in pool.imap_unordered(render, jobs):
+                results.append(result)
+                print(json.dumps(result), flush=True)
+
+    seconds = time.perf_counter() - started
+    print(json.dumps({
+        "reports": len(results),
+        "workers": max(args.workers, 1),
+        "load_seconds": dm.load_stats["load_seconds"],
+        "seconds": round(seconds, 3),
+        "reports_per_second": round(len(results) / seconds, 2),
+        "rows_per_second": round(sum(result["rows"] for result in results) / seconds),
+        "megabytes": round(sum(result["bytes"] for result in results) / 1e6, 2),
+    }))
@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Peak memory and timings of the in-memory and the out-of-core mode on the same
+# dataset, each in a fresh interpreter (peak RSS is per process): a parse
+# without the cache, a query over the whole date range through the
+# transactions scan (the table and export path) and the KPI summary.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_RUN = """
+import json, sys, time
+import polars as pl
+from data_manager import DataManager, _peak_rss_mb
+from utils import data_utils
+limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+dm = DataManager(sys.argv[1], cache=False, streaming=limit is not None, memory_limit_mb=limit)
+filters = {
+    "start_date": dm.cube["date"].min(), "end_date": dm.cube["date"].max(),
+    "selected_regions": dm.filters_config.availableRegions,
+    "selected_categories": dm.filters_config.availableCategories,
+    "selected_segment": "All",
+}
+started = time.perf_counter()
+query = data_utils.build_filter_query(dm.transactions_lf, filters, date_index=dm.date_index)
+rows, revenue = query.select(pl.len(), pl.col("amount").sum()).collect().row(0)
+query_seconds = time.perf_counter() - started
+started = time.perf_counter()
+summary = dm.partials.summary(filters, dm.daily_metrics_df)
+print(json.dumps({
+    "load_seconds": dm.load_stats["load_seconds"],
+    "query_seconds": round(query_seconds, 3),
+    "summary_seconds": round(time.perf_counter() - started, 3),
+    "rows": rows,
+    "customers": summary.totalCustomers,
+    "peak_rss_mb": round(_peak_rss_mb(), 1),
+    "out_of_core": dm.load_stats.get("out_of_core"),
+}))
+"""
+
+
+def run(path, memory_limit_mb=None):
+    args = [sys.executable, "-c", _RUN, path] + ([str(memory_limit_mb)] if memory_limit_mb else [])
+    result = subprocess.run(args, cwd=ROOT, capture_output=True, text=True, check=True, env={**os.environ, "PYTHONPATH": ROOT})
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare peak memory and timings of the in-memory and out-of-core modes.")
+    parser.add_argument("path", nargs="?", default="data/kpi_dataset_large.json")
+    parser.add_argument("--memory-limit-mb", type=int, nargs="+", default=[256, 64], help="out-of-core runs, one per limit")
+    args = parser.parse_args()
+
+    results = {"in_memory": run(args.path)}
+    for limit in args.memory_limit_mb:
+        results[f"out_of_core_{limit}mb"] = run(args.path, limit)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,25 @@
+import argparse
+import json
+from bench.bench_summary import best_of
+from data_manager import DataManager
+from utils import export_utils
+from utils.report_payload import PAYLOAD_FORMATS
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare HTML report generation time and size per payload format and for the rollup mode.")
+    parser.add_argument("path", nargs="?", default="data/kpi_dataset_large.json")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    dm = DataManager(args.path)
+    df = dm.transactions_df
+
+    variants = {payload: {"payload": payload} for payload in PAYLOAD_FORMATS}
+    variants["rollup"] = {"rollup": True}
+
+    results = {"rows": df.height}
+    for name, options in variants.items():
+        seconds = best_of(lambda: export_utils.generate_fully_interactive_report(dm, df, **options), args.repeat)
+        html = export_utils.generate_fully_interactive_report(dm, df, **options)
+        results[name] = {"seconds": round(seconds, 3), "megabytes": round(len(html.encode()) / 1e6, 2)}
+    print(json.dumps(results))
@@ -0,0 +1,133 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import tempfile
+import time
+from bench.bench_summary import best_of
+from bench.generate_dataset import DatasetGenerator
+from data_manager import DataManager, LOADERS, _peak_rss_mb
+from utils import cube, export_utils
+from utils.ui_components import ChartComponents
+import utils.data_utils as data_utils
+
+# End-to-end timings of the dashboard pipeline on one dataset: load (parse and
+# cached), filtering, the KPI functions, chart figures and the HTML export.
+# Each stage records its best-of time and the process peak RSS after it ran.
+# Result-cached functions get the cache cleared before every call, so the
+# numbers are the computation rather than a lookup.
+FIELDS = ["stage", "scenario", "rows", "seconds", "peak_rss_mb"]
+
+
+def scenarios(dm):
+    start = datetime.date.fromisoformat(dm.metadata.dateRange.start)
+    end = datetime.date.fromisoformat(dm.metadata.dateRange.end)
+    everything = {
+        "start_date": start,
+        "end_date": end,
+        "selected_regions": dm.filters_config.availableRegions,
+        "selected_categories": dm.filters_config.availableCategories,
+        "selected_segment": "All",
+    }
+    return {
+        "all": everything,
+        "one_region": {**everything, "selected_regions": dm.filters_config.availableRegions[:1]},
+        "last_30_days": {
+            **everything,
+            "start_date": max(start, end - datetime.timedelta(days=29)),
+            "selected_segment": getattr(dm.filters_config, "availableSegments", ["Enterprise"])[0],
+        },
+    }
+
+
+def uncached(func, *args, **kwargs):
+    def call():
+        data_utils.RESULTS.clear()
+        return func(*args, **kwargs)
+    return call
+
+
+def _report(dm, df, **options):
+    with tempfile.TemporaryFile("w", encoding="utf-8") as f:
+        export_utils.write_report(f, dm, df, **options)
+
+
+class Suite:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def time(self, stage, scenario, rows, func, repeat=None):
+        seconds = best_of(func, repeat or self.repeat)
+        result = {
+            "stage": stage,
+            "scenario": scenario,
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        }
+        self.results.append(result)
+        print(json.dumps(result), flush=True)
+
+    def run(self, path, loader):
+        # writes the columnar cache; "parse" ignores it, "cache" opens it
+        dm = DataManager(path, loader=loader)
+        total = dm.transactions_df.height
+        self.time("load", "parse", total, lambda: DataManager(path, loader=loader, cache=False), repeat=1)
+        self.time("load", "cache", total, lambda: DataManager(path, loader=loader))
+        charts = ChartComponents(engine="express")
+        plain_charts = ChartComponents(engine="graph_objects")
+
+        for scenario, filters in scenarios(dm).items():
+            df = data_utils.process_and_filter(dm.transactions_lf, filters, date_index=dm.date_index)
+            rows = df.height
+            self.time("process_and_filter", scenario, rows, uncached(
+                data_utils.process_and_filter, dm.transactions_lf, filters, date_index=dm.date_index
+            ))
+
+            self.time("get_trend", scenario, rows, uncached(data_utils.get_trend, df))
+            self.time("get_enriched_metrics", scenario, rows, uncached(data_utils.get_enriched_metrics, df, dm.daily_metrics_df))
+            cells = cube.filter_cells(dm.cube, filters)
+            self.time("filter_cells", scenario, rows, lambda: cube.filter_cells(dm.cube, filters))
+            self.time("partials_summary", scenario, rows, lambda: dm.partials.summary(filters, dm.daily_metrics_df))
+            self.time("partials_compare", scenario, rows, lambda: dm.partials.compare(filters, dm.daily_metrics_df))
+
+            parts = charts.aggregate(cells)
+            self.time("chart_aggregate", scenario, rows, lambda: charts.aggregate(cells))
+            self.time("line_chart", scenario, rows, lambda: charts.line_figure(parts["trend"], "Revenue Trend", charts.max_points))
+            self.time("pie_chart", scenario, rows, lambda: charts.pie_figure(parts["category"], "Category Share"))
+            self.time("bar_chart", scenario, rows, lambda: charts.bar_figure(parts["region"], "Regional Performance"))
+            self.time("chart_grid", scenario, rows, lambda: charts.build_figures(cells))
+            self.time("chart_grid_graph_objects", scenario, rows, lambda: plain_charts.build_figures(cells))
+
+            query = data_utils.build_filter_query(dm.transactions_lf, filters, date_index=dm.date_index)
+            self.time("report", scenario, rows, lambda: _report(dm, query))
+            self.time("report_rollup", scenario, rows, lambda: _report(dm, query, rollup=True))
+        return self.results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every stage of the dashboard pipeline on one dataset.")
+    parser.add_argument("path", nargs="?", default="data/kpi_dataset_large.json")
+    parser.add_argument("--transactions", type=int, help="generate the dataset at path with this many transactions if it does not exist")
+    parser.add_argument("--loader", choices=LOADERS, default="stream")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--csv", help="also write the results to this CSV file")
+    args = parser.parse_args()
+
+    if args.transactions and not os.path.exists(args.path):
+        started = time.perf_counter()
+        DatasetGenerator(transactions=args.transactions).write(args.path)
+        print(json.dumps({"generated": args.path, "transactions": args.transactions, "seconds": round(time.perf_counter() - started, 3)}), flush=True)
+
+    results = Suite(args.repeat).run(args.path, args.loader)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
@@ -0,0 +1,85 @@
+import argparse
+import datetime
+import json
+import time
+import polars as pl
+from data_manager import DataManager
+from models import Summary
+from utils.summary_partials import SummaryPartials
+
+# Multi-pass implementation get_summary + get_enriched_metrics used before the summary partials
+def legacy_summary(df, daily_metrics_df):
+    completed_df = df.filter(pl.col("status").cast(pl.String).str.to_lowercase() == "completed")
+    refunds_df = df.filter(pl.col("status").cast(pl.String).str.to_lowercase() == "refunded")
+
+    completed_revenue = completed_df["amount"].sum() if not completed_df.is_empty() else 0
+    refund_revenue = refunds_df["amount"].sum() if not refunds_df.is_empty() else 0
+    avg_order_val = completed_df["amount"].mean() if not completed_df.is_empty() else 0
+
+    calc_refund_rate = (refund_revenue / (completed_revenue) * 100) if (completed_revenue) > 0 else 0
+
+    summary = Summary(
+        totalRevenue=completed_revenue,
+        averageOrderValue=avg_order_val,
+        conversionRate=daily_metrics_df["conversionRate"].mean() if not daily_metrics_df.is_empty() else 0,
+        totalCustomers=df["customer_id"].n_unique() if "customer_id" in df.columns else 0,
+        refundRate=calc_refund_rate,
+        topRegion=completed_df.group_by("region").agg(pl.col("amount").sum()).sort("amount", descending=True).head(1)["region"][0] if not completed_df.is_empty() else "N/A",
+        topCategory=completed_df.group_by("category").agg(pl.col("amount").sum()).sort("amount", descending=True).head(1)["category"][0] if not completed_df.is_empty() else "N/A"
+    )
+
+    daily_stats = completed_df.group_by("date").agg([
+        pl.col("amount").sum().alias("revenue_filtered"),
+        pl.col("amount").len().alias("orders_filtered")
+    ])
+    summary_metrics = daily_stats.join(daily_metrics_df, on="date", how="inner").sort("date")
+
+    daily_stats = df.group_by("date").agg([
+        pl.col("amount").sum().alias("revenue_filtered"),
+        pl.col("amount").len().alias("orders_filtered")
+    ])
+    enriched_metrics = daily_stats.join(daily_metrics_df, on="date", how="inner").sort("date")
+    return summary, summary_metrics, enriched_metrics
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the dashboard's summary partials with the multi-pass summary over the rows.")
+    parser.add_argument("path", nargs="?", default="data/kpi_dataset_large.json")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dm = DataManager(args.path)
+    df = dm.transactions_df
+    daily = dm.daily_metrics_df
+    # the whole dataset, as the dashboard's "All Time" with every option selected
+    filters = {
+        "start_date": datetime.date.fromisoformat(dm.metadata.dateRange.start),
+        "end_date": datetime.date.fromisoformat(dm.metadata.dateRange.end),
+        "selected_regions": dm.filters_config.availableRegions,
+        "selected_categories": dm.filters_config.availableCategories,
+        "selected_segment": "All",
+    }
+
+    legacy = best_of(lambda: legacy_summary(df, daily), args.repeat)
+    # built once at load (and merged on append); each rerun only merges the partitions in range
+    build = best_of(lambda: SummaryPartials.build(df), args.repeat)
+    partials = best_of(lambda: dm.partials.summary(filters, daily), args.repeat)
+    expected, summary = legacy_summary(df, daily)[0], dm.partials.summary(filters, daily)
+    print(json.dumps({
+        "rows": df.height,
+        "legacy_seconds": round(legacy, 4),
+        "partials_build_seconds": round(build, 4),
+        "partials_seconds": round(partials, 4),
+        "speedup": round(legacy / partials, 2),
+        "customers_match": expected.totalCustomers == summary.totalCustomers,
+        "revenue_match": abs(expected.totalRevenue - summary.totalRevenue) <= 1e-6 * max(abs(expected.totalRevenue), 1),
+    }))
@@ -0,0 +1,62 @@
+import argparse
+import json
+import numpy as np
+import polars as pl
+from bench.bench_summary import best_of
+from bench.generate_dataset import DatasetGenerator
+from data_manager import TRANSACTION_SCHEMA, _cast_frame, _peak_rss_mb
+from models import Filters
+from utils import validation
+
+# Throughput of the validation stage on generated transactions in the loader's
+# raw layout, with a share of the rows broken in one of several ways (mistyped
+# amount, bad date or timestamp, unknown region, missing customer).
+BREAKS = {
+    "amount": pl.lit(None, dtype=pl.Float64),
+    "date": pl.lit(None, dtype=pl.Date),
+    "timestamp": pl.lit("yesterday"),
+    "region": pl.lit("Atlantis").cast(pl.Categorical),
+    "customer": pl.lit(None, dtype=TRANSACTION_SCHEMA["customer"]),
+}
+
+
+def raw_transactions(generator):
+    batches = []
+    for first in range(0, generator.transactions, generator.batch_size):
+        size = min(generator.batch_size, generator.transactions - first)
+        batches.append(_cast_frame(generator._batch(first, size), TRANSACTION_SCHEMA))
+    return pl.concat(batches, rechunk=True)
+
+
+def break_rows(df, rate, seed=0):
+    # every broken row gets one of the BREAKS, round robin
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(df.height, int(df.height * rate), replace=False))
+    which = pl.Series(np.full(df.height, -1, dtype=np.int8)).scatter(rows, np.arange(len(rows)) % len(BREAKS))
+    return df.with_columns(
+        pl.when(which == position).then(value).otherwise(pl.col(name)).alias(name)
+        for position, (name, value) in enumerate(BREAKS.items())
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure validation throughput on generated transactions with injected errors.")
+    parser.add_argument("--transactions", type=int, default=2_000_000)
+    parser.add_argument("--error-rate", type=float, default=0.001, help="share of rows broken")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    generator = DatasetGenerator(transactions=args.transactions)
+    df = break_rows(raw_transactions(generator), args.error_rate)
+    filters = Filters(generator.categories, generator.regions, generator.segments)
+
+    seconds = best_of(lambda: validation.validate(df, filters), args.repeat)
+    _, quarantine, report = validation.validate(df, filters)
+    print(json.dumps({
+        "rows": df.height,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(df.height / seconds),
+        "quarantined": report["quarantined"],
+        "errors": report["errors"],
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }, indent=2))
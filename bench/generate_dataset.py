@@ -0,0 +1,200 @@
+import argparse
+import datetime
+import json
+import numpy as np
+import polars as pl
+
+# Synthetic KPI dataset in the layout of models.DashboardData. Transactions
+# are generated and written in batches, so the size of the output (tens of
+# millions of rows) is bounded by disk, not memory. The summary and daily
+# metrics blocks are computed from the generated transactions.
+REGIONS = ["North America", "Europe", "Asia Pacific", "Latin America", "Middle East", "Africa", "Oceania", "Central Asia"]
+CATEGORIES = ["Electronics", "Clothing", "Home & Garden", "Sports", "Books", "Toys", "Beauty", "Automotive", "Grocery", "Office"]
+SEGMENTS = ["Enterprise", "SMB", "Individual", "Government", "Education"]
+PAYMENT_METHODS = ["Credit Card", "PayPal", "Bank Transfer", "Apple Pay", "Google Pay"]
+STATUSES = ["completed", "pending", "refunded", "failed"]
+STATUS_WEIGHTS = [0.85, 0.07, 0.05, 0.03]
+
+
+def _names(base, count):
+    # the built-in names first, numbered ones when more are asked for
+    return base[:count] + [f"{base[0]} {i}" for i in range(len(base), count)]
+
+
+class DatasetGenerator:
+    def __init__(self, transactions=10_000, days=365, start="2024-01-01", regions=4, categories=5,
+                 segments=3, products=50, customers=None, seed=42, batch_size=200_000):
+        self.transactions = transactions
+        self.days = days
+        self.start = datetime.date.fromisoformat(start)
+        self.regions = _names(REGIONS, regions)
+        self.categories = _names(CATEGORIES, categories)
+        self.segments = _names(SEGMENTS, segments)
+        self.products = products
+        self.customers = customers or max(transactions // 5, 1)
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+
+        # customer attributes are fixed per customer id
+        self.customer_segment = self.rng.integers(0, len(self.segments), self.customers)
+        self.customer_value = np.round(self.rng.gamma(2.0, 1500.0, self.customers), 2)
+        self.product_category = self.rng.integers(0, len(self.categories), products)
+        self.product_price = np.round(self.rng.uniform(5, 500, products), 2)
+
+        # running totals for the summary and daily metrics blocks
+        self.daily_revenue = np.zeros(days)
+        self.daily_orders = np.zeros(days, dtype=np.int64)
+        self.revenue_by_region = np.zeros(len(self.regions))
+        self.revenue_by_category = np.zeros(len(self.categories))
+        self.refund_revenue = 0.0
+        self.completed_orders = 0
+        # each customer's earliest transaction day (days: none yet), for newUsers
+        self.first_day = np.full(self.customers, days, dtype=np.int64)
+
+    def _batch(self, first, size):
+        rng = self.rng
+        day = rng.integers(0, self.days, size)
+        seconds = rng.integers(0, 86_400, size)
+        product = rng.integers(0, self.products, size)
+        customer = rng.integers(0, self.customers, size)
+        region = rng.integers(0, len(self.regions), size)
+        status = rng.choice(len(STATUSES), size, p=STATUS_WEIGHTS)
+        amount = np.round(self.product_price[product] * rng.integers(1, 5, size) * rng.uniform(0.8, 1.2, size), 2)
+        category = self.product_category[product]
+
+        completed = status == 0
+        np.add.at(self.daily_revenue, day[completed], amount[completed])
+        self.daily_orders += np.bincount(day, minlength=self.days)
+        # days are random within a batch and across batches, so keep the minimum
+        np.minimum.at(self.first_day, customer, day)
+        self.completed_orders += int(completed.sum())
+        self.revenue_by_region += np.bincount(region[completed], weights=amount[completed], minlength=len(self.regions))
+        self.revenue_by_category += np.bincount(category[completed], weights=amount[completed], minlength=len(self.categories))
+        self.refund_revenue += amount[status == STATUSES.index("refunded")].sum()
+
+        return pl.DataFrame({
+            "id": pl.int_range(first, first + size, eager=True),
+            "date": day,
+            "seconds": seconds,
+            "amount": amount,
+            "product": product,
+            "category": category,
+            "region": region,
+            "customer": customer,
+            "paymentMethod": rng.integers(0, len(PAYMENT_METHODS), size),
+            "status": status,
+        }).select(
+            pl.format("TXN-{}", pl.col("id").cast(pl.String).str.zfill(10)).alias("id"),
+            (pl.lit(self.start) + pl.duration(days=pl.col("date"))).dt.strftime("%Y-%m-%d").alias("date"),
+            (pl.lit(datetime.datetime.combine(self.start, datetime.time())) + pl.duration(days=pl.col("date"), seconds=pl.col("seconds")))
+            .dt.strftime("%Y-%m-%dT%H:%M:%SZ").alias("timestamp"),
+            "amount",
+            pl.format("Product {}", pl.col("product")).alias("product"),
+            pl.format("PRD-{}", pl.col("product").cast(pl.String).str.zfill(5)).alias("productId"),
+            pl.col("category").replace_strict(range(len(self.categories)), self.categories, return_dtype=pl.String),
+            pl.col("region").replace_strict(range(len(self.regions)), self.regions, return_dtype=pl.String),
+            pl.struct(
+                pl.format("CUST-{}", pl.col("customer").cast(pl.String).str.zfill(8)).alias("id"),
+                pl.Series(self.customer_segment[customer]).replace_strict(range(len(self.segments)), self.segments, return_dtype=pl.String).alias("segment"),
+                pl.Series(self.customer_value[customer]).alias("lifetimeValue"),
+            ).alias("customer"),
+            pl.col("paymentMethod").replace_strict(range(len(PAYMENT_METHODS)), PAYMENT_METHODS, return_dtype=pl.String),
+            pl.col("status").replace_strict(range(len(STATUSES)), STATUSES, return_dtype=pl.String),
+        )
+
+    def _daily_metrics(self):
+        rng = self.rng
+        active = np.maximum(self.daily_orders * rng.uniform(8, 15, self.days), 1).astype(np.int64)
+        # a customer is a new user on the day of their earliest transaction
+        new_users = np.bincount(self.first_day[self.first_day < self.days], minlength=self.days)
+        return [
+            {
+                "date": (self.start + datetime.timedelta(days=day)).isoformat(),
+                "revenue": round(float(self.daily_revenue[day]), 2),
+                "orders": int(self.daily_orders[day]),
+                "activeUsers": int(active[day]),
+                "newUsers": int(new_users[day]),
+                "conversionRate": round(float(self.daily_orders[day] / active[day]), 4),
+                "averageOrderValue": round(float(self.daily_revenue[day] / self.daily_orders[day]), 2) if self.daily_orders[day] else 0.0,
+                "churnRate": round(float(rng.uniform(0.01, 0.05)), 4),
+            }
+            for day in range(self.days)
+        ]
+
+    def _summary(self, daily_metrics):
+        revenue = float(self.revenue_by_region.sum())
+        completed_orders = self.completed_orders
+        # the dashboard's Summary averages the daily conversion rates
+        rates = [day["conversionRate"] for day in daily_metrics]
+        return {
+            "totalRevenue": round(revenue, 2),
+            "averageOrderValue": round(revenue / completed_orders, 2) if completed_orders else 0.0,
+            "conversionRate": round(sum(rates) / len(rates), 4) if rates else 0.0,
+            "totalCustomers": int((self.first_day < self.days).sum()),
+            "refundRate": round(self.refund_revenue / revenue * 100, 2) if revenue else 0.0,
+            "topRegion": self.regions[int(self.revenue_by_region.argmax())],
+            "topCategory": self.categories[int(self.revenue_by_category.argmax())],
+        }
+
+    def write(self, path):
+        end = self.start + datetime.timedelta(days=self.days - 1)
+        with open(path, "w") as f:
+            f.write("{")
+            f.write('"metadata": ' + json.dumps({
+                "generatedAt": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "transactionCount": self.transactions,
+                "daysOfData": self.days,
+                "dateRange": {"start": self.start.isoformat(), "end": end.isoformat()},
+            }))
+
+            f.write(', "transactions": [')
+            for first in range(0, self.transactions, self.batch_size):
+                size = min(self.batch_size, self.transactions - first)
+                if first:
+                    f.write(",")
+                f.write(self._batch(first, size).write_json()[1:-1])
+            f.write("]")
+
+            daily_metrics = self._daily_metrics()
+            f.write(', "dailyMetrics": ' + json.dumps(daily_metrics))
+            f.write(', "products": ' + json.dumps([
+                {
+                    "id": f"PRD-{product:05d}",
+                    "name": f"Product {product}",
+                    "category": self.categories[self.product_category[product]],
+                    "price_range": [round(float(self.product_price[product]) * 0.8, 2), round(float(self.product_price[product]) * 1.2, 2)],
+                }
+                for product in range(self.products)
+            ]))
+            # written last: it is computed from the generated transactions
+            f.write(', "summary": ' + json.dumps(self._summary(daily_metrics)))
+            f.write(', "regions": ' + json.dumps(self.regions))
+            f.write(', "customerSegments": ' + json.dumps(self.segments))
+            f.write(', "filters": ' + json.dumps({
+                "availableCategories": self.categories,
+                "availableRegions": self.regions,
+                "availableSegments": self.segments,
+            }))
+            f.write("}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic KPI dataset (models.DashboardData layout).")
+    parser.add_argument("output")
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--start", default="2024-01-01")
+    parser.add_argument("--regions", type=int, default=4)
+    parser.add_argument("--categories", type=int, default=5)
+    parser.add_argument("--segments", type=int, default=3)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--customers", type=int, help="default: transactions / 5")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=200_000)
+    args = parser.parse_args()
+
+    DatasetGenerator(
+        transactions=args.transactions, days=args.days, start=args.start, regions=args.regions,
+        categories=args.categories, segments=args.segments, products=args.products,
+        customers=args.customers, seed=args.seed, batch_size=args.batch_size,
+    ).write(args.output)
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import polars as pl
+from data_manager import _STREAMED_ARRAYS, _frame_from_batches, _typed_frame
+from utils.json_stream import iter_top_level
+
+# Splits a single-file dataset into the per-month files DataManager reads as a
+# dataset directory: one JSON document per month ("json"), or one Parquet file
+# of transactions per month plus dataset.json with the other blocks ("parquet").
+
+
+def read_dataset(path):
+    frames, blocks = {}, {}
+    with open(path, "r") as f:
+        for key, value in iter_top_level(f, _STREAMED_ARRAYS):
+            if key in _STREAMED_ARRAYS and not isinstance(value, list):
+                frames[key] = _frame_from_batches(value, _STREAMED_ARRAYS[key])
+            else:
+                blocks[key] = value
+    for key, schema in _STREAMED_ARRAYS.items():
+        frames.setdefault(key, _typed_frame([], schema))
+    return frames, blocks
+
+
+def _document(blocks, transactions, daily_metrics, products):
+    # the single-file layout; dates back to ISO text
+    text = lambda df: df.with_columns(pl.col("date").dt.strftime("%Y-%m-%d")).write_json() if "date" in df.columns else df.write_json()
+    start, end = transactions["date"].min(), transactions["date"].max()
+    metadata = {
+        **blocks.get("metadata", {}),
+        "transactionCount": transactions.height,
+        "daysOfData": (end - start).days + 1 if start else 0,
+        "dateRange": {"start": start.isoformat() if start else "", "end": end.isoformat() if end else ""},
+    }
+    other = {key: value for key, value in blocks.items() if key != "metadata"}
+    return (
+        f'{{"metadata": {json.dumps(metadata)}, "transactions": {text(transactions)}, '
+        f'"dailyMetrics": {text(daily_metrics)}, "products": {products.write_json()}, '
+        + json.dumps(other)[1:]
+    )
+
+
+def partition(path, out_dir, fmt="json"):
+    frames, blocks = read_dataset(path)
+    os.makedirs(out_dir, exist_ok=True)
+    month = pl.col("date").dt.strftime("%Y-%m")
+    transactions = frames["transactions"].with_columns(month.alias("month"))
+    daily_metrics = frames["dailyMetrics"].with_columns(month.alias("month"))
+    written = []
+    for (key,), rows in transactions.partition_by("month", as_dict=True, maintain_order=True).items():
+        rows = rows.drop("month").sort("date", maintain_order=True)
+        if fmt == "parquet":
+            target = os.path.join(out_dir, f"transactions-{key}.parquet")
+            rows.write_parquet(target)
+        else:
+            target = os.path.join(out_dir, f"{key}.json")
+            days = daily_metrics.filter(pl.col("month") == key).drop("month")
+            with open(target, "w") as f:
+                f.write(_document(blocks, rows, days, frames["products"]))
+        written.append(target)
+    if fmt == "parquet":
+        # filters, products and daily metrics of all months, without transactions
+        target = os.path.join(out_dir, "dataset.json")
+        with open(target, "w") as f:
+            f.write(_document(blocks, transactions.clear().drop("month"), daily_metrics.drop("month"), frames["products"]))
+        written.append(target)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split a KPI dataset into per-month files for a dataset directory.")
+    parser.add_argument("path")
+    parser.add_argument("out_dir")
+    parser.add_argument("--format", choices=("json", "parquet"), default="json")
+    args = parser.parse_args()
+    print(json.dumps({"files": len(partition(args.path, args.out_dir, args.format))}))
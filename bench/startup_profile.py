@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Cold start of a dashboard worker, each part measured in a fresh interpreter:
+# the import time of the app's modules (python -X importtime) and the first
+# render of app.py through Streamlit's AppTest, i.e. one full script run with
+# the charts built and the tables sent. The total is checked against a
+# budget so a slow new import shows up as a failure rather than as slower
+# autoscaling. Deferred modules the first render loads anyway are timed on
+# their own: deferring them only moves that cost from the import to the render.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_SECONDS = float(os.environ.get("KPI_STARTUP_BUDGET_SECONDS", 5.0))
+APP_IMPORTS = "import streamlit, data_manager, utils.cube, utils.data_utils, utils.ui_components"
+# imported on first use only; reported so a regression that imports them eagerly is visible
+DEFERRED = ["plotly.express", "pandas", "utils.export_utils"]
+
+_FIRST_RENDER = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=600)
+app.run()
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "exceptions": [str(e.value) for e in app.exception],
+    "loaded": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+_DEFERRED_IMPORTS = f"""
+import importlib, json, sys, time
+{APP_IMPORTS}
+started = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(json.dumps(time.perf_counter() - started))
+"""
+
+
+def import_times(top=5):
+    # (module, cumulative seconds) of the top-level imports, slowest first
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", APP_IMPORTS],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # nested imports are indented under the module that triggered them
+        if not name.startswith("  "):
+            modules.append((name.strip(), int(cumulative) / 1e6))
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return sum(seconds for _, seconds in modules), modules[:top]
+
+
+def deferred_import_seconds(modules):
+    # import time of the deferred modules on top of the app's own imports
+    if not modules:
+        return 0.0
+    result = subprocess.run(
+        [sys.executable, "-c", _DEFERRED_IMPORTS, *modules],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def first_render():
+    result = subprocess.run(
+        [sys.executable, "-c", _FIRST_RENDER, os.path.join(ROOT, "app.py"), *DEFERRED],
+        cwd=ROOT, capture_output=True, text=True, check=True, env={**os.environ, "PYTHONPATH": ROOT},
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the dashboard's cold start against a time budget.")
+    parser.add_argument("--dataset", help="dataset for the first render (sets KPI_DATASET)")
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="seconds for imports + first render")
+    parser.add_argument("--top", type=int, default=5, help="slowest top-level imports to list")
+    args = parser.parse_args()
+    if args.dataset:
+        os.environ["KPI_DATASET"] = os.path.abspath(args.dataset)
+
+    import_seconds, slowest = import_times(args.top)
+    render = first_render()
+    # the first render includes the imports again, in its own interpreter
+    total = render["seconds"]
+    print(json.dumps({
+        "import_seconds": round(import_seconds, 3),
+        "slowest_imports": [{"module": name, "seconds": round(seconds, 3)} for name, seconds in slowest],
+        "first_render_seconds": round(total, 3),
+        "loaded_on_first_render": render["loaded"],
+        # part of first_render_seconds: what the deferral saved at import, paid at the first render
+        "deferred_import_seconds": round(deferred_import_seconds(render["loaded"]), 3),
+        "exceptions": render["exceptions"],
+        "budget_seconds": args.budget,
+        "within_budget": total <= args.budget and not render["exceptions"],
+    }, indent=2))
+    sys.exit(0 if total <= args.budget and not render["exceptions"] else 1)
@@ -1,26 +1,717 @@
+import dataclasses
+import datetime
 import json
+import os
+import shutil
+import sys
+import threading
+import time
+import warnings
+import weakref
+import zlib
 import polars as pl
 from dacite import from_dict
 from models import DashboardData, Transaction, Customer, DailyMetric, Product, Filters, Metadata, DateRange, Summary
+from utils import columnar_cache, out_of_core, validation
+from utils.cube import build_cube, merge_cells
+from utils.date_index import DateIndex
+from utils.partitions import PARTITION_SUFFIXES, Partition, PartitionCatalog
+from utils.json_stream import iter_top_level
+from utils.summary_partials import PARTITION_KEYS, SKETCH_BUDGET, SummaryPartials
+from utils.result_cache import tag
+
+# Explicit column types for the streaming loader (dates are read as text and parsed per batch)
+TRANSACTION_SCHEMA = {
+    "id": pl.String,
+    "date": pl.String,
+    "timestamp": pl.String,
+    "amount": pl.Float64,
+    "product": pl.String,
+    "productId": pl.String,
+    "category": pl.Categorical,
+    "region": pl.Categorical,
+    "customer": pl.Struct({"id": pl.String, "segment": pl.String, "lifetimeValue": pl.Float64}),
+    "paymentMethod": pl.String,
+    "status": pl.Categorical,
+}
+DAILY_METRIC_SCHEMA = {
+    "date": pl.String,
+    "revenue": pl.Float64,
+    "orders": pl.Int64,
+    "activeUsers": pl.Int64,
+    "newUsers": pl.Int64,
+    "conversionRate": pl.Float64,
+    "averageOrderValue": pl.Float64,
+    "churnRate": pl.Float64,
+}
+PRODUCT_SCHEMA = {
+    "id": pl.String,
+    "name": pl.String,
+    "category": pl.String,
+    "price_range": pl.List(pl.Float64),
+}
+_STREAMED_ARRAYS = {
+    "transactions": TRANSACTION_SCHEMA,
+    "dailyMetrics": DAILY_METRIC_SCHEMA,
+    "products": PRODUCT_SCHEMA,
+}
+
+LOADERS = ("stream", "json")
+# files picked up by DataManager.ingest_dir: <kind>*.jsonl|.ndjson|.parquet
+INGEST_KINDS = {"transactions": TRANSACTION_SCHEMA, "dailyMetrics": DAILY_METRIC_SCHEMA}
+INGEST_SUFFIXES = (".jsonl", ".ndjson", ".parquet")
+
+# Column layout after normalization: the nested customer struct is flattened
+TRANSACTION_COLUMNS = [
+    "id", "date", "timestamp", "amount", "product", "productId", "category", "region",
+    "customer_id", "segment", "customer_lifetime_value", "paymentMethod", "status",
+]
+# low-cardinality text columns without a configured value list
+_CATEGORICAL_COLUMNS = ["product", "productId", "customer_id", "paymentMethod", "status"]
+# dimension columns and the Filters attribute listing their values
+_DIMENSIONS = {"region": "availableRegions", "category": "availableCategories", "segment": "availableSegments"}
+_DAILY_COUNT_COLUMNS = ["orders", "activeUsers", "newUsers"]
+# raw frames checked against their dataclass before normalization
+VALIDATED = {"transactions": (Transaction, "id"), "dailyMetrics": (DailyMetric, "date")}
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        # Unix only; reported as 0 elsewhere
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _lenient_series(name, values, dtype):
+    # values that do not fit dtype become null (and are flagged by validation)
+    if isinstance(dtype, pl.Struct):
+        fields = [
+            _lenient_series(field.name, [value.get(field.name) if isinstance(value, dict) else None for value in values], field.dtype)
+            for field in dtype.fields
+        ]
+        present = pl.Series([isinstance(value, dict) for value in values], dtype=pl.Boolean)
+        return pl.DataFrame(fields).select(pl.when(present).then(pl.struct(pl.all())).alias(name)).to_series()
+    return pl.Series(name, values, dtype=dtype, strict=False)
+
+
+def _typed_frame(rows, schema):
+    try:
+        df = pl.DataFrame(rows, schema=schema)
+    except (pl.exceptions.ComputeError, TypeError, ValueError):
+        # a batch with mistyped values is built column by column instead
+        df = pl.DataFrame([
+            _lenient_series(name, [row.get(name) if isinstance(row, dict) else None for row in rows], dtype)
+            for name, dtype in schema.items()
+        ])
+    if "date" in schema:
+        df = df.with_columns(pl.col("date").str.to_date("%Y-%m-%d", strict=False))
+    return df
+
+
+def _frame_from_batches(batches, schema):
+    frames = [_typed_frame(batch, schema) for batch in batches]
+    if not frames:
+        return _typed_frame([], schema)
+    return pl.concat(frames, rechunk=True)
+
+
+def _cast_frame(df, schema):
+    # the schema's columns in order; values that do not fit become null
+    return df.select(pl.col(name).cast(dtype, strict=False) for name, dtype in schema.items()).with_columns(
+        pl.col("date").str.to_date("%Y-%m-%d", strict=False)
+    )
+
+
+def _read_batch(path, schema):
+    # one appended batch in the layout of the JSON arrays (nested customer, ISO dates)
+    if path.endswith(".parquet"):
+        df = pl.read_parquet(path)
+        if df.schema.get("date") == pl.Date:
+            df = df.with_columns(pl.col("date").dt.strftime("%Y-%m-%d"))
+    else:
+        df = pl.read_ndjson(path, schema=schema)
+    return _cast_frame(df, schema)
+
+
+def _widen_enum(dtype, values):
+    new = [value for value in values.drop_nulls().unique().sort().to_list() if value not in dtype.categories]
+    return pl.Enum(dtype.categories.to_list() + new) if new else dtype
+
+
+def _enum_for(configured, column):
+    # configured values keep their order; values the config does not list are
+    # appended so the cast never fails on unexpected data
+    extra = column.drop_nulls().unique().sort().to_list()
+    return pl.Enum(list(configured) + [value for value in extra if value not in configured])
+
+
+def _filters_config(blocks):
+    return from_dict(data_class=Filters, data=blocks['filters']) if 'filters' in blocks else None
+
+
+def _validate_frames(frames, filters_config, mode):
+    # mode "quarantine" moves failing rows out of the frames, "report" only
+    # counts them. Returns the frames, the failing rows per kind and the report.
+    quarantine, report = {}, {}
+    for key, (model, id_column) in VALIDATED.items():
+        if key not in frames:
+            continue
+        valid, quarantine[key], report[key] = validation.validate(frames[key], filters_config, model, id_column)
+        if mode == "quarantine":
+            frames[key] = valid
+    return frames, quarantine, report
+
+
+def _normalize_transactions(df, filters_config, enums=True):
+    df = df.with_columns(
+        pl.col("customer").struct.field("id").alias("customer_id"),
+        pl.col("customer").struct.field("segment").alias("segment"),
+        pl.col("customer").struct.field("lifetimeValue").alias("customer_lifetime_value"),
+        # status is compared case-insensitively everywhere, so it is lowercased once here
+        pl.col("status").cast(pl.String).str.to_lowercase(),
+        pl.col("region", "category").cast(pl.String),
+    ).select(TRANSACTION_COLUMNS)
+
+    if not enums:
+        # out-of-core parts are normalized one batch at a time, before all
+        # dimension values are known, so the dimensions are Categoricals too
+        return df.with_columns(pl.col(*_DIMENSIONS, *_CATEGORICAL_COLUMNS).cast(pl.Categorical)).sort("date", maintain_order=True)
+    return df.with_columns(
+        *[pl.col(name).cast(_enum_for(getattr(filters_config, option), df[name])) for name, option in _DIMENSIONS.items()],
+        pl.col(_CATEGORICAL_COLUMNS).cast(pl.Categorical),
+    ).sort("date", maintain_order=True)  # date order backs the DateIndex
+
+
+def _normalize_daily_metrics(df):
+    return df.with_columns(pl.col(_DAILY_COUNT_COLUMNS).cast(pl.UInt32))
+
+
+def column_footprint(df):
+    return {name: df[name].estimated_size() for name in df.columns}
+
+
+@dataclasses.dataclass(frozen=True)
+class Snapshot:
+    # The parts of a dataset that change together when rows are appended.
+    # DataManager publishes a new snapshot with one assignment, so a reader
+    # that takes dm.snapshot once never sees a new frame next to an old date
+    # index or cube.
+    version: str
+    metadata: Metadata
+    filters_config: Filters
+    transactions_df: pl.DataFrame  # None out of core
+    transactions_lf: pl.LazyFrame
+    date_index: object  # DateIndex, PartitionCatalog or None
+    daily_metrics_df: pl.DataFrame
+    products_df: pl.DataFrame
+    cube: pl.DataFrame
+    partials: SummaryPartials
+    catalog: PartitionCatalog
+
 
 class DataManager:
-    def __init__(self, file_path: str):
-        with open(file_path, 'r') as f:
-            self.raw_data = json.load(f)
-        
-        self.metadata = from_dict(data_class=Metadata, data=self.raw_data['metadata'])
-        self.summary = from_dict(data_class=Summary, data=self.raw_data['summary'])
-        self.regions = self.raw_data.get('regions', [])
-        self.customer_segments = self.raw_data.get('customerSegments', [])
-        self.filters_config = from_dict(data_class=Filters, data=self.raw_data['filters'])
-
-        self.transactions_df = pl.DataFrame(self.raw_data['transactions'])
-        self.daily_metrics_df = pl.DataFrame(self.raw_data['dailyMetrics'])
-        self.products_df = pl.DataFrame(self.raw_data['products'])
-        
-        self.transactions_df = self.transactions_df.with_columns(
-            pl.col("date").str.to_date("%Y-%m-%d")
+    def __init__(self, file_path: str, loader: str = "stream", cache: bool = True, cache_dir=None, validate: str = "quarantine",
+                 streaming: bool = False, memory_limit_mb: int = None):
+        if loader not in LOADERS:
+            raise ValueError(f"Unknown loader '{loader}', expected one of {LOADERS}")
+        if validate not in validation.VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode '{validate}', expected one of {validation.VALIDATION_MODES}")
+        if streaming and (loader != "stream" or os.path.isdir(file_path)):
+            raise ValueError("Out-of-core mode reads a single dataset file with the stream loader")
+
+        started = time.perf_counter()
+        self.appends = 0
+        self.ingested = set()
+        # serializes append and ingest_dir (which appends); readers never take it
+        self._ingest_lock = threading.RLock()
+        self.validate = validate
+        self.snapshot = None
+        catalog = None
+        # Parquet parts of the transactions in out-of-core mode (utils/out_of_core.py)
+        self.parts = None
+        self.memory_limit_mb = memory_limit_mb or out_of_core.MEMORY_LIMIT_MB
+        if streaming:
+            out_of_core.enable(self.memory_limit_mb)
+        if os.path.isdir(file_path):
+            frames, blocks, source, version, catalog = self._load_directory(file_path, loader, cache, validate)
+            parsed_footprint = None
+        else:
+            source_stat = os.stat(file_path)
+            # cheap dataset id used to key cached query results
+            version = f"{os.path.basename(file_path)}:{source_stat.st_size:x}:{source_stat.st_mtime_ns:x}"
+            if streaming:
+                frames, blocks, source, parsed_footprint = self._load_out_of_core(file_path, cache, cache_dir, validate)
+            else:
+                frames, blocks, source, parsed_footprint = self._load_file(file_path, loader, cache, cache_dir, validate)
+        self.source_version = version
+        metadata, filters_config = self._init_blocks(blocks)
+
+        # rows that failed validation, in the raw layout with an "errors" column, and the report
+        self.quarantine = {key: frames.pop(f"quarantine_{key}") for key in VALIDATED if f"quarantine_{key}" in frames}
+        self.validation = blocks.get("validation")
+
+        transactions = frames['transactions']
+        # Pre-aggregated cells backing the KPI cards and charts, and mergeable
+        # per-day partials backing the summary and its customer counts
+        if self.parts is not None:
+            # out of core: the cube is aggregated by the streaming engine and the
+            # partials' sketches, sized to the memory limit, are filled batch by batch
+            cube = build_cube(transactions, customers=False)
+            partials = SummaryPartials.from_cube(
+                cube,
+                transactions.select(*PARTITION_KEYS, "customer_id").collect_batches(chunk_size=out_of_core.batch_rows(self.memory_limit_mb)),
+                # like the dimension values, the distinct customer ids are held in memory
+                customers=transactions.select(pl.col("customer_id").cast(pl.String).drop_nulls().unique()).collect().to_series(),
+                budget=min(SKETCH_BUDGET, out_of_core.sketch_budget(self.memory_limit_mb)),
+            )
+        else:
+            if catalog is None:
+                # sorted at normalization; the flag is not kept by the IPC round trip
+                transactions = transactions.with_columns(pl.col("date").set_sorted())
+            cube, partials = build_cube(transactions, customers=False), SummaryPartials.build(transactions)
+        self._publish(
+            transactions, version=version, metadata=metadata, filters_config=filters_config, catalog=catalog,
+            daily_metrics_df=frames['dailyMetrics'], products_df=frames['products'], cube=cube, partials=partials,
         )
-        self.daily_metrics_df = self.daily_metrics_df.with_columns(
-            pl.col("date").str.to_date("%Y-%m-%d")
-        )
\ No newline at end of file
+        if catalog is not None:
+            # the partitions' summary blocks do not add up, so it is recomputed over all of them
+            everything = {
+                "start_date": datetime.date.fromisoformat(metadata.dateRange.start),
+                "end_date": datetime.date.fromisoformat(metadata.dateRange.end),
+                "selected_regions": filters_config.availableRegions,
+                "selected_categories": filters_config.availableCategories,
+                "selected_segment": "All",
+            }
+            self.summary = partials.summary(everything, frames['dailyMetrics'])
+
+        self.load_stats = {
+            "loader": loader,
+            "source": source,
+            "load_seconds": round(time.perf_counter() - started, 3),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "transactions": int(cube["orders"].cast(pl.Int64).sum()),
+        }
+        if catalog is not None:
+            self.load_stats["partitions"] = len(catalog.partitions)
+        if self.parts is not None:
+            self.load_stats["out_of_core"] = {
+                "parts": len(self.parts),
+                "parts_mb": round(sum(os.path.getsize(path) for path in self.parts) / (1024 * 1024), 1),
+                "memory_limit_mb": self.memory_limit_mb,
+            }
+        if self.validation:
+            self.load_stats["quarantined"] = sum(report["quarantined"] for report in self.validation.values())
+        # per-column bytes of the normalized frame, and of the parsed one when this run parsed it
+        self.footprint = {"after": column_footprint(transactions)} if isinstance(transactions, pl.DataFrame) else {}
+        if parsed_footprint is not None:
+            self.footprint["before"] = parsed_footprint
+
+    def _load_file(self, file_path, loader, cache, cache_dir, validate):
+        # normalized frames and blocks of one dataset file, from the columnar cache when it is current
+        # the cached frames are the validated ones, so the mode is part of the key (and of the path)
+        cache_key = f"{loader}-{validate}"
+        cache_dir = columnar_cache.key_dir(cache_dir or columnar_cache.default_cache_dir(file_path), cache_key)
+        cached = columnar_cache.load(file_path, cache_dir, cache_key) if cache else None
+        if cached is not None:
+            frames, blocks = cached
+            return frames, blocks, "cache", None
+
+        if file_path.endswith(".parquet"):
+            # a partition of a dataset directory holding transactions only
+            frames = {
+                "transactions": _read_batch(file_path, TRANSACTION_SCHEMA),
+                "dailyMetrics": _typed_frame([], DAILY_METRIC_SCHEMA),
+                "products": _typed_frame([], PRODUCT_SCHEMA),
+            }
+            blocks = {}
+        else:
+            frames, blocks = self._load_streaming(file_path) if loader == "stream" else self._load_json(file_path)
+        # without a filters block the dimension values are not checked, and the enums hold the values found
+        filters_config = _filters_config(blocks)
+        if validate != "off":
+            frames, quarantine, blocks["validation"] = _validate_frames(frames, filters_config, validate)
+            frames.update({f"quarantine_{key}": df for key, df in quarantine.items()})
+        parsed_footprint = column_footprint(frames['transactions'])
+        frames['transactions'] = _normalize_transactions(frames['transactions'], filters_config or Filters([], [], []))
+        frames['dailyMetrics'] = _normalize_daily_metrics(frames['dailyMetrics'])
+        if cache:
+            try:
+                columnar_cache.save(file_path, cache_dir, cache_key, frames, blocks)
+            except OSError as e:
+                warnings.warn(f"Could not write columnar cache to {cache_dir}: {e}")
+        return frames, blocks, loader, parsed_footprint
+
+    def _load_out_of_core(self, file_path, cache, cache_dir, validate):
+        # Out-of-core mode: the transactions array is parsed, validated and
+        # normalized in batches sized from the memory limit, and each batch is
+        # written as a Parquet part; frames['transactions'] scans the parts.
+        # Batches parsed before the filters block (it usually comes last) are
+        # written as they are, and validated and rewritten once it has been read.
+        # The parts are written to a directory private to this process and then
+        # published as the directory of this source version.
+        cache_key = f"stream-{validate}"
+        target = columnar_cache.parts_dir(
+            os.path.join(cache_dir or columnar_cache.default_cache_dir(file_path), out_of_core.PARTS_DIRNAME), file_path, cache_key
+        )
+        cached = columnar_cache.load(file_path, target, cache_key) if cache else None
+        if cached is not None:
+            frames, blocks = cached
+            self.parts = [str(path) for path in columnar_cache.list_parts(target)]
+            return frames, blocks, "cache", None
+
+        staging = columnar_cache.staging_dir(target)
+        blocks, frames, self.parts, pending = {}, {}, [], []
+        quarantined, reports = {key: [] for key in VALIDATED}, {key: [] for key in VALIDATED}
+
+        def write_part(df, path, filters_config):
+            if validate != "off":
+                checked, quarantine, report = _validate_frames({"transactions": df}, filters_config, validate)
+                df = checked["transactions"]
+                quarantined["transactions"].append(quarantine["transactions"])
+                reports["transactions"].append(report["transactions"])
+            # (a pending part is replaced by renaming, as it may still be memory
+            # mapped; the staging directory is private, so the name is too)
+            _normalize_transactions(df, filters_config or Filters([], [], []), enums=False).write_parquet(f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+
+        with open(file_path, 'r') as f:
+            for key, value in iter_top_level(f, _STREAMED_ARRAYS, batch_size=out_of_core.batch_rows(self.memory_limit_mb)):
+                if key == "transactions" and not isinstance(value, list):
+                    for batch in value:
+                        path = str(columnar_cache.part_path(staging, len(self.parts)))
+                        self.parts.append(path)
+                        if 'filters' in blocks or validate == "off":
+                            write_part(_typed_frame(batch, TRANSACTION_SCHEMA), path, _filters_config(blocks))
+                        else:
+                            _typed_frame(batch, TRANSACTION_SCHEMA).write_parquet(path)
+                            pending.append(path)
+                elif key in _STREAMED_ARRAYS and not isinstance(value, list):
+                    frames[key] = _frame_from_batches(value, _STREAMED_ARRAYS[key])
+                else:
+                    blocks[key] = value
+        filters_config = _filters_config(blocks)
+        for path in pending:
+            write_part(pl.read_parquet(path), path, filters_config)
+        if not self.parts:
+            # an empty part, so the scan has the columns
+            self.parts.append(str(columnar_cache.part_path(staging, 0)))
+            write_part(_typed_frame([], TRANSACTION_SCHEMA), self.parts[0], filters_config)
+        for key, schema in _STREAMED_ARRAYS.items():
+            if key not in frames and key != "transactions":
+                frames[key] = _typed_frame([], schema)
+
+        if validate != "off":
+            frames, quarantine, report = _validate_frames(frames, filters_config, validate)
+            quarantined["dailyMetrics"].append(quarantine["dailyMetrics"])
+            reports["dailyMetrics"].append(report["dailyMetrics"])
+            blocks["validation"] = {key: validation.merge_reports(reports[key]) for key in VALIDATED}
+            frames.update({f"quarantine_{key}": pl.concat(quarantined[key], how="diagonal_relaxed") for key in VALIDATED})
+        frames['dailyMetrics'] = _normalize_daily_metrics(frames['dailyMetrics'])
+        directory = staging
+        if cache:
+            try:
+                columnar_cache.save(file_path, staging, cache_key, frames, blocks, parts=self.parts)
+                directory = columnar_cache.publish_dir(staging, target)
+            except OSError as e:
+                warnings.warn(f"Could not write the out-of-core cache to {target}: {e}")
+        if directory == staging:
+            # an unpublished copy is private to this DataManager and removed with it
+            weakref.finalize(self, shutil.rmtree, staging, True)
+        self.parts = [str(path) for path in columnar_cache.list_parts(directory)]
+        frames['transactions'] = pl.scan_parquet(self.parts)
+        return frames, blocks, "stream", None
+
+    def _load_directory(self, directory, loader, cache, validate):
+        # A dataset split into files, e.g. one per month: JSON documents in the
+        # single-file layout and Parquet files of transactions (raw layout). Each
+        # file is a partition with its own columnar cache, so a new month parses
+        # only that month; the blocks are merged and the transactions stay per
+        # partition in a PartitionCatalog, which prunes date-filtered queries.
+        names = sorted(name for name in os.listdir(directory) if name.endswith(PARTITION_SUFFIXES) and not name.startswith("."))
+        if not names:
+            raise ValueError(f"No dataset files ({', '.join(PARTITION_SUFFIXES)}) in {directory}")
+        stats = [(name, os.stat(os.path.join(directory, name))) for name in names]
+        fingerprint = zlib.crc32(json.dumps([(name, st.st_size, st.st_mtime_ns) for name, st in stats]).encode())
+        version = f"{os.path.basename(os.path.normpath(directory))}:{len(names)}:{fingerprint:08x}"
+
+        loaded = [(name, *self._load_file(os.path.join(directory, name), loader, cache, None, validate)[:3]) for name in names]
+        documents = [blocks for _, _, blocks, _ in loaded if 'filters' in blocks]
+
+        # filter options in the order the documents list them, then values only found in the data
+        filters = {option: [] for option in _DIMENSIONS.values()}
+        for blocks in documents:
+            for option, values in filters.items():
+                values.extend(value for value in blocks['filters'].get(option, []) if value not in values)
+        partitions = [(name, frames['transactions']) for name, frames, _, _ in loaded]
+        for column, option in _DIMENSIONS.items():
+            found = pl.concat([df[column].cast(pl.String).unique() for _, df in partitions]).drop_nulls().unique().sort().to_list()
+            filters[option].extend(value for value in found if value not in filters[option])
+            dtype = pl.Enum(filters[option])
+            partitions = [(name, df if df.schema[column] == dtype else df.with_columns(pl.col(column).cast(dtype))) for name, df in partitions]
+        catalog = PartitionCatalog([Partition(name, df) for name, df in partitions])
+        transactions = catalog.frame()
+        if transactions is None:
+            transactions = partitions[0][1]
+
+        # a day (or product) delivered by several files keeps the last file's row
+        daily_metrics = pl.concat([frames['dailyMetrics'] for _, frames, _, _ in loaded]).unique("date", keep="last", maintain_order=True).sort("date")
+        products = pl.concat([frames['products'] for _, frames, _, _ in loaded], how="diagonal_relaxed")
+        products = products.unique("id", keep="last", maintain_order=True) if "id" in products.columns else products
+        start, end = transactions["date"].min(), transactions["date"].max()
+        blocks = {
+            "metadata": {
+                "generatedAt": max((blocks['metadata'].get("generatedAt", "") for blocks in documents if 'metadata' in blocks), default=""),
+                "transactionCount": transactions.height,
+                "daysOfData": (end - start).days + 1 if start else 0,
+                "dateRange": {"start": start.isoformat() if start else "", "end": end.isoformat() if end else ""},
+            },
+            # recomputed once the partials are built
+            "summary": {"totalRevenue": 0, "averageOrderValue": 0, "conversionRate": 0, "totalCustomers": 0, "refundRate": 0, "topRegion": "N/A", "topCategory": "N/A"},
+            "filters": filters,
+            "regions": filters["availableRegions"],
+            "customerSegments": filters["availableSegments"],
+        }
+        frames = {"transactions": transactions, "dailyMetrics": daily_metrics, "products": products}
+        reports = [blocks['validation'] for _, _, blocks, _ in loaded if 'validation' in blocks]
+        if reports:
+            blocks["validation"] = {key: validation.merge_reports([report[key] for report in reports]) for key in VALIDATED}
+            for key in VALIDATED:
+                quarantined = [frames_[f"quarantine_{key}"] for _, frames_, _, _ in loaded if f"quarantine_{key}" in frames_]
+                frames[f"quarantine_{key}"] = pl.concat(quarantined, how="diagonal_relaxed")
+        parsed = sum(source != "cache" for _, _, _, source in loaded)
+        return frames, blocks, loader if parsed else "cache", version, catalog
+
+    def __getattr__(self, name):
+        # the current snapshot's fields read as attributes; code that reads
+        # several of them should take self.snapshot once instead
+        snapshot = self.__dict__.get("snapshot")
+        if snapshot is not None and name in Snapshot.__dataclass_fields__:
+            return getattr(snapshot, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def _publish(self, transactions=None, **fields):
+        # Replaces the snapshot with one whose given fields changed. transactions
+        # (new rows only) is a DataFrame, or out of core a LazyFrame over the parts.
+        if self.snapshot is not None:
+            fields = {**vars(self.snapshot), **fields}
+        if transactions is not None:
+            fields["transactions_df"] = transactions if isinstance(transactions, pl.DataFrame) else None
+            # Queries run against this lazy frame. It wraps the (memory-mapped) frame
+            # rather than re-scanning the sidecar, so date slices stay zero-copy and
+            # nothing is decoded again per query
+            fields["transactions_lf"] = transactions.lazy()
+            # Row offsets per day, so date filters become a slice; for a dataset
+            # directory the catalog also skips the partitions outside the range.
+            # Out of core, date filters are predicates pushed into the Parquet scan.
+            if fields["catalog"] is not None:
+                fields["date_index"] = fields["catalog"]
+            else:
+                fields["date_index"] = DateIndex(transactions["date"]) if fields["transactions_df"] is not None else None
+        snapshot = Snapshot(**fields)
+
+        for name in ("transactions_df", "transactions_lf", "date_index", "daily_metrics_df", "products_df", "cube", "partials"):
+            if getattr(snapshot, name) is not None:
+                tag(getattr(snapshot, name), (snapshot.version, name))
+        self.snapshot = snapshot
+
+    def append(self, transactions=None, daily_metrics=None):
+        # Adds batches in the loader's raw layout (TRANSACTION_SCHEMA, DAILY_METRIC_SCHEMA)
+        # to the frames, the date index and the cube, extends the date range and
+        # filter options, and bumps the version. Returns what changed, for
+        # ResultCache.carry_over, or None when both batches are empty. Rows that
+        # fail validation are added to self.quarantine instead.
+        transactions = transactions if transactions is not None else _typed_frame([], TRANSACTION_SCHEMA)
+        daily_metrics = daily_metrics if daily_metrics is not None else _typed_frame([], DAILY_METRIC_SCHEMA)
+        if transactions.is_empty() and daily_metrics.is_empty():
+            return None
+        quarantine = {}
+        if self.validate != "off":
+            # new dimension values are not checked: they extend the filter options below
+            frames, quarantine, _ = _validate_frames({"transactions": transactions, "dailyMetrics": daily_metrics}, None, self.validate)
+            transactions, daily_metrics = frames["transactions"], frames["dailyMetrics"]
+
+        with self._ingest_lock:
+            for key, df in quarantine.items():
+                if not df.is_empty():
+                    self.quarantine[key] = pl.concat([self.quarantine[key], df], how="diagonal_relaxed") if key in self.quarantine else df
+            if transactions.is_empty() and daily_metrics.is_empty():
+                return None
+            snapshot = self.snapshot
+            transactions_df, cube, partials, catalog = snapshot.transactions_df, snapshot.cube, snapshot.partials, snapshot.catalog
+            transactions_lf = snapshot.transactions_lf
+            # new filter options go on a copy; the published one is never changed
+            filters_config = dataclasses.replace(snapshot.filters_config)
+            stale = []
+            if not transactions.is_empty() and transactions_df is None:
+                # out of core: the rows are kept in memory next to the parts until the next restart
+                new = _normalize_transactions(transactions, filters_config, enums=False)
+                for column, option in _DIMENSIONS.items():
+                    configured = getattr(filters_config, option)
+                    found = new[column].cast(pl.String).drop_nulls().unique().sort().to_list()
+                    setattr(filters_config, option, configured + [value for value in found if value not in configured])
+                transactions_lf = pl.concat([transactions_lf, new.lazy()])
+            elif not transactions.is_empty():
+                new = _normalize_transactions(transactions, filters_config)
+                # new regions/categories/segments extend the enums (old codes stay valid) and the filter options
+                for column, option in _DIMENSIONS.items():
+                    dtype = _widen_enum(transactions_df.schema[column], new[column].cast(pl.String))
+                    if dtype != transactions_df.schema[column]:
+                        transactions_df = transactions_df.with_columns(pl.col(column).cast(dtype))
+                        cube = cube.with_columns(pl.col(column).cast(dtype))
+                        partials = partials.cast(column, dtype)
+                        catalog = catalog.cast(column, dtype) if catalog is not None else None
+                    new = new.with_columns(pl.col(column).cast(pl.String).cast(dtype))
+                    configured = getattr(filters_config, option)
+                    setattr(filters_config, option, configured + [value for value in dtype.categories.to_list() if value not in configured])
+
+                if catalog is not None:
+                    # a dataset directory gets the rows as one more partition; its frame is not sorted as a whole
+                    catalog = catalog.add(f"append-{self.appends + 1}", new.sort("date", maintain_order=True))
+                    transactions_df = pl.concat([transactions_df, new])
+                else:
+                    in_order = transactions_df.is_empty() or new["date"].min() >= transactions_df["date"].max()
+                    transactions_df = pl.concat([transactions_df, new])
+                    # appends in date order keep the frame sorted; late rows need a (stable) re-sort
+                    transactions_df = transactions_df if in_order else transactions_df.sort("date", maintain_order=True)
+                    transactions_df = transactions_df.with_columns(pl.col("date").set_sorted())
+            if not transactions.is_empty():
+                cube = merge_cells(cube, build_cube(new, customers=False))
+                partials = partials.merge(SummaryPartials.build(new, mode=partials.mode, precision=partials.precision, customers=partials.customers))
+
+            daily_metrics_df = snapshot.daily_metrics_df
+            if not daily_metrics.is_empty():
+                # a day delivered again replaces the earlier row
+                daily_metrics = _normalize_daily_metrics(daily_metrics).unique("date", keep="last", maintain_order=True)
+                daily_metrics_df = pl.concat([
+                    daily_metrics_df.join(daily_metrics.select("date"), on="date", how="anti"),
+                    daily_metrics.select(daily_metrics_df.columns),
+                ]).sort("date")
+                # the summary's conversion rate averages the whole table
+                stale.append("daily_metrics_df")
+
+            first_dates = [frame["date"].min() for frame in (transactions, daily_metrics) if not frame.is_empty()]
+            start, end = cube["date"].min(), cube["date"].max()
+            metadata = dataclasses.replace(snapshot.metadata, transactionCount=int(cube["orders"].cast(pl.Int64).sum()))
+            if start is not None:
+                date_range = DateRange(
+                    start=min(start.isoformat(), metadata.dateRange.start),
+                    end=max(end.isoformat(), metadata.dateRange.end),
+                )
+                range_start = datetime.date.fromisoformat(date_range.start)
+                range_end = datetime.date.fromisoformat(date_range.end)
+                metadata = dataclasses.replace(metadata, dateRange=date_range, daysOfData=(range_end - range_start).days + 1)
+
+            self.appends += 1
+            self._publish(
+                # only the daily metrics changed: the transactions, and their date index, are kept
+                None if transactions.is_empty() else transactions_df if transactions_df is not None else transactions_lf,
+                version=f"{self.source_version}+{self.appends}", metadata=metadata, filters_config=filters_config,
+                catalog=catalog, daily_metrics_df=daily_metrics_df, cube=cube, partials=partials,
+            )
+            self.load_stats["transactions"] = metadata.transactionCount
+            return {
+                "previous_version": snapshot.version,
+                "version": self.snapshot.version,
+                "since": min(first_dates),
+                "stale": stale,
+                "transactions": transactions.height,
+                "dailyMetrics": daily_metrics.height,
+                "quarantined": sum(df.height for df in quarantine.values()),
+            }
+
+    def ingest_dir(self, directory):
+        # Appends the files in directory not ingested yet, in name order:
+        # transactions*.jsonl|.ndjson|.parquet and dailyMetrics*.<same>. Write
+        # them elsewhere and rename them in, so a half-written file is never read.
+        # The files are kept; a restarted process ingests them again.
+        # Concurrent callers (one per dashboard session) take turns: a file is
+        # listed, appended and marked ingested by the same caller.
+        with self._ingest_lock:
+            pending = sorted(
+                name for name in os.listdir(directory)
+                if name not in self.ingested and name.endswith(INGEST_SUFFIXES) and name.startswith(tuple(INGEST_KINDS))
+            )
+            if not pending:
+                return None
+            batches = {kind: [] for kind in INGEST_KINDS}
+            for name in pending:
+                kind = next(kind for kind in INGEST_KINDS if name.startswith(kind))
+                batches[kind].append(_read_batch(os.path.join(directory, name), INGEST_KINDS[kind]))
+            changed = self.append(
+                transactions=pl.concat(batches["transactions"]) if batches["transactions"] else None,
+                daily_metrics=pl.concat(batches["dailyMetrics"]) if batches["dailyMetrics"] else None,
+            )
+            self.ingested.update(pending)
+            return changed
+
+    def _init_blocks(self, blocks):
+        self.summary = from_dict(data_class=Summary, data=blocks['summary'])
+        self.regions = blocks.get('regions', [])
+        self.customer_segments = blocks.get('customerSegments', [])
+        return from_dict(data_class=Metadata, data=blocks['metadata']), from_dict(data_class=Filters, data=blocks['filters'])
+
+    def _load_json(self, file_path):
+        # Original path: whole document as a dict tree, kept for comparison.
+        # The tree is dropped once the frames are built.
+        with open(file_path, 'r') as f:
+            raw_data = json.load(f)
+
+        # typed with the streaming loader's schemas, so mistyped values become
+        # nulls (flagged by validation) rather than failing the whole frame
+        blocks = {}
+        frames = {}
+        for key, value in raw_data.items():
+            if key in _STREAMED_ARRAYS and isinstance(value, list):
+                frames[key] = _typed_frame(value, _STREAMED_ARRAYS[key])
+            else:
+                blocks[key] = value
+
+        for key, schema in _STREAMED_ARRAYS.items():
+            if key not in frames:
+                frames[key] = _typed_frame([], schema)
+        return frames, blocks
+
+    def _load_streaming(self, file_path):
+        # Arrays are decoded in batches straight into typed frames, nothing else is retained
+        blocks = {}
+        frames = {}
+        with open(file_path, 'r') as f:
+            for key, value in iter_top_level(f, _STREAMED_ARRAYS):
+                if key in _STREAMED_ARRAYS and not isinstance(value, list):
+                    frames[key] = _frame_from_batches(value, _STREAMED_ARRAYS[key])
+                else:
+                    blocks[key] = value
+
+        for key, schema in _STREAMED_ARRAYS.items():
+            if key not in frames:
+                frames[key] = _typed_frame([], schema)
+        return frames, blocks
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load a KPI dataset and report load time and peak RSS.")
+    parser.add_argument("path", nargs="?", default="data/kpi_dataset_large.json")
+    parser.add_argument("--loader", choices=LOADERS, default="stream")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not write the columnar cache")
+    parser.add_argument("--validate", choices=validation.VALIDATION_MODES, default="quarantine", help="what to do with rows failing validation")
+    parser.add_argument("--footprint", action="store_true", help="also print per-column memory before/after normalization")
+    parser.add_argument("--partitions", action="store_true", help="also print the partition catalog of a dataset directory")
+    parser.add_argument("--streaming", action="store_true", help="out-of-core mode: Parquet parts and the streaming engine")
+    parser.add_argument("--memory-limit-mb", type=int, help=f"batch and sketch sizing in out-of-core mode (default {out_of_core.MEMORY_LIMIT_MB})")
+    args = parser.parse_args()
+
+    dm = DataManager(args.path, loader=args.loader, cache=not args.no_cache, validate=args.validate,
+                     streaming=args.streaming, memory_limit_mb=args.memory_limit_mb)
+    print(json.dumps(dm.load_stats))
+    if dm.validation:
+        print(json.dumps(dm.validation, indent=2))
+    if args.partitions and dm.catalog is not None:
+        print(json.dumps(dm.catalog.describe(), indent=2))
+    if args.footprint:
+        print(json.dumps(dm.footprint, indent=2))
@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+
+# the modules live at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.generate_dataset import DatasetGenerator
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "dataset.json"
+    DatasetGenerator(transactions=2_000, days=30, customers=300, seed=7).write(path)
+    return str(path)
@@ -0,0 +1,31 @@
+from data_manager import DataManager
+from utils import columnar_cache
+
+MODES = [("stream", "quarantine"), ("json", "quarantine"), ("stream", "report"), ("stream", "off"), ("json", "off")]
+
+
+def test_alternating_modes_keep_their_own_caches(dataset):
+    first = {mode: DataManager(dataset, loader=mode[0], validate=mode[1]) for mode in MODES}
+    # a second round, in the opposite order, reads every mode from its own cache
+    second = {mode: DataManager(dataset, loader=mode[0], validate=mode[1]) for mode in reversed(MODES)}
+
+    for mode in MODES:
+        assert first[mode].load_stats["source"] == mode[0]
+        assert second[mode].load_stats["source"] == "cache"
+        assert second[mode].transactions_df.equals(first[mode].transactions_df)
+    assert sorted(path.name for path in columnar_cache.default_cache_dir(dataset).iterdir()) == sorted(f"{loader}-{validate}" for loader, validate in MODES)
+
+
+def test_a_changed_source_is_parsed_again(dataset):
+    DataManager(dataset)
+    with open(dataset, "a") as f:
+        f.write("\n")
+
+    assert DataManager(dataset).load_stats["source"] == "stream"
+    assert DataManager(dataset).load_stats["source"] == "cache"
+
+
+def test_cache_false_writes_nothing(dataset):
+    DataManager(dataset, cache=False)
+
+    assert not columnar_cache.default_cache_dir(dataset).exists()
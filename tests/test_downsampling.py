@@ -0,0 +1,82 @@
+import datetime
+import numpy as np
+import polars as pl
+import pytest
+from utils.downsampling import BUCKETS, LTTB_MAX_RATIO, downsample, lttb_indices, pick_bucket
+
+
+def _daily(days, seed=5):
+    rng = np.random.default_rng(seed)
+    start = datetime.date(2020, 1, 1)
+    return pl.DataFrame({
+        "date": pl.date_range(start, start + datetime.timedelta(days=days - 1), eager=True),
+        "amount": rng.uniform(0, 1_000, days).round(2),
+    })
+
+
+@pytest.mark.parametrize("span_days, max_points, expected", [
+    (500, 1_000, "1d"),
+    (10_000, 1_000, "1d"),
+    (10_001, 1_000, "1w"),
+    (3_650, 100, "1w"),
+    (3_650, 10, "1q"),
+    (3_650, 20, "1mo"),
+    (3_650, 2, "1y"),
+    (1_000_000, 10, "1y"),
+])
+def test_bucket_is_the_finest_within_the_ratio(span_days, max_points, expected):
+    assert pick_bucket(span_days, max_points) == expected
+    days = dict(BUCKETS)[expected]
+    # every finer bucket would need LTTB to drop more than LTTB_MAX_RATIO points per point kept
+    assert all(span_days / finer > max_points * LTTB_MAX_RATIO for bucket, finer in BUCKETS if finer < days)
+
+
+@pytest.mark.parametrize("days, max_points", [(30, 100), (400, 100), (3_000, 50), (3_000, 2_000)])
+def test_output_respects_max_points(days, max_points):
+    df = _daily(days)
+
+    out, bucket = downsample(df, max_points=max_points)
+
+    assert out.height <= max_points
+    assert out["date"].is_sorted()
+    if days <= max_points:
+        assert bucket == "1d" and out.equals(df)
+
+
+def test_bucketed_points_are_bucket_totals():
+    df = _daily(3_000)
+
+    out, bucket = downsample(df, max_points=100)
+
+    # weekly sums (429 of them) trimmed by LTTB: every point kept is a whole
+    # week's total, and the weeks add up to the daily total
+    weekly = df.group_by_dynamic("date", every="1w").agg(pl.col("amount").sum())
+    assert bucket == "1w"
+    assert weekly["amount"].sum() == pytest.approx(df["amount"].sum())
+    assert out.height == 100
+    assert out.join(weekly, on=["date", "amount"], how="anti").is_empty()
+
+
+def test_lttb_keeps_the_endpoints():
+    df = _daily(2_000)
+
+    out, bucket = downsample(df, max_points=300)
+
+    assert bucket == "1d" and out.height == 300
+    assert out.row(0) == df.row(0)
+    assert out.row(-1) == df.row(-1)
+    # a subset of the input rows, in order
+    assert out.join(df, on=["date", "amount"], how="anti").is_empty()
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(1_000, dtype=np.float64)
+    y = np.zeros(1_000)
+    y[517] = 100.0
+
+    selected = lttb_indices(x, y, 50)
+
+    assert len(selected) == 50
+    assert selected[0] == 0 and selected[-1] == 999
+    assert 517 in selected
+    assert np.all(np.diff(selected) > 0)
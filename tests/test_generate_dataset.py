@@ -0,0 +1,25 @@
+import json
+import polars as pl
+import pytest
+from bench.generate_dataset import DatasetGenerator
+
+
+def test_blocks_are_derived_from_the_transactions(tmp_path):
+    path = tmp_path / "dataset.json"
+    # small batches, so customers first seen in a later batch on an earlier day are covered
+    DatasetGenerator(transactions=3_000, days=40, customers=800, seed=9, batch_size=500).write(path)
+    with open(path) as f:
+        data = json.load(f)
+    rows = pl.DataFrame(data["transactions"]).with_columns(pl.col("customer").struct.field("id").alias("customer_id"))
+    daily = pl.DataFrame(data["dailyMetrics"])
+
+    first_days = rows.group_by("customer_id").agg(pl.col("date").min()).group_by("date").len()
+    new_users = daily.join(first_days, on="date", how="left").select(pl.col("len").fill_null(0))
+    assert daily["newUsers"].to_list() == new_users.to_series().to_list()
+    assert daily["newUsers"].sum() == rows["customer_id"].n_unique()
+
+    summary = data["summary"]
+    completed = rows.filter(pl.col("status") == "completed")
+    assert summary["conversionRate"] == pytest.approx(daily["conversionRate"].mean(), abs=1e-4)
+    assert summary["totalCustomers"] == rows["customer_id"].n_unique()
+    assert summary["totalRevenue"] == pytest.approx(completed["amount"].sum())
@@ -0,0 +1,90 @@
+import datetime
+import json
+import threading
+import polars as pl
+from data_manager import DataManager, TRANSACTION_SCHEMA, _typed_frame
+
+
+def _new_transactions(dataset, count, day, **changes):
+    # copies of the dataset's first transactions under new ids, on a later day
+    with open(dataset) as f:
+        rows = json.load(f)["transactions"][:count]
+    return [dict(row, id=f"new-{i}", date=day.isoformat(), **changes) for i, row in enumerate(rows)]
+
+
+def _next_day(dm, days=1):
+    return datetime.date.fromisoformat(dm.metadata.dateRange.end) + datetime.timedelta(days=days)
+
+
+def _write_incoming(directory, rows):
+    with open(directory / "transactions-001.jsonl", "w") as f:
+        f.writelines(json.dumps(row) + "\n" for row in rows)
+
+
+def test_append_publishes_a_new_snapshot(dataset):
+    dm = DataManager(dataset, cache=False)
+    before = dm.snapshot
+    day = _next_day(dm, 5)
+
+    changed = dm.append(transactions=_typed_frame(_new_transactions(dataset, 10, day, region="Antarctica"), TRANSACTION_SCHEMA))
+
+    assert changed["previous_version"] == before.version
+    assert changed["version"] == dm.snapshot.version != before.version
+    assert changed["since"] == day
+    # the earlier snapshot is left as it was
+    assert before.transactions_df.height == 2_000
+    assert before.metadata.dateRange.end == (day - datetime.timedelta(days=5)).isoformat()
+    assert "Antarctica" not in before.filters_config.availableRegions
+    # the new one has the rows, the new region and the longer date range
+    assert dm.transactions_df.height == 2_010
+    assert dm.metadata.transactionCount == 2_010
+    assert dm.metadata.dateRange.end == day.isoformat()
+    assert "Antarctica" in dm.filters_config.availableRegions
+    assert dm.date_index is dm.snapshot.date_index
+
+
+def test_append_daily_metrics_only_keeps_the_transactions(dataset):
+    dm = DataManager(dataset, cache=False)
+    before = dm.snapshot
+    metrics = before.daily_metrics_df.tail(1).with_columns(pl.col("activeUsers") * 2)
+
+    changed = dm.append(daily_metrics=metrics)
+
+    assert changed["stale"] == ["daily_metrics_df"]
+    assert dm.transactions_df is before.transactions_df
+    assert dm.date_index is before.date_index
+    assert dm.daily_metrics_df.height == before.daily_metrics_df.height
+    assert dm.daily_metrics_df["activeUsers"][-1] == before.daily_metrics_df["activeUsers"][-1] * 2
+
+
+def test_ingest_dir_ingests_each_file_once(dataset, tmp_path):
+    dm = DataManager(dataset, cache=False)
+    _write_incoming(tmp_path, _new_transactions(dataset, 100, _next_day(dm)))
+
+    changed = dm.ingest_dir(tmp_path)
+
+    assert changed["transactions"] == 100
+    assert dm.ingest_dir(tmp_path) is None
+    assert dm.transactions_df.height == 2_100
+
+
+def test_concurrent_ingest_dir_does_not_duplicate_rows(dataset, tmp_path):
+    dm = DataManager(dataset, cache=False)
+    _write_incoming(tmp_path, _new_transactions(dataset, 1_000, _next_day(dm)))
+    start = threading.Barrier(4)
+    results = []
+
+    def ingest():
+        start.wait()
+        results.append(dm.ingest_dir(tmp_path))
+
+    threads = [threading.Thread(target=ingest) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(changed is not None for changed in results) == 1
+    assert dm.transactions_df.height == 3_000
+    assert dm.metadata.transactionCount == 3_000
+    assert dm.appends == 1
@@ -0,0 +1,37 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from utils.instrumentation import Profiler
+
+
+def test_pool_stages_are_recorded_in_the_callers_run():
+    profile = Profiler(enabled=True)
+
+    def build():
+        with profile.stage("chart_figure", chart="Revenue Trend"):
+            pass
+
+    profile.start_run()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(profile.in_run(build)).result()
+        # without in_run the pool thread has no run, and the stage is not in this one
+        pool.submit(build).result()
+    run = profile.finish_run()
+
+    assert [(stage["stage"], stage["run"]) for stage in run["stages"]] == [("chart_figure", run["run"])]
+
+
+def test_running_tells_a_standalone_stage_from_one_in_a_run(tmp_path):
+    path = tmp_path / "profile.jsonl"
+    profile = Profiler(path=str(path))
+
+    assert not profile.running
+    profile.start_run(fragment="transactions")
+    assert profile.running
+    with profile.stage("table"):
+        pass
+    run = profile.finish_run()
+
+    assert not profile.running
+    assert run["fragment"] == "transactions"
+    assert [stage["stage"] for stage in run["stages"]] == ["table"]
+    assert [json.loads(line)["run"] for line in path.read_text().splitlines()] == [run["run"]]
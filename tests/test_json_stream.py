@@ -0,0 +1,67 @@
+import io
+import json
+import pytest
+from utils.json_stream import iter_top_level
+
+
+def _read(text, array_keys=("transactions",), batch_size=2, chunk_size=1 << 20):
+    # the members as json.load would return them, arrays from their batches
+    result = {}
+    for key, value in iter_top_level(io.StringIO(text), array_keys, batch_size=batch_size, chunk_size=chunk_size):
+        result[key] = [item for batch in value for item in batch] if hasattr(value, "__next__") else value
+    return result
+
+
+DOCUMENT = json.dumps({
+    "metadata": {"count": 3, "ratio": 0.125, "name": "kpi é \"quoted\""},
+    "transactions": [
+        {"id": "t1", "amount": 12.5, "qty": -3, "score": 2.5e-3, "ok": True},
+        {"id": "t2", "amount": 1234567.875, "qty": 0, "score": -1E+10, "ok": False},
+        {"id": "t3", "amount": None, "qty": 10, "score": 6.02e23, "ok": None},
+    ],
+    "empty": [],
+    "total": -1234.5e-2,
+})
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 64))
+def test_every_chunk_boundary(chunk_size):
+    assert _read(DOCUMENT, chunk_size=chunk_size) == json.loads(DOCUMENT)
+
+
+@pytest.mark.parametrize("number", ["12.5", "2.5e10", "-7", "-0.125E-3", "1234567"])
+def test_number_split_at_every_offset(number):
+    # the window ends inside the number at each offset in turn
+    text = '{"a": ' + number + ', "b": [' + number + ", " + number + "]}"
+    expected = json.loads(text)
+    for chunk_size in range(1, len(text) + 1):
+        assert _read(text, array_keys=("b",), chunk_size=chunk_size) == expected, chunk_size
+
+
+def test_number_at_the_end_of_the_file():
+    # a top-level member whose number ends the window without a closing brace yet
+    text = '{"a": 125}'
+    for chunk_size in range(1, len(text) + 1):
+        assert _read(text, chunk_size=chunk_size) == {"a": 125}
+
+
+def test_batches_are_bounded():
+    text = json.dumps({"transactions": list(range(7))})
+
+    batches = [list(batch) for key, value in iter_top_level(io.StringIO(text), ("transactions",), batch_size=3) for batch in value]
+
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_unconsumed_arrays_are_skipped():
+    text = json.dumps({"transactions": [1, 2, 3], "after": {"x": 1}})
+
+    keys = [key for key, _ in iter_top_level(io.StringIO(text), ("transactions",), chunk_size=4)]
+
+    assert keys == ["transactions", "after"]
+
+
+@pytest.mark.parametrize("text", ['{"a": 1', '{"a": [1, 2', '{"a" 1}', '{"a": 12.}'])
+def test_malformed_input_raises(text):
+    with pytest.raises(ValueError):
+        _read(text, array_keys=("a",), chunk_size=3)
@@ -0,0 +1,90 @@
+import dataclasses
+import datetime
+import polars as pl
+import pytest
+from streamlit.testing.v1 import AppTest
+from data_manager import DataManager
+from utils.summary_partials import comparison_periods
+from utils.ui_components import KPICards
+
+
+def _filters(dm, start, end):
+    return {
+        "start_date": start,
+        "end_date": end,
+        "selected_regions": dm.filters_config.availableRegions,
+        "selected_categories": dm.filters_config.availableCategories,
+        "selected_segment": "All",
+    }
+
+
+def _completed_revenue(dm, start, end):
+    rows = dm.transactions_df.filter(pl.col("date").is_between(start, end) & (pl.col("status") == "completed"))
+    return rows["amount"].sum()
+
+
+def test_compare_with_a_partially_covered_previous_period(dataset):
+    dm = DataManager(dataset, cache=False)
+    first = datetime.date.fromisoformat(dm.metadata.dateRange.start)
+    # 20 days from the 11th: the previous period starts 10 days before the data
+    filters = _filters(dm, first + datetime.timedelta(days=10), first + datetime.timedelta(days=29))
+
+    comparison = dm.partials.compare(filters, dm.daily_metrics_df)
+
+    start, end, previous = comparison["previous"]
+    assert (start, end) == (first - datetime.timedelta(days=10), first + datetime.timedelta(days=9))
+    assert previous.totalRevenue == pytest.approx(_completed_revenue(dm, first, end))
+    assert previous.totalRevenue > 0
+    # the same as a summary of the covered days, except the per-period conversion rate
+    covered = dm.partials.summary(_filters(dm, first, end), dm.daily_metrics_df)
+    assert dataclasses.asdict(previous) == pytest.approx({**dataclasses.asdict(covered), "conversionRate": previous.conversionRate})
+    days = dm.daily_metrics_df.filter(pl.col("date").is_between(first, end))["conversionRate"]
+    assert previous.conversionRate == days.mean()
+
+    delta, help_text = KPICards.compare(comparison, "totalRevenue")
+    current = comparison["current"][2].totalRevenue
+    assert delta == f"{(current - previous.totalRevenue) / previous.totalRevenue * 100:+.1f}%"
+    # a year earlier there is no data
+    assert "Same period last year" in help_text and "no data" in help_text
+
+
+def test_compare_without_overlap_shows_no_delta(dataset):
+    dm = DataManager(dataset, cache=False)
+    everything = _filters(
+        dm, datetime.date.fromisoformat(dm.metadata.dateRange.start), datetime.date.fromisoformat(dm.metadata.dateRange.end)
+    )
+
+    comparison = dm.partials.compare(everything, dm.daily_metrics_df)
+
+    assert {name: (start, end) for name, (start, end, _) in comparison.items()} == comparison_periods(everything["start_date"], everything["end_date"])
+    for name in KPICards.PERIOD_LABELS:
+        summary = comparison[name][2]
+        assert (summary.totalRevenue, summary.totalCustomers, summary.topRegion, summary.topCategory) == (0, 0, "N/A", "N/A")
+    # "All Time" has nothing before it to compare with
+    for field in ("totalRevenue", "averageOrderValue", "topRegion", "topCategory"):
+        delta, help_text = KPICards.compare(comparison, field)
+        assert delta == KPICards.NO_DELTA
+        assert help_text.count("no data") == 2
+
+
+def _cards():
+    import datetime
+    from models import Summary
+    from utils.ui_components import KPICards
+
+    def summary(revenue, region):
+        return Summary(revenue, revenue / 10 if revenue else 0, 3.0, 10 if revenue else 0, 1.0, region, "Books" if revenue else "N/A")
+
+    day = datetime.date(2024, 1, 1)
+    KPICards().display(summary(1_000.0, "Europe"), comparison={
+        "current": (day, day, summary(1_000.0, "Europe")),
+        "previous": (day, day, summary(0, "N/A")),
+        "last_year": (day, day, summary(800.0, "Asia")),
+    })
+
+
+def test_cards_show_na_for_a_period_without_data():
+    at = AppTest.from_function(_cards).run()
+
+    assert not at.exception
+    assert [metric.proto.delta for metric in at.metric] == ["n/a"] * 4
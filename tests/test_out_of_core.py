@@ -0,0 +1,110 @@
+import dataclasses
+import datetime
+import os
+import polars as pl
+import pytest
+from bench.generate_dataset import DatasetGenerator
+from data_manager import DataManager
+from utils import columnar_cache, data_utils, out_of_core
+
+DIMENSIONS = ["region", "category", "segment"]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "dataset.json"
+    DatasetGenerator(transactions=5_000, days=60, customers=500, seed=3).write(path)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def polars_config():
+    # out-of-core mode switches the whole process to the streaming engine
+    with pl.Config():
+        yield
+
+
+def _streaming(path, **options):
+    # 1 MB gives the smallest parse batches (out_of_core.MIN_BATCH_ROWS rows)
+    return DataManager(path, streaming=True, memory_limit_mb=1, **options)
+
+
+def _scenarios(dm):
+    start = datetime.date.fromisoformat(dm.metadata.dateRange.start)
+    end = datetime.date.fromisoformat(dm.metadata.dateRange.end)
+    everything = {
+        "start_date": start,
+        "end_date": end,
+        "selected_regions": dm.filters_config.availableRegions,
+        "selected_categories": dm.filters_config.availableCategories,
+        "selected_segment": "All",
+    }
+    return [
+        everything,
+        {**everything, "selected_regions": dm.filters_config.availableRegions[:2], "selected_segment": "SMB"},
+        {**everything, "start_date": end - datetime.timedelta(days=9), "selected_categories": dm.filters_config.availableCategories[:1]},
+    ]
+
+
+def _plain(df):
+    return df.with_columns(pl.col(DIMENSIONS).cast(pl.String))
+
+
+def _fields(summary):
+    # float sums differ in the last digits with the order rows are added in
+    return pytest.approx(dataclasses.asdict(summary))
+
+
+def test_streaming_matches_in_memory(source):
+    memory = DataManager(source, cache=False)
+    streamed = _streaming(source, cache=False)
+
+    assert streamed.load_stats["out_of_core"]["parts"] == -(-5_000 // out_of_core.MIN_BATCH_ROWS)
+    assert streamed.transactions_df is None
+    assert streamed.metadata == memory.metadata
+    assert streamed.daily_metrics_df.equals(memory.daily_metrics_df)
+    keys = ["date", *DIMENSIONS, "status"]
+    assert _plain(streamed.cube).sort(keys).select(keys + ["orders"]).equals(_plain(memory.cube).sort(keys).select(keys + ["orders"]))
+    assert streamed.cube["amount"].sum() == pytest.approx(memory.cube["amount"].sum())
+
+    for filters in _scenarios(memory):
+        summary = memory.partials.summary(filters, memory.daily_metrics_df)
+        assert dataclasses.asdict(streamed.partials.summary(filters, streamed.daily_metrics_df)) == _fields(summary)
+        comparison = memory.partials.compare(filters, memory.daily_metrics_df)
+        for name, (start, end, summary) in streamed.partials.compare(filters, streamed.daily_metrics_df).items():
+            assert (start, end) == comparison[name][:2]
+            assert dataclasses.asdict(summary) == _fields(comparison[name][2])
+        rows = [
+            _plain(data_utils.build_filter_query(dm.transactions_lf, filters, date_index=dm.date_index).collect()).sort("id")
+            for dm in (streamed, memory)
+        ]
+        assert rows[0].equals(rows[1])
+
+
+def test_an_interrupted_publish_leaves_the_previous_parts(source, monkeypatch):
+    published = _streaming(source)
+    expected = published.transactions_lf.collect()
+    parts_root = os.path.join(columnar_cache.default_cache_dir(source), out_of_core.PARTS_DIRNAME)
+
+    # a new version of the source, whose load dies while publishing its parts
+    with open(source) as f:
+        text = f.read()
+    with open(source, "w") as f:
+        f.write(text.replace('"amount": ', '"amount": 1', 1))
+
+    def interrupted(staging, target):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(columnar_cache, "publish_dir", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        _streaming(source)
+    monkeypatch.undo()
+
+    # the published version is complete and still readable; the new one was never published
+    assert published.transactions_lf.collect().equals(expected)
+    assert all(os.path.exists(path) for path in published.parts)
+    published_dirs = [name for name in os.listdir(parts_root) if ".tmp-" not in name]
+    assert published_dirs == [os.path.basename(os.path.dirname(published.parts[0]))]
+    # the next load parses again and publishes
+    reloaded = _streaming(source)
+    assert reloaded.load_stats["source"] == "stream"
+    assert reloaded.transactions_lf.select(pl.len()).collect().item() == expected.height
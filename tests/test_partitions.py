@@ -0,0 +1,109 @@
+import datetime
+import os
+import polars as pl
+import pytest
+from bench.generate_dataset import DatasetGenerator
+from bench.partition_dataset import partition
+from data_manager import DataManager
+from utils import data_utils
+
+
+@pytest.fixture
+def single(tmp_path):
+    path = tmp_path / "dataset.json"
+    DatasetGenerator(transactions=3_000, days=120, customers=400, seed=11).write(path)
+    return str(path)
+
+
+@pytest.fixture
+def directory(single, tmp_path):
+    # January and February as JSON documents, the later months as Parquet
+    # transactions next to dataset.json with the other blocks
+    json_dir, parquet_dir, mixed = tmp_path / "json", tmp_path / "parquet", tmp_path / "mixed"
+    partition(single, json_dir, "json")
+    partition(single, parquet_dir, "parquet")
+    mixed.mkdir()
+    for name in ("2024-01.json", "2024-02.json"):
+        os.replace(json_dir / name, mixed / name)
+    for name in os.listdir(parquet_dir):
+        if name == "dataset.json" or name.endswith(("-03.parquet", "-04.parquet")):
+            os.replace(parquet_dir / name, mixed / name)
+    return mixed
+
+
+def _filters(dm, start, end):
+    return {
+        "start_date": start,
+        "end_date": end,
+        "selected_regions": dm.filters_config.availableRegions,
+        "selected_categories": dm.filters_config.availableCategories,
+        "selected_segment": "All",
+    }
+
+
+def _rows(dm, filters):
+    return data_utils.build_filter_query(dm.transactions_lf, filters, date_index=dm.date_index).collect()
+
+
+def test_directory_matches_a_single_file(single, directory):
+    whole = DataManager(single, cache=False)
+    parts = DataManager(str(directory), cache=False)
+
+    assert [p.name for p in parts.catalog.partitions] == [
+        "2024-01.json", "2024-02.json", "transactions-2024-03.parquet", "transactions-2024-04.parquet",
+    ]
+    assert parts.metadata.dateRange == whole.metadata.dateRange
+    assert parts.metadata.transactionCount == whole.metadata.transactionCount
+    assert parts.daily_metrics_df.equals(whole.daily_metrics_df)
+    for column in ("region", "category", "segment"):
+        assert sorted(parts.transactions_df[column].cast(pl.String).unique().to_list()) == sorted(whole.transactions_df[column].cast(pl.String).unique().to_list())
+    everything = _filters(whole, datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))
+    expected = _rows(whole, everything).with_columns(pl.col("region", "category", "segment").cast(pl.String))
+    found = _rows(parts, everything).with_columns(pl.col("region", "category", "segment").cast(pl.String))
+    assert found.sort("id").equals(expected.sort("id"))
+    assert parts.partials.summary(everything, parts.daily_metrics_df) == whole.partials.summary(everything, whole.daily_metrics_df)
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    (datetime.date(2024, 2, 10), datetime.date(2024, 2, 20), ["2024-02.json"]),
+    (datetime.date(2024, 2, 25), datetime.date(2024, 3, 5), ["2024-02.json", "transactions-2024-03.parquet"]),
+    (datetime.date(2024, 1, 1), datetime.date(2024, 4, 29), ["2024-01.json", "2024-02.json", "transactions-2024-03.parquet", "transactions-2024-04.parquet"]),
+    (datetime.date(2025, 1, 1), datetime.date(2025, 1, 31), []),
+])
+def test_date_filters_prune_partitions(single, directory, start, end, expected):
+    whole = DataManager(single, cache=False)
+    parts = DataManager(str(directory), cache=False)
+    filters = _filters(parts, start, end)
+
+    assert [p.name for p in parts.catalog.overlapping(start, end)] == expected
+    assert sorted(_rows(parts, filters)["id"].to_list()) == sorted(_rows(whole, filters)["id"].to_list())
+
+
+def test_region_filters_prune_partitions(directory):
+    parts = DataManager(str(directory), cache=False)
+    everything = (datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))
+
+    assert parts.catalog.overlapping(*everything, regions=["Atlantis"]) == []
+    assert len(parts.catalog.overlapping(*everything, regions=parts.filters_config.availableRegions[:1])) == 4
+
+
+def test_a_changed_part_invalidates_the_catalog(directory):
+    first = DataManager(str(directory))
+    cached = DataManager(str(directory))
+    assert cached.load_stats["source"] == "cache"
+    assert cached.version == first.version
+
+    # March is delivered again with its amounts doubled
+    march = directory / "transactions-2024-03.parquet"
+    rows = pl.read_parquet(march)
+    rows.with_columns(pl.col("amount") * 2).write_parquet(march)
+    stat = os.stat(march)
+    os.utime(march, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    changed = DataManager(str(directory))
+
+    assert changed.load_stats["source"] != "cache"
+    assert changed.version != first.version
+    month = _filters(changed, datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))
+    assert _rows(changed, month)["amount"].sum() == pytest.approx(2 * _rows(first, month)["amount"].sum())
+    january = _filters(changed, datetime.date(2024, 1, 1), datetime.date(2024, 1, 31))
+    assert _rows(changed, january).equals(_rows(first, january))
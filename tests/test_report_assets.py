@@ -0,0 +1,32 @@
+import pytest
+from utils import report_assets
+
+
+@pytest.fixture
+def no_vendor(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_assets, "VENDOR_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_inline_plotly_falls_back_to_the_package_bundle(no_vendor):
+    for bundle in (report_assets.PLOTLY_FULL, report_assets.PLOTLY_BASIC):
+        [script] = report_assets._pieces([bundle], "script", "inline")
+        assert script.startswith("<script>")
+
+
+def test_inline_basic_bundle_prefers_a_vendored_one(no_vendor):
+    (no_vendor / report_assets.PLOTLY_BASIC[1]).write_text("/* basic */")
+
+    assert list(report_assets._pieces([report_assets.PLOTLY_BASIC], "script", "inline")) == ["<script>/* basic */</script>"]
+
+
+def test_inline_without_a_vendored_file_raises(no_vendor):
+    with pytest.raises(FileNotFoundError, match="report_assets"):
+        list(report_assets.head_assets("inline"))
+
+
+def test_cdn_links_every_asset(no_vendor):
+    pieces = list(report_assets.head_assets("cdn", partial_plotly=True)) + list(report_assets.body_assets("cdn"))
+
+    assert len(pieces) == len(report_assets.STYLES) + 1 + len(report_assets.SCRIPTS)
+    assert all("https://" in piece for piece in pieces)
@@ -0,0 +1,96 @@
+import base64
+import datetime
+import json
+import zlib
+import numpy as np
+import polars as pl
+import pytest
+from utils.report_payload import SLICE_BATCH_ROWS, SLICE_KEYS, iter_columnar, iter_rows, slice_frames, slice_rollup
+
+_ARRAYS = {"Uint8Array": np.uint8, "Uint16Array": np.uint16, "Uint32Array": np.uint32, "Int32Array": np.int32, "Float64Array": np.float64}
+
+
+def _frame():
+    return pl.DataFrame({
+        "date": [datetime.date(2024, 1, day) for day in (1, 1, 2, 3, 3, 5)],
+        "amount": [10.5, 20.0, None, 7.25, 3.0, 1.0],
+        "orders": [1, 2, 3, 4, 5, 6],
+        "status": ["completed", "refunded", "completed", None, "completed", "pending"],
+        "customer_id": ["c1", "c2", "c1", "c3", "c4", "c2"],
+        "region": ["EU", "US", "EU", "EU", "US", "EU"],
+        "category": ["Books", "Books", "Toys", "Books", "Books", "Books"],
+        "segment": ["SMB", "SMB", "SMB", None, "SMB", "SMB"],
+    }).with_columns(pl.col("region").cast(pl.Categorical))
+
+
+def _decode_columnar(text):
+    # the page's decoder, in Python
+    payload = json.loads(text)
+    data = zlib.decompress(base64.b64decode(payload["data"]))
+    columns = {}
+    for column in payload["columns"]:
+        values = np.frombuffer(data, dtype=_ARRAYS[column["type"]], count=payload["rows"], offset=column["offset"])
+        if column["kind"] == "dict":
+            start, length = column["dictionary"]
+            dictionary = json.loads(data[start:start + length]) + [None]
+            columns[column["name"]] = [dictionary[code] for code in values]
+        elif column["kind"] == "date":
+            columns[column["name"]] = [None if day == -(1 << 31) else datetime.date(1970, 1, 1) + datetime.timedelta(days=int(day)) for day in values]
+        else:
+            columns[column["name"]] = [None if isinstance(value, float) and np.isnan(value) else value.item() for value in values]
+    return columns
+
+
+def test_columnar_round_trip():
+    df = _frame()
+
+    decoded = _decode_columnar("".join(iter_columnar(df)))
+
+    assert decoded == {name: [str(value) if name == "region" else value for value in df[name]] for name in df.columns}
+
+
+def test_columnar_round_trip_from_a_lazy_frame():
+    df = _frame()
+
+    assert "".join(iter_columnar(df.lazy())) == "".join(iter_columnar(df))
+
+
+def test_row_payload_round_trip_across_batches():
+    df = _frame()
+
+    rows = json.loads("".join(iter_rows(df, batch_size=4)))
+
+    assert json.loads("".join(iter_rows(df.lazy(), batch_size=4))) == rows
+
+    assert [row["customer_id"] for row in rows] == df["customer_id"].to_list()
+    assert rows[3] == {
+        "date": "2024-01-03", "amount": 7.25, "orders": 4, "status": None, "customer_id": "c3",
+        "region": "EU", "category": "Books", "segment": None,
+    }
+
+
+# one batch, one slice per batch, and batches of a few slices
+@pytest.mark.parametrize("batch_rows", [SLICE_BATCH_ROWS, 1, 3])
+def test_slice_frames_cut_the_rows_of_each_slice(batch_rows):
+    df = _frame()
+    slices = slice_rollup(df)["slices"]
+
+    chunks = list(slice_frames(df.lazy(), slices, batch_rows=batch_rows))
+
+    assert [index for index, _ in chunks] == list(range(len(slices)))
+    assert sum(chunk.height for _, chunk in chunks) == df.height
+    for (_, chunk), values in zip(chunks, slices):
+        expected = df.filter(pl.all_horizontal(pl.col(key).cast(pl.String).eq_missing(value) for key, value in zip(SLICE_KEYS, values)))
+        assert chunk.equals(expected)
+
+
+def test_slice_rollup_totals_match_the_rows():
+    df = _frame()
+
+    parts = slice_rollup(df)
+
+    assert parts["rollup"]["orders"].sum() == df.height
+    assert parts["rollup"]["amount"].sum() == df["amount"].sum()
+    # one entry per distinct customer of each slice
+    expected = df.select(SLICE_KEYS + ["customer_id"]).unique().height
+    assert parts["customers"].height == expected
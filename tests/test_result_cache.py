@@ -0,0 +1,133 @@
+import json
+import datetime
+import polars as pl
+from utils.result_cache import ResultCache, fingerprint_of, tag
+
+
+def _filters(regions, **changes):
+    return dict({
+        "start_date": datetime.date(2024, 1, 1),
+        "end_date": datetime.date(2024, 1, 31),
+        "selected_regions": regions,
+        "selected_categories": ["Books", "Toys"],
+        "selected_segment": "All",
+    }, **changes)
+
+
+def _counting(cache):
+    calls = []
+
+    @cache.memoize
+    def select(df, filters, columns=None):
+        calls.append(columns)
+        return df.select(columns or df.columns)
+
+    return select, calls
+
+
+def test_selection_order_does_not_change_the_key():
+    cache = ResultCache()
+    select, calls = _counting(cache)
+    df = tag(pl.DataFrame({"amount": [1.0], "region": ["EU"]}), ("v1", "transactions_df"))
+
+    select(df, _filters(["EU", "US"]))
+    select(df, _filters(["US", "EU"]))
+
+    assert len(calls) == 1
+    assert cache.hits == 1
+
+
+def test_column_order_is_part_of_the_key():
+    cache = ResultCache()
+    select, calls = _counting(cache)
+    df = tag(pl.DataFrame({"amount": [1.0], "region": ["EU"]}), ("v1", "transactions_df"))
+
+    first = select(df, _filters(["EU"]), columns=["region", "amount"])
+    second = select(df, _filters(["EU"]), columns=["amount", "region"])
+
+    assert len(calls) == 2
+    assert first.columns == ["region", "amount"]
+    assert second.columns == ["amount", "region"]
+
+
+def test_other_filters_and_versions_miss():
+    cache = ResultCache()
+    select, calls = _counting(cache)
+    v1 = tag(pl.DataFrame({"amount": [1.0]}), ("v1", "transactions_df"))
+    v2 = tag(pl.DataFrame({"amount": [1.0]}), ("v2", "transactions_df"))
+
+    select(v1, _filters(["EU"]))
+    select(v1, _filters(["EU"], end_date=datetime.date(2024, 2, 1)))
+    select(v1, _filters(["EU"], selected_segment="SMB"))
+    select(v2, _filters(["EU"]))
+
+    assert len(calls) == 4
+    assert cache.hits == 0
+
+
+def test_untagged_frames_are_not_cached():
+    cache = ResultCache()
+    select, calls = _counting(cache)
+    df = pl.DataFrame({"amount": [1.0]})
+
+    select(df, _filters(["EU"]))
+    select(df, _filters(["EU"]))
+
+    assert len(calls) == 2
+    assert cache.uncacheable == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_results_are_tagged_for_chained_calls():
+    cache = ResultCache()
+    select, _ = _counting(cache)
+    df = tag(pl.DataFrame({"amount": [1.0]}), ("v1", "transactions_df"))
+
+    result = select(df, _filters(["EU"]))
+
+    assert fingerprint_of(result) is not None
+
+
+def test_carry_over_keeps_results_that_end_before_the_new_data():
+    cache = ResultCache()
+    select, calls = _counting(cache)
+    df = tag(pl.DataFrame({"amount": [1.0]}), ("v1", "transactions_df"))
+    select(df, _filters(["EU"]))
+    select(df, _filters(["EU"], end_date=datetime.date(2024, 3, 31)))
+
+    cache.carry_over("v1", "v2", datetime.date(2024, 3, 1))
+    appended = tag(pl.DataFrame({"amount": [1.0, 2.0]}), ("v2", "transactions_df"))
+    select(appended, _filters(["EU"]))
+    select(appended, _filters(["EU"], end_date=datetime.date(2024, 3, 31)))
+
+    assert len(calls) == 3
+    assert cache.hits == 1
+
+
+def test_dashboard_results_survive_an_append_before_their_end_date(dataset):
+    from data_manager import DataManager, TRANSACTION_SCHEMA, _typed_frame
+    from utils import data_utils
+
+    dm = DataManager(dataset, cache=False)
+    snapshot = dm.snapshot
+    end = datetime.date.fromisoformat(snapshot.metadata.dateRange.end)
+    early = _filters(snapshot.filters_config.availableRegions, selected_categories=snapshot.filters_config.availableCategories,
+                     start_date=end - datetime.timedelta(days=20), end_date=end - datetime.timedelta(days=10))
+    late = dict(early, end_date=end + datetime.timedelta(days=1))
+    for filters in (early, late):
+        data_utils.filter_cells(snapshot.cube, filters)
+        data_utils.summarize_partials(snapshot.partials, filters, snapshot.daily_metrics_df)
+    query = data_utils.build_filter_query(snapshot.transactions_lf, early, date_index=snapshot.date_index)
+    assert fingerprint_of(query) is not None
+
+    with open(dataset) as f:
+        row = json.load(f)["transactions"][0]
+    row = dict(row, id="new-1", date=(end + datetime.timedelta(days=1)).isoformat())
+    changed = dm.append(transactions=_typed_frame([row], TRANSACTION_SCHEMA))
+    data_utils.RESULTS.carry_over(changed["previous_version"], changed["version"], changed["since"], changed["stale"])
+
+    hits, misses = data_utils.RESULTS.hits, data_utils.RESULTS.misses
+    cells = data_utils.filter_cells(dm.snapshot.cube, early)
+    data_utils.filter_cells(dm.snapshot.cube, late)
+    assert (data_utils.RESULTS.hits - hits, data_utils.RESULTS.misses - misses) == (1, 1)
+    assert cells.equals(data_utils.cube.filter_cells(dm.snapshot.cube, early))
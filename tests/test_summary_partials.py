@@ -0,0 +1,96 @@
+import datetime
+import polars as pl
+import pytest
+from bench.bench_summary import legacy_summary
+from data_manager import DataManager
+from utils.summary_partials import PARTITION_KEYS, SummaryPartials, _plan
+
+
+def _filters(dm, **changes):
+    return dict({
+        "start_date": datetime.date.fromisoformat(dm.metadata.dateRange.start),
+        "end_date": datetime.date.fromisoformat(dm.metadata.dateRange.end),
+        "selected_regions": dm.filters_config.availableRegions,
+        "selected_categories": dm.filters_config.availableCategories,
+        "selected_segment": "All",
+    }, **changes)
+
+
+def _rows(df, filters):
+    rows = df.filter(
+        pl.col("date").is_between(filters["start_date"], filters["end_date"])
+        & pl.col("region").cast(pl.String).is_in(filters["selected_regions"])
+        & pl.col("category").cast(pl.String).is_in(filters["selected_categories"])
+    )
+    if filters["selected_segment"] != "All":
+        rows = rows.filter(pl.col("segment").cast(pl.String) == filters["selected_segment"])
+    return rows
+
+
+def _distinct(df, filters):
+    return _rows(df, filters)["customer_id"].n_unique()
+
+
+def _scenarios(dm):
+    regions = dm.filters_config.availableRegions
+    return [
+        _filters(dm),
+        _filters(dm, selected_regions=regions[:2], selected_segment="SMB"),
+        _filters(dm, start_date=datetime.date(2024, 1, 10), end_date=datetime.date(2024, 1, 12), selected_categories=["Books"]),
+    ]
+
+
+def test_exact_by_default(dataset):
+    dm = DataManager(dataset, cache=False)
+
+    assert dm.partials.mode in ("bitmap", "sets")
+    for filters in _scenarios(dm):
+        assert dm.partials.count_customers(dm.partials.select(filters)) == _distinct(dm.transactions_df, filters)
+
+
+def test_summary_matches_the_rows(dataset):
+    dm = DataManager(dataset, cache=False)
+
+    for filters in _scenarios(dm):
+        expected, _, _ = legacy_summary(_rows(dm.transactions_df, filters), dm.daily_metrics_df)
+        summary = dm.partials.summary(filters, dm.daily_metrics_df)
+
+        assert summary.totalRevenue == pytest.approx(expected.totalRevenue)
+        assert summary.averageOrderValue == pytest.approx(expected.averageOrderValue)
+        assert summary.refundRate == pytest.approx(expected.refundRate)
+        assert summary.totalCustomers == expected.totalCustomers
+        assert (summary.topRegion, summary.topCategory) == (expected.topRegion, expected.topCategory)
+
+
+@pytest.mark.parametrize("mode", ["bitmap", "sets"])
+def test_exact_modes_merge_appended_batches(dataset, mode):
+    df = DataManager(dataset, cache=False).transactions_df
+    cut = df["date"].min() + datetime.timedelta(days=20)
+    first, rest = df.filter(pl.col("date") < cut), df.filter(pl.col("date") >= cut)
+
+    partials = SummaryPartials.build(first, mode=mode)
+    partials = partials.merge(SummaryPartials.build(rest, mode=mode, customers=partials.customers))
+
+    whole = SummaryPartials.build(df, mode=mode)
+    assert partials.frame.select(PARTITION_KEYS + ["orders"]).equals(whole.frame.select(PARTITION_KEYS + ["orders"]))
+    assert sorted(partials.customers.to_list()) == sorted(whole.customers.to_list())
+    for filters in [{"start_date": df["date"].min(), "end_date": df["date"].max(), "selected_regions": df["region"].cast(pl.String).unique().to_list(),
+                     "selected_categories": df["category"].cast(pl.String).unique().to_list(), "selected_segment": segment}
+                    for segment in ("All", "SMB")]:
+        assert partials.count_customers(partials.select(filters)) == _distinct(df, filters)
+
+
+def test_hll_is_close(dataset):
+    df = DataManager(dataset, cache=False).transactions_df
+    partials = SummaryPartials.build(df, mode="hll", precision=12)
+    filters = {"start_date": df["date"].min(), "end_date": df["date"].max(), "selected_regions": df["region"].cast(pl.String).unique().to_list(),
+               "selected_categories": df["category"].cast(pl.String).unique().to_list(), "selected_segment": "All"}
+
+    assert partials.count_customers(partials.select(filters)) == pytest.approx(_distinct(df, filters), rel=0.05)
+
+
+def test_plan_prefers_the_smaller_exact_sketch():
+    # many partitions with few customers each: sets; few dense partitions: bitmaps
+    assert _plan(partitions=20_000, customers=100_000, pairs=500_000, budget=8_000_000) == ("sets", None)
+    assert _plan(partitions=10, customers=1_000, pairs=5_000, budget=8_000_000) == ("bitmap", None)
+    assert _plan(partitions=20_000, customers=100_000, pairs=5_000_000, budget=1_000_000)[0] == "hll"
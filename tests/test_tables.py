@@ -0,0 +1,111 @@
+import io
+import polars as pl
+from streamlit.testing.v1 import AppTest
+from utils.data_utils import PROFILE
+from utils.ui_components import Tables
+
+
+def _frame():
+    return pl.DataFrame({
+        "id": [f"t{i:02d}" for i in range(45)],
+        "amount": [float((i * 7) % 45) for i in range(45)],
+        "region": ["Europe" if i % 3 else "Asia" for i in range(45)],
+    })
+
+
+def _app():
+    import polars as pl
+    from utils.ui_components import Tables
+
+    Tables._render_paged_table(pl.DataFrame({
+        "id": [f"t{i:02d}" for i in range(45)],
+        "amount": [float((i * 7) % 45) for i in range(45)],
+        "region": ["Europe" if i % 3 else "Asia" for i in range(45)],
+    }).lazy(), "rows")
+
+
+def _shown(at):
+    return at.dataframe[0].value
+
+
+def test_search_and_sort_run_in_polars():
+    df = _frame()
+
+    query = Tables._query(df.lazy(), "asia", "region", "amount", True)
+
+    expected = df.filter(pl.col("region") == "Asia").sort("amount", descending=True, maintain_order=True)
+    assert query.collect().equals(expected)
+    assert Tables._count(df, "asia", "All columns") == expected.height
+    assert Tables._page(df, "asia", "All columns", "amount", True, 10, 20).equals(expected.slice(10, 20))
+
+
+def test_exports_hold_the_whole_result():
+    query = Tables._query(_frame().lazy(), "europe", "All columns", "id", False)
+    expected = query.collect()
+
+    assert pl.read_csv(io.BytesIO(Tables._export_bytes(query, ".csv"))).equals(expected)
+    assert pl.read_parquet(io.BytesIO(Tables._export_bytes(query, ".parquet"))).equals(expected)
+
+
+def test_pages_through_the_result():
+    at = AppTest.from_function(_app).run()
+    assert not at.exception
+    assert _shown(at).shape[0] == 20
+    assert "Showing 1 to 20 of 45" in at.markdown[0].value
+
+    # the last page is partial
+    at.number_input(key="rows_page").set_value(3).run()
+    assert _shown(at)["id"].tolist() == [f"t{i:02d}" for i in range(40, 45)]
+    assert "Showing 41 to 45 of 45" in at.markdown[0].value
+
+
+def test_search_with_sort_and_an_empty_result():
+    at = AppTest.from_function(_app).run()
+    at.number_input(key="rows_page").set_value(3).run()
+
+    at.text_input(key="rows_search").input("asia")
+    at.selectbox(key="rows_sort").select("amount")
+    at.radio(key="rows_order").set_value("Desc").run()
+    shown = _shown(at)
+    # 15 Asia rows fit one page, so the page is moved back into range
+    assert at.number_input(key="rows_page").value == 1
+    assert set(shown["region"]) == {"Asia"} and shown.shape[0] == 15
+    assert shown["amount"].tolist() == sorted(shown["amount"], reverse=True)
+
+    at.text_input(key="rows_search").input("nowhere").run()
+    assert not at.dataframe
+    assert at.warning[0].value == "No data available for the current filters."
+
+
+def test_download_buttons_are_offered():
+    at = AppTest.from_function(_app).run()
+
+    # the bytes are produced on click, by _export_bytes
+    assert [button.proto.label for button in at.get("download_button")] == ["Download CSV", "Download Parquet"]
+
+
+def _profiled_app():
+    import polars as pl
+    from utils.data_utils import PROFILE
+    from utils.ui_components import ProfilePanel, Tables
+
+    # the table outside a run, as when its fragment reruns on its own, then a full rerun
+    Tables._render_paged_table(pl.DataFrame({"id": [f"t{i:02d}" for i in range(45)]}), "rows")
+    PROFILE.start_run()
+    with PROFILE.stage("summary"):
+        pass
+    ProfilePanel.render(PROFILE, PROFILE.finish_run())
+
+
+def test_a_table_rerunning_on_its_own_is_profiled(monkeypatch):
+    monkeypatch.setattr(PROFILE, "enabled", True)
+
+    at = AppTest.from_function(_profiled_app).run()
+
+    assert not at.exception
+    fragment, full = at.session_state["profile_runs"]
+    assert fragment["fragment"] == "rows" and "fragment" not in full
+    assert [(stage["stage"], stage["table"], stage["rows"]) for stage in fragment["stages"]] == [("table", "rows", 45)]
+    captions = [caption.value for caption in at.caption]
+    assert any(caption.startswith("Table rerun: ") for caption in captions)
+    assert "Table reruns since the previous full rerun" in captions
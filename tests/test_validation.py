@@ -0,0 +1,69 @@
+import json
+import polars as pl
+import pytest
+from data_manager import DataManager, LOADERS
+
+
+def _write_bad(dataset, tmp_path):
+    # the generated dataset with one bad row per kind of failure
+    with open(dataset) as f:
+        data = json.load(f)
+    transactions = data["transactions"]
+    transactions[0]["amount"] = "12,50"
+    transactions[1]["customer"] = "C-1"
+    transactions[2]["region"] = "Atlantis"
+    transactions[3]["date"] = "2024-13-45"
+    del transactions[4]["status"]
+    transactions[5] = "not a transaction"
+    data["dailyMetrics"][0]["orders"] = "many"
+    path = tmp_path / "bad.json"
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return str(path), [row["id"] for row in transactions[:5]]
+
+
+@pytest.mark.parametrize("loader", LOADERS)
+def test_bad_rows_are_quarantined(dataset, tmp_path, loader):
+    path, bad_ids = _write_bad(dataset, tmp_path)
+
+    dm = DataManager(path, loader=loader, cache=False)
+
+    assert dm.transactions_df.height == 2_000 - 6
+    quarantined = dm.quarantine["transactions"]
+    assert set(bad_ids) <= set(quarantined["id"].to_list())
+    errors = dict(zip(quarantined["id"].to_list(), quarantined["errors"].to_list()))
+    assert "amount:type" in errors[bad_ids[0]]
+    assert "customer.id:type" in errors[bad_ids[1]]
+    assert errors[bad_ids[2]] == ["region:allowed"]
+    assert "date:type" in errors[bad_ids[3]]
+    assert "status:type" in errors[bad_ids[4]]
+    assert dm.quarantine["dailyMetrics"].height == 1
+    assert dm.load_stats["quarantined"] == 7
+
+
+def test_loaders_build_the_same_frames(dataset, tmp_path):
+    path, _ = _write_bad(dataset, tmp_path)
+
+    frames = [DataManager(path, loader=loader, cache=False) for loader in LOADERS]
+
+    for dm in frames[1:]:
+        assert dm.transactions_df.equals(frames[0].transactions_df)
+        assert dm.daily_metrics_df.equals(frames[0].daily_metrics_df)
+        assert dm.products_df.equals(frames[0].products_df)
+        assert dm.quarantine["transactions"].sort("id").equals(frames[0].quarantine["transactions"].sort("id"))
+
+
+def test_report_mode_keeps_the_rows(dataset, tmp_path):
+    path, _ = _write_bad(dataset, tmp_path)
+
+    dm = DataManager(path, cache=False, validate="report")
+
+    assert dm.transactions_df.height == 2_000
+    assert dm.load_stats["quarantined"] == 7
+
+
+def test_off_skips_validation(dataset):
+    dm = DataManager(dataset, cache=False, validate="off")
+
+    assert dm.quarantine == {}
+    assert dm.transactions_df.height == 2_000
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+import polars as pl
+
+# Bump when the layout or the column types written to the cache change
+CACHE_FORMAT = 4
+CACHE_DIRNAME = ".kpi_cache"
+FRAMES = ("transactions", "dailyMetrics", "products")
+_META_FILE = "meta.json"
+
+
+def default_cache_dir(source_path):
+    source = Path(source_path)
+    return source.parent / CACHE_DIRNAME / source.name
+
+
+def key_dir(cache_dir, key):
+    # one subdirectory per loader/validation key, so processes loading the
+    # same source in different modes each keep their own cache
+    return Path(cache_dir) / key
+
+
+def frame_path(cache_dir, name):
+    return Path(cache_dir) / f"{name}.arrow"
+
+
+def part_path(cache_dir, index):
+    # out-of-core transactions (utils/out_of_core.py) are kept as Parquet parts
+    return Path(cache_dir) / f"transactions-{index:05d}.parquet"
+
+
+def list_parts(cache_dir):
+    return sorted(Path(cache_dir).glob("transactions-*.parquet"))
+
+
+def parts_dir(parts_root, source_path, loader):
+    # One directory per source version and loader key. A changed source gets a
+    # new directory, so parts another process is scanning are never replaced
+    # or deleted; old versions are left for the operator to remove.
+    st = _stat(source_path)
+    return Path(parts_root) / f"{loader}-{st['size']:x}-{st['mtime_ns']:x}"
+
+
+def staging_dir(target):
+    # private to this process until publish_dir renames it into place
+    path = Path(target).with_name(f"{Path(target).name}.tmp-{os.getpid()}-{uuid.uuid4().hex}")
+    path.mkdir(parents=True)
+    return path
+
+
+def publish_dir(staging, target):
+    # Atomic rename of a complete staging directory. When another process
+    # published the same version first, its copy is used and ours dropped.
+    try:
+        os.replace(staging, target)
+    except OSError:
+        if not (Path(target) / _META_FILE).exists():
+            raise
+        shutil.rmtree(staging, ignore_errors=True)
+    return Path(target)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _write_atomic(path, write):
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def load(source_path, cache_dir, loader):
+    # Returns (frames, blocks) when the sidecar matches the source file, otherwise
+    # None. With parts, frames["transactions"] is a LazyFrame scanning them.
+    cache_dir = Path(cache_dir)
+    meta_path = cache_dir / _META_FILE
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != CACHE_FORMAT or meta.get("loader") != loader:
+        return None
+
+    source = _stat(source_path)
+    if source != meta["source"]:
+        # mtime alone is unreliable (checkouts, copies); fall back to the content hash
+        if source["size"] != meta["source"]["size"] or file_sha256(source_path) != meta["sha256"]:
+            return None
+        meta["source"] = source
+        try:
+            _write_atomic(meta_path, lambda p: p.write_text(json.dumps(meta)))
+        except OSError:
+            pass  # read-only deployments just keep hashing on start
+
+    parts = [cache_dir / name for name in meta.get("parts", [])]
+    names = [name for name in (*FRAMES, *meta.get("extra_frames", [])) if not (parts and name == "transactions")]
+    if not all(path.exists() for path in parts):
+        return None
+    try:
+        # read_ipc memory maps local uncompressed files, so worker processes share
+        # the OS page cache instead of each holding a private copy
+        frames = {name: pl.read_ipc(frame_path(cache_dir, name)) for name in names}
+    except (OSError, pl.exceptions.PolarsError):
+        return None
+    if parts:
+        frames["transactions"] = pl.scan_parquet(parts)
+    return frames, meta["blocks"]
+
+
+def save(source_path, cache_dir, loader, frames, blocks, parts=()):
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    meta_path = cache_dir / _META_FILE
+    # the meta file marks a complete cache, so drop it first and write it last
+    meta_path.unlink(missing_ok=True)
+
+    source = _stat(source_path)
+    for name in frames:
+        # uncompressed IPC so the files can be memory mapped on load
+        _write_atomic(frame_path(cache_dir, name), lambda p, df=frames[name]: df.write_ipc(p, compression="uncompressed"))
+
+    meta = {
+        "format": CACHE_FORMAT,
+        "loader": loader,
+        "source": source,
+        "sha256": file_sha256(source_path),
+        "blocks": blocks,
+        # optional frames next to the dataset's own (e.g. quarantined rows)
+        "extra_frames": [name for name in frames if name not in FRAMES],
+        # Parquet parts written by part_path, holding the transactions instead of an IPC file
+        "parts": [Path(path).name for path in parts],
+    }
+    _write_atomic(meta_path, lambda p: p.write_text(json.dumps(meta)))
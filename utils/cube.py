@@ -0,0 +1,60 @@
+import polars as pl
+
+# Rollup of transactions per day and dimension combination. The dashboard's
+# charts and daily metrics are answered from these cells (the summary from
+# utils/summary_partials.py), so render cost depends on the number of cells
+# rather than the number of transactions.
+CUBE_KEYS = ["date", "region", "category", "segment", "status"]
+
+
+def build_cube(transactions_df, customers=True):
+    # Per-cell customer sets grow with the transactions; the DataManager counts
+    # customers with its summary partials and builds the cube without them.
+    aggregations = [pl.col("amount").sum().alias("amount"), pl.len().alias("orders")]
+    if customers:
+        # categorical codes of the customer ids keep the per-cell sets compact
+        aggregations.append(pl.col("customer_id").to_physical().unique().alias("customers"))
+    return transactions_df.lazy().group_by(CUBE_KEYS).agg(aggregations).sort("date").collect()
+
+
+def merge_cells(cube, cells):
+    # Adds the cells of appended transactions. Cube cells before the first new
+    # date are kept as they are; the rest are re-aggregated with the new ones.
+    if cells.is_empty():
+        return cube
+    split = cube["date"].search_sorted(cells["date"].min(), side="left")
+    aggregations = [pl.col("amount").sum(), pl.col("orders").sum()]
+    if "customers" in cube.columns:
+        aggregations.append(pl.col("customers").list.explode(keep_nulls=False, empty_as_null=False).unique())
+    merged = (
+        pl.concat([cube.slice(split), cells.select(cube.columns).cast(cube.schema)])
+        .group_by(CUBE_KEYS)
+        .agg(aggregations)
+        .cast(cube.schema)
+        .sort("date")
+    )
+    return pl.concat([cube.head(split), merged.select(cube.columns)])
+
+
+def filter_cells(cube, filters):
+    # cells are sorted by date, so the date range is a slice found by binary search
+    first = cube["date"].search_sorted(filters["start_date"], side="left")
+    last = cube["date"].search_sorted(filters["end_date"], side="right")
+    predicate = (
+        (pl.col("region").is_in(filters["selected_regions"])) &
+        (pl.col("category").is_in(filters["selected_categories"]))
+    )
+    if filters["selected_segment"] != "All":
+        predicate = predicate & (pl.col("segment") == filters["selected_segment"])
+    return cube.slice(first, max(last - first, 0)).filter(predicate)
+
+
+def _daily_stats(cells):
+    return cells.group_by("date").agg(
+        pl.col("amount").sum().alias("revenue_filtered"),
+        pl.col("orders").sum().alias("orders_filtered"),
+    )
+
+
+def get_enriched_metrics(cells, daily_metrics_df):
+    return _daily_stats(cells).join(daily_metrics_df, on="date", how="inner").sort("date")
@@ -1,33 +1,70 @@
-from models import Summary
+from utils import cube
+from utils.instrumentation import Profiler
+from utils.result_cache import ResultCache, fingerprinted
 import polars as pl
-import streamlit as st
 
-# Applies filters to the data
-@st.cache_data
-def process_and_filter(transactions_df, filters):
-    # get segment from nested struct
-    df = transactions_df.with_columns(
-        pl.col("customer").struct.field("segment").alias("segment")
-    )
-    
-    df = df.filter(
-        (pl.col("date") >= filters["start_date"]) &
-        (pl.col("date") <= filters["end_date"]) &
+# Results are keyed on the dataset version and the normalized filters rather
+# than on a hash of the frames passed in; see utils/result_cache.py
+RESULTS = ResultCache.from_env()
+# per-stage timings of a rerun, with the cache's hits and misses; see utils/instrumentation.py
+PROFILE = Profiler.from_env(cache=RESULTS)
+
+# Compiles the sidebar filters into one lazy plan so Polars can push the
+# predicate and the column projection down into the scan. With the DataManager's
+# date_index the date range is resolved to a row slice before any predicate runs.
+# The query carries the fingerprint of its inputs, so the table pages cut from
+# it are cached as well.
+@fingerprinted
+def build_filter_query(transactions, filters, columns=None, date_index=None):
+    query = transactions.lazy()
+    predicate = (
         (pl.col("region").is_in(filters["selected_regions"])) &
         (pl.col("category").is_in(filters["selected_categories"]))
     )
-    
+    if date_index is not None:
+        query = date_index.slice(query, filters["start_date"], filters["end_date"])
+    else:
+        predicate = predicate & (pl.col("date") >= filters["start_date"]) & (pl.col("date") <= filters["end_date"])
     if filters["selected_segment"] != "All":
-        df = df.filter(pl.col("segment") == filters["selected_segment"])
-        
-    return df
+        predicate = predicate & (pl.col("segment") == filters["selected_segment"])
+
+    query = query.filter(predicate)
+    if columns is not None:
+        query = query.select(columns)
+    return query
+
+# What the dashboard computes per rerun: the cube cells in range, the summary
+# and comparison merged from the partials, and the daily metrics of the cells
+@RESULTS.memoize
+def filter_cells(cube_df, filters):
+    return cube.filter_cells(cube_df, filters)
+
+@RESULTS.memoize
+def summarize_partials(partials, filters, daily_metrics_df):
+    return partials.summary(filters, daily_metrics_df)
+
+@RESULTS.memoize
+def compare_partials(partials, filters, daily_metrics_df):
+    return partials.compare(filters, daily_metrics_df)
+
+@RESULTS.memoize
+def enrich_cells(cells, daily_metrics_df):
+    return cube.get_enriched_metrics(cells, daily_metrics_df)
+
+# Applies filters to the data
+@PROFILE.timed()
+@RESULTS.memoize
+def process_and_filter(transactions, filters, columns=None, date_index=None):
+    return build_filter_query(transactions, filters, columns, date_index).collect()
 
 # trend is calculated as percentage change between first and second half of the data
-@st.cache_data
+@PROFILE.timed()
+@RESULTS.memoize
 def get_trend(df):
     if len(df) < 2:
         return "0%"
-    df_sorted = df.sort("date")
+    # DataManager keeps transactions in date order and filtering preserves it
+    df_sorted = df if df["date"].flags["SORTED_ASC"] else df.sort("date")
     mid = len(df_sorted) // 2
     first_half = df_sorted.head(mid)["amount"].sum()
     second_half = df_sorted.tail(len(df_sorted) - mid)["amount"].sum()
@@ -36,41 +73,8 @@ def get_trend(df):
         return f"{trend_val:+.1f}%"
     return "N/A"
 
-@st.cache_data
-def get_summary(df, daily_metrics_df):
-    completed_df = df.filter(pl.col("status").str.to_lowercase() == "completed")
-    refunds_df = df.filter(pl.col("status").str.to_lowercase() == "refunded")
-    # pending_df = df.filter(pl.col("status").str.to_lowercase() == "pending")
-
-
-    completed_revenue = completed_df["amount"].sum() if not completed_df.is_empty() else 0
-    # pending_revenue = pending_df["amount"].sum() if not pending_df.is_empty() else 0
-    refund_revenue = refunds_df["amount"].sum() if not refunds_df.is_empty() else 0
-    avg_order_val = completed_df["amount"].mean() if not completed_df.is_empty() else 0
-
-    calc_refund_rate = (refund_revenue / (completed_revenue) * 100) if (completed_revenue) > 0 else 0
-
-    summary = Summary(
-        totalRevenue=completed_revenue,
-        averageOrderValue=avg_order_val,
-        conversionRate=daily_metrics_df["conversionRate"].mean() if not daily_metrics_df.is_empty() else 0,
-        totalCustomers=df["customer"].struct.field("id").n_unique() if "customer" in df.columns else 0,
-        refundRate=calc_refund_rate,
-        topRegion=completed_df.group_by("region").agg(pl.col("amount").sum()).sort("amount", descending=True).head(1)["region"][0] if not completed_df.is_empty() else "N/A",
-        topCategory=completed_df.group_by("category").agg(pl.col("amount").sum()).sort("amount", descending=True).head(1)["category"][0] if not completed_df.is_empty() else "N/A"
-    )
-
-    # Re-build enriched_metrics for your charts
-    daily_stats = completed_df.group_by("date").agg([
-        pl.col("amount").sum().alias("revenue_filtered"),
-        pl.col("amount").len().alias("orders_filtered")
-    ])
-    
-    enriched_metrics = daily_stats.join(daily_metrics_df, on="date", how="inner").sort("date")
-
-    return summary, enriched_metrics
-
-@st.cache_data
+@PROFILE.timed()
+@RESULTS.memoize
 def get_enriched_metrics(df, daily_metrics_df):
     daily_stats = df.group_by("date").agg([
         pl.col("amount").sum().alias("revenue_filtered"),
@@ -0,0 +1,25 @@
+import polars as pl
+
+# Per-day row offsets of a frame sorted by date. A date range resolves to one
+# contiguous (offset, length) window with two binary searches over the days,
+# which callers turn into a zero-copy slice.
+class DateIndex:
+    def __init__(self, dates):
+        runs = dates.rle().struct.unnest()
+        self.days = runs["value"]
+        self.rows = runs["len"].cast(pl.Int64)
+        self.offsets = self.rows.cum_sum() - self.rows
+        self.total_rows = len(dates)
+
+    def _offset(self, position):
+        return self.offsets[position] if position < len(self.days) else self.total_rows
+
+    def bounds(self, start, end):
+        first = self.days.search_sorted(start, side="left")
+        last = self.days.search_sorted(end, side="right")
+        offset = self._offset(first)
+        return offset, max(self._offset(last) - offset, 0)
+
+    def slice(self, frame, start, end):
+        offset, length = self.bounds(start, end)
+        return frame.slice(offset, length)
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import polars as pl
+
+# Point budget for time-series charts, shared by the dashboard and the HTML report
+MAX_POINTS = int(os.environ.get("KPI_CHART_MAX_POINTS", 1000))
+# LTTB keeps the shape well up to this many input points per output point;
+# longer series are first rolled up into calendar buckets
+LTTB_MAX_RATIO = 10
+BUCKETS = [("1d", 1), ("1w", 7), ("1mo", 30), ("1q", 91), ("1y", 365)]
+BUCKET_LABELS = {"1d": "daily", "1w": "weekly", "1mo": "monthly", "1q": "quarterly", "1y": "yearly"}
+
+
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, per
+    # bucket, the point forming the largest triangle with its neighbours
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def pick_bucket(span_days, max_points, ratio=LTTB_MAX_RATIO):
+    for bucket, days in BUCKETS:
+        if span_days / days <= max_points * ratio:
+            return bucket
+    return BUCKETS[-1][0]
+
+
+def downsample(df, x="date", y="amount", max_points=MAX_POINTS):
+    # df holds one row per day, sorted by x. Returns (frame, bucket): long spans
+    # are summed into calendar buckets, then LTTB trims to the point budget.
+    if df.height <= max_points:
+        return df, "1d"
+
+    span_days = (df[x].max() - df[x].min()).days + 1
+    bucket = pick_bucket(span_days, max_points)
+    if bucket != "1d":
+        df = df.group_by_dynamic(x, every=bucket).agg(pl.col(y).sum())
+
+    if df.height > max_points:
+        xs = df[x].cast(pl.Int64).to_numpy().astype(np.float64)
+        ys = df[y].to_numpy().astype(np.float64)
+        df = df[lttb_indices(xs, ys, max_points)]
+    return df, bucket
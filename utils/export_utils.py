@@ -1,15 +1,104 @@
 import json
 import polars as pl
+from utils.downsampling import BUCKETS, LTTB_MAX_RATIO, MAX_POINTS
+from utils.report_assets import ASSET_MODES, body_assets, head_assets
+from utils.report_payload import PAYLOAD_FORMATS, iter_columnar, iter_frame, slice_frames, slice_rollup
 
-def generate_fully_interactive_report(dm, df):
-    # Převod na dict s ošetřením datumu (default=str)
-    # Polars -> JSON přímo (rychlejší než přes Pandas)
-    transactions_json = json.dumps(df.to_dicts(), default=str)
+# The report is produced as a sequence of text pieces: the HTML template is cut
+# at these slots and the data for each slot is streamed in between, so neither
+# the payloads nor the whole document are ever held in memory at once.
+_TRANSACTIONS = "\0transactions\0"
+_ROLLUP = "\0rollup\0"
+_CHUNKS = "\0chunks\0"
+_HEAD_ASSETS = "\0head_assets\0"
+_BODY_ASSETS = "\0body_assets\0"
+
+
+def _script_text(pieces):
+    # inline in a <script> element, so "</" must not appear literally; pieces
+    # never end inside a string, so no "</" is split across two of them
+    for piece in pieces:
+        yield piece.replace("</", "<\\/")
+
+
+def _iter_rollup(parts):
+    yield f'{{"slices": {json.dumps(parts["slices"])}, "rollup": '
+    yield from iter_columnar(parts["rollup"])
+    yield ', "customers": '
+    yield from iter_columnar(parts["customers"])
+    yield "}"
+
+
+def _iter_chunks(frame, slices, payload):
+    for key, chunk in slice_frames(frame, slices):
+        yield f'<script type="application/json" id="chunk-{key}">'
+        yield from _script_text(iter_frame(chunk, payload))
+        yield "</script>\n"
+
+
+def iter_report(dm, df, max_points=MAX_POINTS, payload="columnar", rollup=False, assets="cdn", partial_plotly=False):
+    # payload="columnar" embeds typed columns (deflated, base64), "json" row objects.
+    # rollup=True answers KPIs and charts from per-slice aggregates and embeds
+    # the raw rows per slice, decoded only when the Transactions tab is opened.
+    # assets="inline" embeds the vendored CSS/JS instead of linking CDNs;
+    # partial_plotly uses the basic Plotly bundle (scatter, bar, pie).
+    # df may be a DataFrame or a LazyFrame (e.g. the dashboard's filter query).
+    if payload not in PAYLOAD_FORMATS:
+        raise ValueError(f"Unknown payload '{payload}', expected one of {PAYLOAD_FORMATS}")
+    if assets not in ASSET_MODES:
+        raise ValueError(f"Unknown assets mode '{assets}', expected one of {ASSET_MODES}")
+
+    if rollup:
+        parts = slice_rollup(df)
+        slots = {
+            _TRANSACTIONS: iter(["null"]),
+            _ROLLUP: _script_text(_iter_rollup(parts)),
+            _CHUNKS: _iter_chunks(df, parts["slices"], payload),
+        }
+    else:
+        slots = {
+            _TRANSACTIONS: _script_text(iter_frame(df, payload)),
+            _ROLLUP: iter(["null"]),
+            _CHUNKS: iter([""]),
+        }
+    slots[_HEAD_ASSETS] = head_assets(assets, partial_plotly)
+    slots[_BODY_ASSETS] = body_assets(assets)
+
+    template = _template(dm, max_points)
+    for piece in template.split("\0"):
+        slot = f"\0{piece}\0"
+        if slot in slots:
+            yield from slots[slot]
+        else:
+            yield piece
+
+
+def write_report(target, dm, df, **options):
+    # target is a path or a text file object
+    if isinstance(target, (str, bytes)) or hasattr(target, "__fspath__"):
+        with open(target, "w", encoding="utf-8") as f:
+            return write_report(f, dm, df, **options)
+    for piece in iter_report(dm, df, **options):
+        target.write(piece)
+
+
+def generate_fully_interactive_report(dm, df, **options):
+    return "".join(iter_report(dm, df, **options))
+
+
+def _template(dm, max_points):
+    transactions_json = _TRANSACTIONS
+    rollup_json = _ROLLUP
+    chunk_scripts = _CHUNKS
+    head_assets_html = _HEAD_ASSETS
+    body_assets_html = _BODY_ASSETS
     daily_metrics_json = json.dumps(dm.daily_metrics_df.to_dicts(), default=str)
     
     available_regions = json.dumps(dm.filters_config.availableRegions)
     available_categories = json.dumps(dm.filters_config.availableCategories)
     available_segments = json.dumps(getattr(dm.filters_config, 'availableSegments', ["Enterprise", "SMB", "Individual"]))
+    # same downsampling rules as utils/downsampling.py, applied in the page after filtering
+    buckets_json = json.dumps(BUCKETS)
 
     html_content = f"""
     <!DOCTYPE html>
@@ -18,9 +107,7 @@ def generate_fully_interactive_report(dm, df):
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Business Intelligence Report</title>
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-        <link rel="stylesheet" type="text/css" href="https://cdn.datatables.net/1.13.4/css/dataTables.bootstrap5.min.css">
-        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+        {head_assets_html}
         <style>
             :root {{ 
                 --st-sidebar: #f0f2f6; 
@@ -85,16 +172,148 @@ def generate_fully_interactive_report(dm, df):
         </div>
     </div>
 
-    <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-    <script src="https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js"></script>
-    <script src="https://cdn.datatables.net/1.13.4/js/dataTables.bootstrap5.min.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+{chunk_scripts}
+    {body_assets_html}
 
     <script>
-        const rawData = {transactions_json};
+        const transactionsPayload = {transactions_json};
+        // set when the report was exported with rollup=True
+        const ROLLUP = {rollup_json};
         const rawDaily = {daily_metrics_json};
+        const MAX_POINTS = {int(max_points)};
+        const LTTB_MAX_RATIO = {LTTB_MAX_RATIO};
+        const BUCKETS = {buckets_json};
+        const BUCKET_LABELS = {{ '1w': 'weekly', '1mo': 'monthly', '1q': 'quarterly', '1y': 'yearly' }};
+        let rawData = [];
+        let rollup;
+        let selectedSlices = [];
+        let tableStale = true, tableVersion = 0;
+        const chunkRows = {{}};
         let txnTable, dailyTable;
 
+        async function inflate(base64) {{
+            const binary = atob(base64);
+            const bytes = new Uint8Array(binary.length);
+            for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+            return new Response(stream).arrayBuffer();
+        }}
+
+        // Typed column arrays from report_payload.encode_columnar
+        async function decodeColumns(payload) {{
+            const buffer = await inflate(payload.data);
+            const text = new TextDecoder();
+            const columns = {{}};
+            payload.columns.forEach(c => {{
+                const column = {{ kind: c.kind, data: new globalThis[c.type](buffer, c.offset, payload.rows) }};
+                if (c.kind === 'dict') {{
+                    const [start, length] = c.dictionary;
+                    column.values = JSON.parse(text.decode(new Uint8Array(buffer, start, length)));
+                    column.values.push(null);
+                }}
+                columns[c.name] = column;
+            }});
+            return {{ rows: payload.rows, columns }};
+        }}
+
+        const isoDays = {{}};
+        function isoDay(day) {{
+            return day === -2147483648 ? null : (isoDays[day] ??= new Date(day * 86400000).toISOString().slice(0, 10));
+        }}
+
+        function columnValue(column) {{
+            const data = column.data;
+            if (column.kind === 'dict') return i => column.values[data[i]];
+            if (column.kind === 'date') return i => isoDay(data[i]);
+            return i => Number.isNaN(data[i]) ? null : data[i];
+        }}
+
+        // Row objects for the tables, from either payload format
+        async function decodeRows(payload) {{
+            if (Array.isArray(payload)) return payload;
+            const table = await decodeColumns(payload);
+            const getters = Object.entries(table.columns).map(([name, column]) => [name, columnValue(column)]);
+            const rows = new Array(table.rows);
+            for (let i = 0; i < table.rows; i++) {{
+                const row = {{}};
+                for (const [name, get] of getters) row[name] = get(i);
+                rows[i] = row;
+            }}
+            return rows;
+        }}
+
+        async function loadRollup(spec) {{
+            const cells = await decodeColumns(spec.rollup);
+            const customers = await decodeColumns(spec.customers);
+            let customerCount = 0;
+            customers.columns.customers.data.forEach(id => {{ if (id >= customerCount) customerCount = id + 1; }});
+            return {{ slices: spec.slices, cells: {{ rows: cells.rows, ...cells.columns }}, customers: customers.columns, customerCount }};
+        }}
+
+        // Raw rows of one slice, decoded the first time they are shown
+        function sliceRows(slice) {{
+            if (!(slice in chunkRows)) {{
+                const el = document.getElementById('chunk-' + slice);
+                chunkRows[slice] = el ? decodeRows(JSON.parse(el.textContent)) : Promise.resolve([]);
+            }}
+            return chunkRows[slice];
+        }}
+
+        function lttb(xs, ys, threshold) {{
+            const n = xs.length;
+            if (threshold >= n || threshold < 3) return xs.map((_, i) => i);
+            const every = (n - 2) / (threshold - 2);
+            const selected = [0];
+            let a = 0;
+            for (let i = 0; i < threshold - 2; i++) {{
+                const start = Math.floor(i * every) + 1;
+                const end = Math.floor((i + 1) * every) + 1;
+                const nextEnd = Math.min(Math.floor((i + 2) * every) + 1, n);
+                let avgX = 0, avgY = 0;
+                for (let j = end; j < nextEnd; j++) {{ avgX += xs[j]; avgY += ys[j]; }}
+                avgX /= (nextEnd - end); avgY /= (nextEnd - end);
+                let maxArea = -1, maxIdx = start;
+                for (let j = start; j < end; j++) {{
+                    const area = Math.abs((xs[a] - avgX) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avgY - ys[a]));
+                    if (area > maxArea) {{ maxArea = area; maxIdx = j; }}
+                }}
+                a = maxIdx;
+                selected.push(a);
+            }}
+            selected.push(n - 1);
+            return selected;
+        }}
+
+        function bucketStart(dateStr, bucket) {{
+            const d = new Date(dateStr + 'T00:00:00Z');
+            if (bucket === '1w') d.setUTCDate(d.getUTCDate() - (d.getUTCDay() + 6) % 7);
+            else if (bucket === '1mo') d.setUTCDate(1);
+            else if (bucket === '1q') d.setUTCMonth(d.getUTCMonth() - d.getUTCMonth() % 3, 1);
+            else if (bucket === '1y') d.setUTCMonth(0, 1);
+            return d.toISOString().slice(0, 10);
+        }}
+
+        // Daily revenue, rolled up into calendar buckets for long spans and trimmed with LTTB
+        function trendSeries(daily) {{
+            let keys = Object.keys(daily).sort();
+            let values = keys.map(k => daily[k]);
+            let bucket = '1d';
+            if (keys.length > MAX_POINTS) {{
+                const spanDays = (Date.parse(keys[keys.length - 1]) - Date.parse(keys[0])) / 86400000 + 1;
+                bucket = (BUCKETS.find(([b, days]) => spanDays / days <= MAX_POINTS * LTTB_MAX_RATIO) || BUCKETS[BUCKETS.length - 1])[0];
+                if (bucket !== '1d') {{
+                    const rolled = {{}};
+                    keys.forEach((k, i) => {{ const b = bucketStart(k, bucket); rolled[b] = (rolled[b] || 0) + values[i]; }});
+                    keys = Object.keys(rolled).sort();
+                    values = keys.map(k => rolled[k]);
+                }}
+                const idx = lttb(keys.map(k => Date.parse(k)), values, MAX_POINTS);
+                keys = idx.map(i => keys[i]);
+                values = idx.map(i => values[i]);
+            }}
+            return {{ x: keys, y: values, label: BUCKET_LABELS[bucket] }};
+        }}
+
         function initFilters() {{
             const setup = (list, containerId, cls) => {{
                 const container = document.getElementById(containerId);
@@ -112,34 +331,92 @@ def generate_fully_interactive_report(dm, df):
             const selCat = new Set(Array.from(document.querySelectorAll('.cat-check:checked')).map(cb => cb.value));
             const selSeg = new Set(Array.from(document.querySelectorAll('.seg-check:checked')).map(cb => cb.value));
 
+            if (ROLLUP) {{
+                selectedSlices = rollup.slices.map(([reg, cat, seg]) => selReg.has(reg) && selCat.has(cat) && selSeg.has(seg));
+                updateDashboard(rollupStats(selectedSlices));
+                tableStale = true;
+                if (document.getElementById('tab-trans').classList.contains('active')) showTransactions();
+                return;
+            }}
+
             const filtered = rawData.filter(d => 
                 selReg.has(d.region) && selCat.has(d.category) && selSeg.has(d.segment)
             );
-            updateDashboard(filtered);
+            updateDashboard(rowStats(filtered));
+            updateTransactions(filtered);
+        }}
+
+        function addTo(totals, key, value) {{
+            totals[key] = (totals[key] || 0) + value;
         }}
 
-        function getTop(data, key) {{
-            const counts = {{}};
-            data.forEach(d => counts[d[key]] = (counts[d[key]] || 0) + d.amount);
-            const entries = Object.entries(counts).sort((a,b) => b[1] - a[1]);
+        function rowStats(data) {{
+            const stats = {{ revenue: 0, completedOrders: 0, orders: data.length, refundedOrders: 0, byRegion: {{}}, byCategory: {{}}, daily: {{}} }};
+            const customers = new Set();
+            data.forEach(d => {{
+                customers.add(d.customer_id);
+                addTo(stats.daily, d.date, d.amount);
+                const status = d.status ? d.status.toLowerCase() : '';
+                if (status === 'completed') {{
+                    stats.revenue += d.amount;
+                    stats.completedOrders += 1;
+                    addTo(stats.byRegion, d.region, d.amount);
+                    addTo(stats.byCategory, d.category, d.amount);
+                }}
+                else if (status === 'refunded') stats.refundedOrders += 1;
+            }});
+            stats.customers = customers.size;
+            return stats;
+        }}
+
+        // Same figures as rowStats, answered from the per-slice rollup cells
+        function rollupStats(selected) {{
+            const cells = rollup.cells;
+            const slice = cells.slice.data, date = cells.date.data, amount = cells.amount.data, orders = cells.orders.data, status = cells.status.data;
+            const completedCode = cells.status.values.indexOf('completed');
+            const refundedCode = cells.status.values.indexOf('refunded');
+            const stats = {{ revenue: 0, completedOrders: 0, orders: 0, refundedOrders: 0, byRegion: {{}}, byCategory: {{}}, daily: {{}} }};
+            for (let i = 0; i < cells.rows; i++) {{
+                if (!selected[slice[i]]) continue;
+                stats.orders += orders[i];
+                addTo(stats.daily, isoDay(date[i]), amount[i]);
+                if (status[i] === completedCode) {{
+                    const [region, category] = rollup.slices[slice[i]];
+                    stats.revenue += amount[i];
+                    stats.completedOrders += orders[i];
+                    addTo(stats.byRegion, region, amount[i]);
+                    addTo(stats.byCategory, category, amount[i]);
+                }}
+                else if (status[i] === refundedCode) stats.refundedOrders += orders[i];
+            }}
+
+            const ids = rollup.customers.customers.data, owner = rollup.customers.slice.data;
+            const seen = new Uint8Array(rollup.customerCount);
+            stats.customers = 0;
+            for (let i = 0; i < ids.length; i++) {{
+                if (selected[owner[i]] && !seen[ids[i]]) {{ seen[ids[i]] = 1; stats.customers++; }}
+            }}
+            return stats;
+        }}
+
+        function getTop(totals) {{
+            const entries = Object.entries(totals).sort((a,b) => b[1] - a[1]);
             return entries.length > 0 ? entries[0] : [ 'N/A', 0 ];
         }}
 
-        function updateDashboard(data) {{
-            const completed = data.filter(d => d.status.toLowerCase() === 'completed');
-            const totalRevenue = completed.reduce((s, d) => s + d.amount, 0);
-            const aov = completed.length > 0 ? totalRevenue / completed.length : 0;
-            const uniqueCust = new Set(data.map(d => d.customer_id)).size;
+        function updateDashboard(stats) {{
+            const totalRevenue = stats.revenue;
+            const aov = stats.completedOrders > 0 ? totalRevenue / stats.completedOrders : 0;
+            const uniqueCust = stats.customers;
             
-            const refundedCount = data.filter(d => d.status && d.status.toLowerCase() === 'refunded').length;
-            const refundRate = data.length > 0 ? (refundedCount / data.length) * 100 : 0;
+            const refundRate = stats.orders > 0 ? (stats.refundedOrders / stats.orders) * 100 : 0;
 
             const avgConvRate = rawDaily.length > 0 
                 ? (rawDaily.reduce((s, d) => s + (d.conversionRate || 0), 0) / rawDaily.length) * 100 
                 : 0;
 
-            const topRegData = getTop(completed, 'region');
-            const topCatData = getTop(completed, 'category');
+            const topRegData = getTop(stats.byRegion);
+            const topCatData = getTop(stats.byCategory);
 
             // KPI Update
             document.getElementById('kpi-rev').innerText = '$' + (totalRevenue/1e6).toFixed(2) + 'M';
@@ -161,24 +438,22 @@ def generate_fully_interactive_report(dm, df):
             const layout = {{ margin: {{ t: 40, b: 40, l: 50, r: 30 }}, font: {{ family: 'Source Sans Pro' }} }};
             
             // Line Chart
+            const trend = trendSeries(stats.daily);
             Plotly.react('line-chart', [{{ 
-                x: data.map(d=>d.date), y: data.map(d=>d.amount), 
-                type: 'scattergl', mode: 'lines', line: {{color: '#ff4b4b'}} 
-            }}], {{ title: 'Revenue Trend', ...layout }}, {{responsive: true}});
+                x: trend.x, y: trend.y, 
+                type: 'scatter', mode: 'lines', line: {{color: '#ff4b4b'}} 
+            }}], {{ title: {{ text: trend.label ? `Revenue Trend (${{trend.label}})` : 'Revenue Trend' }}, ...layout }}, {{responsive: true}});
 
             // Pie Chart -> CATEGORY
-            const catCounts = {{}};
-            completed.forEach(d => catCounts[d.category] = (catCounts[d.category] || 0) + d.amount);
+            const catCounts = stats.byCategory;
             Plotly.react('cat-pie-chart', [{{
                 values: Object.values(catCounts),
                 labels: Object.keys(catCounts),
                 type: 'pie', hole: .4
-            }}], {{ title: 'Revenue by Category', ...layout }}, {{responsive: true}});
+            }}], {{ title: {{ text: 'Revenue by Category' }}, ...layout }}, {{responsive: true}});
 
             // Bar Chart -> REGION
-            const regCounts = {{}};
-            completed.forEach(d => regCounts[d.region] = (regCounts[d.region] || 0) + d.amount);
-            const sortedReg = Object.entries(regCounts)
+            const sortedReg = Object.entries(stats.byRegion)
                 .sort((a, b) => b[1] - a[1]); // b[1] - a[1] pro sestupné řazení
 
             const regLabels = sortedReg.map(x => x[0]);
@@ -196,17 +471,29 @@ def generate_fully_interactive_report(dm, df):
                 marker: {{
                     color: colors.slice(0, regLabels.length) // Každý sloupec dostane svou barvu
                 }}
-            }}], {{ title: 'Revenue by Region', ...layout }}, {{responsive: true}});
+            }}], {{ title: {{ text: 'Revenue by Region' }}, ...layout }}, {{responsive: true}});
+        }}
 
-            // DataTables
+        function updateTransactions(data) {{
             if(txnTable) txnTable.destroy();
             txnTable = $('#txnTable').DataTable({{
                 data: data,
-                columns: [{{data:'id'}}, {{data:'date'}}, {{data:'timestamp'}}, {{data:'amount'}}, {{data:'product'}}, {{data:'productId'}}, {{data:'category'}}, {{data:'region'}}, {{data:'customer.id'}}, {{data:'paymentMethod'}}, {{data:'status'}}, {{data:'segment'}}],
+                columns: [{{data:'id'}}, {{data:'date'}}, {{data:'timestamp'}}, {{data:'amount'}}, {{data:'product'}}, {{data:'productId'}}, {{data:'category'}}, {{data:'region'}}, {{data:'customer_id'}}, {{data:'paymentMethod'}}, {{data:'status'}}, {{data:'segment'}}],
                 pageLength: 10, deferRender: true
             }});
+        }}
+
+        // Rollup mode: rows of the selected slices, loaded when the Transactions tab is shown
+        async function showTransactions() {{
+            if (!tableStale) return;
+            tableStale = false;
+            const version = ++tableVersion;
+            const slices = selectedSlices.flatMap((on, slice) => on ? [slice] : []);
+            const parts = await Promise.all(slices.map(sliceRows));
+            if (version === tableVersion) updateTransactions(parts.flat());
+        }}
 
-            if(dailyTable) dailyTable.destroy();
+        function initDailyTable() {{
             dailyTable = $('#dailyTable').DataTable({{
                 data: rawDaily,
                 columns: [{{data:'date'}}, {{data:'revenue'}}, {{data:'orders'}}, {{data:'activeUsers'}}, {{data:'newUsers'}}, {{data:'conversionRate'}}, {{data:'averageOrderValue'}}, {{data:'churnRate'}}],
@@ -215,7 +502,13 @@ def generate_fully_interactive_report(dm, df):
         }}
 
         initFilters();
-        applyFilters();
+        initDailyTable();
+        const ready = ROLLUP
+            ? loadRollup(ROLLUP).then(result => {{ rollup = result; }})
+            : decodeRows(transactionsPayload).then(rows => {{ rawData = rows; }});
+        ready.then(applyFilters);
+
+        document.querySelector('[data-bs-target="#tab-trans"]').addEventListener('shown.bs.tab', () => {{ if (ROLLUP) showTransactions(); }});
 
         // Fix pro resize grafů při přepnutí tabu
         document.querySelectorAll('button[data-bs-toggle="tab"]').forEach(el => {{
@@ -225,4 +518,25 @@ def generate_fully_interactive_report(dm, df):
     </body>
     </html>
     """
-    return html_content
\ No newline at end of file
+    return html_content
+
+
+if __name__ == "__main__":
+    import argparse
+    from data_manager import DataManager
+
+    parser = argparse.ArgumentParser(description="Write the interactive HTML report for a KPI dataset.")
+    parser.add_argument("path", nargs="?", default="data/kpi_dataset_large.json")
+    parser.add_argument("output", nargs="?", default="dashboard_report.html")
+    parser.add_argument("--payload", choices=PAYLOAD_FORMATS, default="columnar")
+    parser.add_argument("--rollup", action="store_true", help="pre-aggregated KPIs, rows loaded per slice")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS)
+    parser.add_argument("--assets", choices=ASSET_MODES, default="cdn", help="inline embeds the vendored CSS/JS (offline report)")
+    parser.add_argument("--partial-plotly", action="store_true", help="use the basic Plotly bundle (scatter, bar, pie)")
+    args = parser.parse_args()
+
+    dm = DataManager(args.path)
+    write_report(
+        args.output, dm, dm.transactions_lf, max_points=args.max_points, payload=args.payload,
+        rollup=args.rollup, assets=args.assets, partial_plotly=args.partial_plotly,
+    )
\ No newline at end of file
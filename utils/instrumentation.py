@@ -0,0 +1,177 @@
+import contextlib
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+import polars as pl
+
+# Per-stage timings of a dashboard rerun. Stages are recorded with wall time,
+# row count, resident memory growth and, given a ResultCache, its hits and
+# misses, grouped by rerun (Streamlit runs each session's script in its own
+# thread, so the current rerun is thread-local). A fragment rerunning on its
+# own starts a run of its own (see running); other stages outside a run are
+# written as they finish. Disabled, stage() and timed() cost one attribute
+# check.
+#
+# KPI_PROFILE=1 enables it (and the debug panel), KPI_PROFILE_FILE=path also
+# appends every stage to that file as a JSON line.
+
+
+def _rss_bytes():
+    # current resident set size; /proc is Linux only
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _rows(result, args):
+    # rows produced, or rows consumed when the result is not a frame
+    for value in (result, *args):
+        if isinstance(value, pl.DataFrame):
+            return value.height
+    return None
+
+
+class Profiler:
+    def __init__(self, enabled=False, path=None, cache=None, keep_runs=20):
+        self.enabled = enabled or path is not None
+        self.path = path
+        self.cache = cache
+        self.runs = deque(maxlen=keep_runs)
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, cache=None, prefix="KPI_PROFILE"):
+        return cls(
+            enabled=os.environ.get(prefix, "0") not in ("", "0"),
+            path=os.environ.get(f"{prefix}_FILE") or None,
+            cache=cache,
+        )
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _cache_counts(self):
+        # process-wide counters: concurrent sessions show up in each other's deltas
+        if self.cache is None:
+            return None, None
+        return self.cache.hits, self.cache.misses
+
+    @property
+    def running(self):
+        return getattr(self._local, "run", None) is not None
+
+    def start_run(self, **fields):
+        if self.enabled:
+            run = next(self._ids)
+            # the first run of a process is the cold start
+            self._local.run = {"run": run, "first": run == 1, "started": time.time(), **fields, "stages": []}
+
+    def finish_run(self):
+        run = getattr(self._local, "run", None)
+        self._local.run = None
+        if run is None:
+            return None
+        run["seconds"] = round(time.time() - run["started"], 6)
+        self.runs.append(run)
+        self._write(run["stages"])
+        return run
+
+    def _write(self, records):
+        if self.path is None or not records:
+            return
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with self._write_lock, open(self.path, "a") as f:
+            f.write(lines)
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        if not self.enabled:
+            yield {}
+            return
+
+        stack = self._stack()
+        run = getattr(self._local, "run", None)
+        record = self._new_record(name, fields)
+        hits, misses = self._cache_counts()
+        rss = _rss_bytes()
+        stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - started, 6)
+            stack.pop()
+            if hits is not None:
+                record["cache_hits"] = self.cache.hits - hits
+                record["cache_misses"] = self.cache.misses - misses
+            if rss is not None:
+                record["allocated_bytes"] = max(_rss_bytes() - rss, 0)
+            self._emit(record, run)
+
+    def _new_record(self, name, fields):
+        stack = self._stack()
+        run = getattr(self._local, "run", None)
+        return {
+            "run": run["run"] if run else None,
+            "stage": name,
+            "parent": stack[-1]["stage"] if stack else None,
+            **fields,
+        }
+
+    def _emit(self, record, run=None):
+        run = run or getattr(self._local, "run", None)
+        if run is not None:
+            run["stages"].append(record)
+        else:
+            self._write([record])
+
+    def record(self, name, seconds, **fields):
+        # a stage measured elsewhere, e.g. imports timed before the profiler existed
+        if self.enabled:
+            self._emit({**self._new_record(name, fields), "seconds": round(seconds, 6)})
+
+    def annotate(self, **fields):
+        # adds fields (e.g. a row count known halfway through) to the innermost stage
+        stack = self._stack() if self.enabled else None
+        if stack:
+            stack[-1].update(fields)
+
+    def in_run(self, func):
+        # func recording its stages in the calling thread's run, for work
+        # handed to a thread pool (whose threads have no run of their own)
+        run = getattr(self._local, "run", None)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            previous = getattr(self._local, "run", None)
+            self._local.run = run
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.run = previous
+        return wrapper
+
+    def timed(self, name=None):
+        def decorate(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.stage(label) as record:
+                    result = func(*args, **kwargs)
+                    record.setdefault("rows", _rows(result, args))
+                return result
+            return wrapper
+        return decorate
@@ -0,0 +1,110 @@
+import json
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = set("0123456789.eE+-")
+
+
+class _Buffer:
+    # Sliding text window over a file, refilled on demand
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        if self.eof:
+            return False
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # drop already consumed text so the window stays bounded
+        if self.pos:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        self.text += chunk
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, got {self.text[self.pos]!r}")
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+                # A number followed only by number characters up to the end of
+                # the window may still continue in the file ("12." of "12.5")
+                cut = isinstance(value, (int, float)) and not isinstance(value, bool) and _NUMBER_CHARS.issuperset(self.text[end:])
+                if not cut or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # grow reads geometrically so large values are not re-decoded too often
+            self.fill(size)
+            size *= 2
+
+
+def iter_top_level(f, array_keys, batch_size=50_000, chunk_size=1 << 20):
+    # Yields (key, value) for each member of the top-level JSON object.
+    # Members listed in array_keys are not decoded as a whole: their value is a
+    # generator of lists with at most batch_size items, which must be consumed
+    # before advancing to the next member.
+    buf = _Buffer(f, chunk_size)
+    buf.expect("{")
+    if buf.peek() == "}":
+        return
+    while True:
+        key = buf.decode()
+        buf.expect(":")
+        if key in array_keys and buf.peek() == "[":
+            batches = _iter_array_batches(buf, batch_size)
+            yield key, batches
+            # drain whatever the caller did not consume
+            for _ in batches:
+                pass
+        else:
+            yield key, buf.decode()
+
+        if buf.peek() == ",":
+            buf.pos += 1
+            continue
+        buf.expect("}")
+        return
+
+
+def _iter_array_batches(buf, batch_size):
+    buf.expect("[")
+    if buf.peek() == "]":
+        buf.pos += 1
+        return
+    batch = []
+    while True:
+        batch.append(buf.decode())
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+        if buf.peek() == ",":
+            buf.pos += 1
+            continue
+        buf.expect("]")
+        break
+    if batch:
+        yield batch
@@ -0,0 +1,39 @@
+import os
+import polars as pl
+
+# Opt-in out-of-core mode for datasets larger than memory (KPI_STREAMING=1, or
+# DataManager(streaming=True)). The transactions are parsed, validated and
+# normalized in bounded batches and written as Parquet parts next to the
+# columnar cache; queries scan the parts, and every collect() in the process
+# runs on Polars' streaming engine. The cube (without per-cell customer sets),
+# daily metrics, products and distinct customer ids stay in memory and grow
+# with the days, dimension values and customers; the summary partials'
+# customer sketches are capped by the memory limit.
+ENABLED = os.environ.get("KPI_STREAMING", "0") not in ("", "0")
+MEMORY_LIMIT_MB = int(os.environ.get("KPI_MEMORY_LIMIT_MB", 1024))
+PARTS_DIRNAME = "out_of_core"
+# rough bytes of one transaction in flight while parsing: the decoded dict,
+# the typed batch and its normalized copy
+ROW_BYTES = 2048
+MIN_BATCH_ROWS = 1_000
+# Polars' own morsel size; the memory limit only ever lowers it
+MAX_MORSEL_ROWS = 100_000
+
+
+def batch_rows(memory_limit_mb=MEMORY_LIMIT_MB):
+    # a quarter of the limit for the batch being parsed, the rest for the
+    # in-memory aggregates and the streaming engine
+    return max(memory_limit_mb * 1024 * 1024 // 4 // ROW_BYTES, MIN_BATCH_ROWS)
+
+
+def sketch_budget(memory_limit_mb=MEMORY_LIMIT_MB):
+    return memory_limit_mb * 1024 * 1024 // 4
+
+
+def enable(memory_limit_mb=MEMORY_LIMIT_MB):
+    # Process-wide: the dashboard's filters, summaries, charts, table pages and
+    # exports all collect through the streaming engine, in morsels small
+    # enough for every thread to hold one batch's worth at once
+    pl.Config.set_engine_affinity("streaming")
+    morsel = min(batch_rows(memory_limit_mb) // pl.thread_pool_size(), MAX_MORSEL_ROWS)
+    pl.Config.set_streaming_chunk_size(max(morsel, MIN_BATCH_ROWS))
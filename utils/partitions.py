@@ -0,0 +1,70 @@
+import polars as pl
+from utils.date_index import DateIndex
+
+# Transactions of a dataset directory, one partition per file (e.g. a month of
+# history), with each partition's date range and dimension values. A date range
+# only touches the partitions overlapping it: the catalog stands in for the
+# DataManager's DateIndex, so every filter query is pruned the same way.
+PARTITION_SUFFIXES = (".json", ".parquet")
+
+
+class Partition:
+    def __init__(self, name, frame):
+        self.name = name
+        self.frame = frame  # normalized and sorted by date; memory mapped when read from the cache
+        self.rows = frame.height
+        self.start = frame["date"][0] if frame.height else None
+        self.end = frame["date"][-1] if frame.height else None
+        self.regions = frame["region"].unique().drop_nulls().cast(pl.String).sort().to_list()
+        self.categories = frame["category"].unique().drop_nulls().cast(pl.String).sort().to_list()
+        self.index = DateIndex(frame["date"])
+
+    def overlaps(self, start, end, regions=None, categories=None):
+        return (
+            self.rows > 0 and self.start <= end and self.end >= start
+            and (regions is None or not set(regions).isdisjoint(self.regions))
+            and (categories is None or not set(categories).isdisjoint(self.categories))
+        )
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "rows": self.rows,
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "regions": self.regions,
+            "categories": self.categories,
+        }
+
+
+class PartitionCatalog:
+    def __init__(self, partitions):
+        self.partitions = sorted((p for p in partitions if p.rows), key=lambda p: (p.start, p.end, p.name))
+
+    def frame(self):
+        # all partitions as one frame; no copy, the chunks stay those of the partitions
+        frames = [p.frame for p in self.partitions]
+        return pl.concat(frames, rechunk=False) if frames else None
+
+    def overlapping(self, start, end, regions=None, categories=None):
+        return [p for p in self.partitions if p.overlaps(start, end, regions, categories)]
+
+    def slice(self, frame, start, end):
+        # DateIndex.slice for a partitioned frame (DataManager.transactions_lf):
+        # the rows in range, read from the overlapping partitions only
+        overlapping = self.overlapping(start, end)
+        if len(overlapping) == len(self.partitions):
+            # nothing to prune; one predicate is cheaper than a union of slices
+            return frame.lazy().filter(pl.col("date").is_between(start, end))
+        parts = [p.index.slice(p.frame.lazy(), start, end) for p in overlapping]
+        return pl.concat(parts) if parts else frame.lazy().clear()
+
+    def cast(self, column, dtype):
+        return PartitionCatalog([Partition(p.name, p.frame.with_columns(pl.col(column).cast(dtype))) for p in self.partitions])
+
+    def add(self, name, frame):
+        # appended rows become a partition of their own
+        return PartitionCatalog([*self.partitions, Partition(name, frame)])
+
+    def describe(self):
+        return [p.describe() for p in self.partitions]
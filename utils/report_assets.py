@@ -0,0 +1,104 @@
+import functools
+import os
+import urllib.request
+
+# Third-party CSS/JS of the HTML report. "cdn" links them (the report needs
+# network access when opened), "inline" embeds the vendored copies from
+# assets/vendor so the report works offline. Fetch those once with
+#   python -m utils.report_assets
+ASSET_MODES = ("cdn", "inline")
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "vendor")
+
+PLOTLY_VERSION = "2.35.2"
+STYLES = [
+    ("https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css", "bootstrap-5.3.0.min.css"),
+    ("https://cdn.datatables.net/1.13.4/css/dataTables.bootstrap5.min.css", "dataTables.bootstrap5-1.13.4.min.css"),
+]
+SCRIPTS = [
+    ("https://code.jquery.com/jquery-3.6.0.min.js", "jquery-3.6.0.min.js"),
+    ("https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js", "jquery.dataTables-1.13.4.min.js"),
+    ("https://cdn.datatables.net/1.13.4/js/dataTables.bootstrap5.min.js", "dataTables.bootstrap5-1.13.4.min.js"),
+    ("https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js", "bootstrap.bundle-5.3.0.min.js"),
+]
+PLOTLY_FULL = (f"https://cdn.plot.ly/plotly-{PLOTLY_VERSION}.min.js", f"plotly-{PLOTLY_VERSION}.min.js")
+# scatter, bar and pie traces only, which is all the report draws (about a third of the full bundle)
+PLOTLY_BASIC = (f"https://cdn.plot.ly/plotly-basic-{PLOTLY_VERSION}.min.js", f"plotly-basic-{PLOTLY_VERSION}.min.js")
+
+
+def _plotly_package_bundle():
+    # plotly.py ships a full plotly.js, usable when nothing was vendored
+    try:
+        import plotly
+    except ImportError:
+        return None
+    return os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+
+
+def _candidates(asset):
+    # An inline report must not need the network: an unvendored basic bundle
+    # is replaced by the full one (a larger report, same charts), and either
+    # falls back to the copy shipped with the plotly package
+    paths = [os.path.join(VENDOR_DIR, asset[1])]
+    if asset == PLOTLY_BASIC:
+        paths.append(os.path.join(VENDOR_DIR, PLOTLY_FULL[1]))
+    if asset in (PLOTLY_FULL, PLOTLY_BASIC) and _plotly_package_bundle():
+        paths.append(_plotly_package_bundle())
+    return paths
+
+
+@functools.lru_cache(maxsize=None)
+def _inline(path, tag):
+    # read once per process; "</tag" would end the element early
+    with open(path, encoding="utf-8") as f:
+        text = f.read().replace(f"</{tag}", f"<\\/{tag}")
+    return f"<{tag}>{text}</{tag}>"
+
+
+def _link(url, tag):
+    if tag == "style":
+        return f'<link rel="stylesheet" href="{url}">'
+    return f'<script src="{url}"></script>'
+
+
+def _pieces(assets, tag, mode):
+    for asset in assets:
+        if mode == "inline":
+            path = next((path for path in _candidates(asset) if os.path.exists(path)), None)
+            if path is None:
+                raise FileNotFoundError(
+                    f"{asset[1]} is not vendored in {VENDOR_DIR}; run python -m utils.report_assets, or use the cdn assets mode"
+                )
+            yield _inline(path, tag)
+        else:
+            yield _link(asset[0], tag)
+
+
+def head_assets(mode="cdn", partial_plotly=False):
+    yield from _pieces(STYLES, "style", mode)
+    yield from _pieces([PLOTLY_BASIC if partial_plotly else PLOTLY_FULL], "script", mode)
+
+
+def body_assets(mode="cdn"):
+    yield from _pieces(SCRIPTS, "script", mode)
+
+
+def download(force=False):
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    for url, file_name in STYLES + SCRIPTS + [PLOTLY_FULL, PLOTLY_BASIC]:
+        path = os.path.join(VENDOR_DIR, file_name)
+        if os.path.exists(path) and not force:
+            continue
+        with urllib.request.urlopen(url) as response:
+            data = response.read()
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"{file_name}: {len(data)} bytes")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Download the report's CSS/JS into assets/vendor for offline reports.")
+    parser.add_argument("--force", action="store_true", help="download again even if a file exists")
+    args = parser.parse_args()
+    download(force=args.force)
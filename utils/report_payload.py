@@ -0,0 +1,192 @@
+import base64
+import json
+import zlib
+import polars as pl
+from utils.cube import build_cube
+
+# Transaction payloads for the HTML report, produced as JSON text in pieces so
+# a report never holds a whole payload's text in memory. Frames may be
+# DataFrames or LazyFrames; lazy ones are collected once (columnar: each
+# column is released once encoded) or batch by batch (json).
+#
+# Columnar format: one binary blob holding a typed array per column (and the
+# JSON dictionaries of the text columns), deflated and base64-encoded, plus a
+# small header describing where each column sits. The page inflates it with
+# DecompressionStream and reads the columns as typed arrays.
+PAYLOAD_FORMATS = ("columnar", "json")
+_ALIGN = 8
+ROW_BATCH = 20_000
+# rows of the slices slice_frames collects at once (a larger slice is collected on its own)
+SLICE_BATCH_ROWS = 500_000
+# the report's filters; each combination of their values is one slice
+SLICE_KEYS = ["region", "category", "segment"]
+
+
+def _code_type(size):
+    if size <= 0xFF:
+        return pl.UInt8, "Uint8Array"
+    if size <= 0xFFFF:
+        return pl.UInt16, "Uint16Array"
+    return pl.UInt32, "Uint32Array"
+
+
+def _encode_column(series):
+    dtype = series.dtype
+    if dtype == pl.Date:
+        # days since the epoch; the page turns them back into ISO dates
+        return {"kind": "date", "type": "Int32Array"}, series.cast(pl.Int32).fill_null(-1 << 31)
+    if dtype.is_integer() and series.null_count() == 0 and (series.is_empty() or (series.min() >= -(1 << 31) and series.max() < 1 << 31)):
+        return {"kind": "number", "type": "Int32Array"}, series.cast(pl.Int32)
+    if dtype.is_float() or dtype.is_integer():
+        return {"kind": "number", "type": "Float64Array"}, series.cast(pl.Float64).fill_null(float("nan"))
+
+    # everything else is dictionary-encoded text; null gets the code after the last value
+    text = series.cast(pl.String)
+    values = text.drop_nulls().unique(maintain_order=True).to_list()
+    code_dtype, array_type = _code_type(len(values) + 1)
+    codes = text.cast(pl.Enum(values)).to_physical().cast(code_dtype).fill_null(len(values))
+    return {"kind": "dict", "type": array_type, "values": values}, codes
+
+
+class _Base64Deflate:
+    # deflate + base64 over a sequence of writes; base64 is emitted in whole
+    # 3-byte groups so the pieces concatenate into one valid string
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level)
+        self.pending = b""
+
+    def _encode(self, data, final=False):
+        data = self.pending + data
+        cut = len(data) if final else len(data) - len(data) % 3
+        self.pending = data[cut:]
+        return base64.b64encode(data[:cut]).decode("ascii")
+
+    def write(self, raw):
+        return self._encode(self.compressor.compress(raw))
+
+    def finish(self):
+        return self._encode(self.compressor.flush(), final=True)
+
+
+def iter_columnar(frame, level=1):
+    # a copy we own, so its columns can be dropped as they are encoded
+    frame = frame.collect() if isinstance(frame, pl.LazyFrame) else frame.clone()
+    yield f'{{"format": "columnar", "rows": {frame.height}, "data": "'
+    stream = _Base64Deflate(level)
+    columns = []
+    offset = 0
+
+    def append(raw):
+        nonlocal offset
+        start = offset
+        # typed array views need offsets aligned to their element size
+        padding = -len(raw) % _ALIGN
+        offset += len(raw) + padding
+        return (start, len(raw)), stream.write(raw + b"\0" * padding)
+
+    for name in frame.columns:
+        spec, data = _encode_column(frame.drop_in_place(name))
+        (spec["offset"], _), text = append(data.to_numpy().tobytes())
+        yield text
+        if "values" in spec:
+            spec["dictionary"], text = append(json.dumps(spec.pop("values")).encode())
+            yield text
+        columns.append({"name": name, **spec})
+
+    yield stream.finish()
+    yield f'", "columns": {json.dumps(columns)}}}'
+
+
+def _batches(frame, batch_size):
+    if isinstance(frame, pl.LazyFrame):
+        # one scan, rather than one per slice offset
+        yield from frame.collect_batches(chunk_size=batch_size)
+    else:
+        for start in range(0, frame.height, batch_size):
+            yield frame.slice(start, batch_size)
+
+
+def iter_rows(frame, batch_size=ROW_BATCH):
+    yield "["
+    first = True
+    for batch in _batches(frame, batch_size):
+        if batch.is_empty():
+            continue
+        text = json.dumps(batch.to_dicts(), default=str)[1:-1]
+        yield text if first else "," + text
+        first = False
+    yield "]"
+
+
+def iter_frame(frame, payload):
+    # JSON text of the frame in the given payload format, in pieces
+    if payload == "columnar":
+        return iter_columnar(frame)
+    return iter_rows(frame)
+
+
+def slice_rollup(frame):
+    # Rollup for the pre-aggregated report: cube cells keyed by slice id and
+    # the distinct customers of each slice. Raw rows are fetched per slice by
+    # slice_frames, so the page only decodes the slices it shows.
+    cells = build_cube(frame)
+    slices = cells.select(SLICE_KEYS).unique().sort(SLICE_KEYS).with_row_index("slice").with_columns(pl.col("slice").cast(pl.Int32))
+    cells = cells.join(slices, on=SLICE_KEYS, nulls_equal=True)
+
+    rollup = cells.select("date", "slice", "status", "amount", "orders").sort("slice", "date", "status")
+    customers = (
+        cells.select("slice", "customers").explode("customers").drop_nulls()
+        # dense ids so the page can dedupe them in a flat array
+        .with_columns((pl.col("customers").rank("dense") - 1).cast(pl.Int32))
+        .unique().sort("slice", "customers")
+    )
+    return {
+        "slices": slices.drop("slice").with_columns(pl.all().cast(pl.String)).rows(),
+        "rollup": rollup,
+        "customers": customers,
+    }
+
+
+def _slice_batches(lengths, batch_rows):
+    # consecutive slice ids grouped into runs of at most batch_rows rows
+    batch, rows = [], 0
+    for index, length in enumerate(lengths):
+        if batch and rows + length > batch_rows:
+            yield batch
+            batch, rows = [], 0
+        batch.append(index)
+        rows += length
+    if batch:
+        yield batch
+
+
+def slice_frames(frame, slices, batch_rows=SLICE_BATCH_ROWS):
+    # (slice id, rows of that slice) for each slice of slice_rollup. A scan of
+    # the slice keys counts each slice's rows; then the slices are collected
+    # in batches of about batch_rows rows: a batch's rows are tagged with their
+    # slice id and sorted by it in one pass, then cut into contiguous
+    # (zero-copy) ranges. Filtering once per slice would read every row once
+    # per slice; collecting everything at once would hold every filtered row.
+    keys = [f"_slice_{key}" for key in SLICE_KEYS]
+    ids = pl.DataFrame(slices, schema={key: pl.String for key in keys}, orient="row").with_row_index("_slice")
+    tagged = (
+        frame.lazy()
+        .with_columns(pl.col(key).cast(pl.String).alias(alias) for key, alias in zip(SLICE_KEYS, keys))
+        .join(ids.lazy(), on=keys, nulls_equal=True, maintain_order="left")
+        .drop(keys)
+    )
+    counts = dict(tagged.group_by("_slice").len().collect().iter_rows())
+    lengths = [counts.get(index, 0) for index in range(len(slices))]
+
+    for batch in _slice_batches(lengths, batch_rows):
+        rows = (
+            tagged.filter(pl.col("_slice").is_between(batch[0], batch[-1]))
+            # stable, so each slice keeps the frame's row order
+            .sort("_slice", maintain_order=True)
+            .drop("_slice")
+            .collect()
+        )
+        start = 0
+        for index in batch:
+            yield index, rows.slice(start, lengths[index])
+            start += lengths[index]
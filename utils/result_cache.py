@@ -0,0 +1,241 @@
+import datetime
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import polars as pl
+
+# Frames (and indexes) produced by DataManager or by a cached function carry a fingerprint
+# (dataset version + how they were derived). Cache keys are built from these
+# fingerprints and the normalized filters, so large frames are never hashed.
+_fingerprints = {}
+# re-entrant: finalizers may run during garbage collection while the lock is held
+_fingerprints_lock = threading.RLock()
+
+
+def _forget(obj_id):
+    with _fingerprints_lock:
+        _fingerprints.pop(obj_id, None)
+
+
+def tag(obj, fingerprint):
+    with _fingerprints_lock:
+        known = fingerprint_of(obj) is not None
+        _fingerprints[id(obj)] = (weakref.ref(obj), fingerprint)
+    if not known:
+        weakref.finalize(obj, _forget, id(obj))
+    return obj
+
+
+def fingerprint_of(obj):
+    entry = _fingerprints.get(id(obj))
+    if entry is not None and entry[0]() is obj:
+        return entry[1]
+    return None
+
+
+class Uncacheable(Exception):
+    pass
+
+
+def fingerprinted(func):
+    # Tags the result with the key memoize would give it, without storing it:
+    # for results that are cheap to build (e.g. a lazy query) but are passed
+    # on to cached functions
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        value = func(*args, **kwargs)
+        try:
+            tag(value, (func.__qualname__, _normalize(args), _normalize(kwargs)))
+        except Uncacheable:
+            pass
+        return value
+    return wrapper
+
+
+def _normalize(value):
+    if value is None or isinstance(value, (str, int, float, bool, datetime.date)):
+        return value
+    fingerprint = fingerprint_of(value)
+    if fingerprint is not None:
+        return fingerprint
+    if isinstance(value, dict):
+        return tuple(sorted(
+            (key, _normalize_selection(item) if key in SELECTION_KEYS else _normalize(item)) for key, item in value.items()
+        ))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    # frames (or anything else) without a fingerprint
+    raise Uncacheable
+
+
+# Filter keys whose values are sets of dimension values: ["EU", "US"] and
+# ["US", "EU"] match the same rows. Every other list (e.g. a column list)
+# keeps its order.
+SELECTION_KEYS = {"selected_regions", "selected_categories"}
+
+
+def _normalize_selection(value):
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return tuple(sorted(value))
+    return _normalize(value)
+
+
+def _estimate_bytes(value):
+    if isinstance(value, pl.DataFrame):
+        return value.estimated_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_estimate_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _version_names(key, version):
+    # names of the DataManager frames of `version` a cache key was derived from
+    if isinstance(key, tuple):
+        if len(key) == 2 and key[0] == version and isinstance(key[1], str):
+            return {key[1]}
+        return set().union(*(_version_names(item, version) for item in key))
+    return set()
+
+
+def _end_date(key):
+    # latest end_date of the normalized filters in a cache key
+    if not isinstance(key, tuple):
+        return None
+    if len(key) == 2 and key[0] == "end_date" and isinstance(key[1], datetime.date):
+        return key[1]
+    dates = [date for date in map(_end_date, key) if date is not None]
+    return max(dates) if dates else None
+
+
+def _replace(key, old, new):
+    if isinstance(key, tuple):
+        return tuple(_replace(item, old, new) for item in key)
+    return new if key == old else key
+
+
+class ResultCache:
+    # LRU result cache with optional TTL and a memory ceiling.
+    def __init__(self, max_entries=256, max_bytes=512 * 1024 * 1024, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, size, created)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    @classmethod
+    def from_env(cls, prefix="KPI_RESULT_CACHE"):
+        ttl = os.environ.get(f"{prefix}_TTL_SECONDS")
+        return cls(
+            max_entries=int(os.environ.get(f"{prefix}_MAX_ENTRIES", 256)),
+            max_bytes=int(os.environ.get(f"{prefix}_MAX_MB", 512)) * 1024 * 1024,
+            ttl_seconds=float(ttl) if ttl else None,
+        )
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[2] > self.ttl_seconds:
+                self._drop(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], True
+
+    def put(self, key, value):
+        size = _estimate_bytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def carry_over(self, previous_version, version, since, stale=()):
+        # After an append (DataManager.append): results of the previous version
+        # whose filters end before `since` are unaffected and are re-keyed to
+        # the new version; the rest of that version, and anything derived from
+        # a frame named in `stale`, is dropped. Other datasets are left alone.
+        with self._lock:
+            entries = self._entries
+            self._entries = OrderedDict()
+            self._bytes = 0
+            for key, (value, size, created) in entries.items():
+                names = _version_names(key, previous_version)
+                if names:
+                    end_date = _end_date(key)
+                    if end_date is None or end_date >= since or names & set(stale):
+                        self.evictions += 1
+                        continue
+                    key = _replace(key, previous_version, version)
+                    if isinstance(value, pl.DataFrame):
+                        tag(value, key)
+                self._entries[key] = (value, size, created)
+                self._bytes += size
+
+    def memoize(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = (func.__qualname__, _normalize(args), _normalize(kwargs))
+            except Uncacheable:
+                # an argument without a fingerprint: compute, but do not cache
+                with self._lock:
+                    self.uncacheable += 1
+                return func(*args, **kwargs)
+
+            value, found = self.get(key)
+            if not found:
+                value = func(*args, **kwargs)
+                if isinstance(value, pl.DataFrame):
+                    # so functions called on this result can be cached as well
+                    tag(value, key)
+                self.put(key, value)
+            return value
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "uncacheable": self.uncacheable,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    def write_stats(self, path):
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(self.stats(), f)
+        os.replace(tmp, path)
@@ -0,0 +1,363 @@
+import collections
+import datetime
+import math
+import os
+import numpy as np
+import polars as pl
+from models import Summary
+
+# Summary KPIs as mergeable partial aggregates, one row per day and dimension
+# combination (a partition). Sums and counts add up; the distinct customers of
+# a partition are kept as a sketch that merges by union. Customers are numbered
+# densely in the order first seen (SummaryPartials.customers), and a sketch is
+# exact while it fits the budget: a bitmap over those numbers per partition
+# ("bitmap"), or the sorted numbers of each partition's customers ("sets"),
+# whichever is smaller. Otherwise it is a HyperLogLog ("hll").
+# A filter state merges the partitions it selects, so its cost follows the
+# number of days and dimension values, not the number of transactions, and
+# appended data only adds (or merges into) partitions.
+PARTITION_KEYS = ["date", "region", "category", "segment"]
+# Memory for the sketches of all partitions: at most SKETCH_ROW_BYTES per
+# transaction (exact sets take 4 bytes per distinct customer of a partition,
+# so they always fit) and at most SKETCH_BUDGET. Beyond that a HyperLogLog
+# with 2^precision one-byte registers per partition, as precise as the budget
+# allows (relative error about 1.04 / sqrt(2^precision), 3% at precision 10)
+SKETCH_BUDGET = int(os.environ.get("KPI_SUMMARY_SKETCH_MB", 64)) * 1024 * 1024
+SKETCH_ROW_BYTES = 16
+MIN_PRECISION, MAX_PRECISION = 6, 14
+SKETCH_MODES = ("bitmap", "sets", "hll")
+# periods compared with the selected range by SummaryPartials.compare
+COMPARISONS = ("previous", "last_year")
+
+
+def _splitmix64(values):
+    # well-mixed 64-bit hashes of the customer codes, the same in every process
+    with np.errstate(over="ignore"):
+        z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _hll_registers(codes, precision):
+    # register index from the top bits, rank = leading zeros of the rest + 1
+    hashes = _splitmix64(codes)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = ((hashes << np.uint64(precision)) >> np.uint64(32)).astype(np.float64)
+    bit_length = np.zeros(len(rest)) if rest.size == 0 else np.floor(np.log2(np.maximum(rest, 1))) + 1
+    rank = np.where(rest > 0, 33 - bit_length, 33).astype(np.uint8)
+    return index, rank
+
+
+def _year_earlier(day):
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:  # 29 February
+        return day.replace(year=day.year - 1, day=28)
+
+
+def comparison_periods(start, end):
+    # the selected range, the equally long period right before it, and the same dates a year earlier
+    days = (end - start).days + 1
+    return {
+        "current": (start, end),
+        "previous": (start - datetime.timedelta(days=days), start - datetime.timedelta(days=1)),
+        "last_year": (_year_earlier(start), _year_earlier(end)),
+    }
+
+
+def budget_for(rows, budget=SKETCH_BUDGET):
+    return min(budget, max(rows, 1) * SKETCH_ROW_BYTES)
+
+
+def _plan(partitions, customers, pairs, budget):
+    # (mode, precision): the smaller exact sketch if it fits the budget,
+    # otherwise the most precise HyperLogLog that does. pairs is the number of
+    # distinct (partition, customer) pairs, or an upper bound on it
+    bitmaps, sets = partitions * (customers // 8 + 1), pairs * 4
+    if min(bitmaps, sets) <= budget:
+        return ("bitmap" if bitmaps <= sets else "sets"), None
+    fit = int(math.log2(max(budget // max(partitions, 1), 1)))
+    return "hll", min(max(fit, MIN_PRECISION), MAX_PRECISION)
+
+
+def _encode_customers(ids, customers):
+    # dense codes of the customer ids; customers (the ids numbered so far, in
+    # code order) keeps its codes and is extended with the new ids
+    ids = ids.cast(pl.String)
+    known = customers if customers is not None else pl.Series("customer_id", [], dtype=pl.String)
+    new = ids.drop_nulls().unique(maintain_order=True)
+    customers = pl.concat([known, new.filter(~new.is_in(known.implode()))]).rename("customer_id")
+    codes = (
+        ids.rename("customer_id").to_frame()
+        .join(customers.to_frame().with_row_index("code"), on="customer_id", how="left", maintain_order="left")
+        ["code"]
+    )
+    return codes, customers
+
+
+def _partition_codes(frame, transactions_df, customers):
+    # (partition row number, customer code) of every transaction with a
+    # customer, and the customers numbered so far
+    partition = (
+        transactions_df.select(PARTITION_KEYS)
+        .join(frame.select(PARTITION_KEYS).with_row_index("partition"), on=PARTITION_KEYS, how="left", nulls_equal=True, maintain_order="left")
+        ["partition"].to_numpy().astype(np.int64)
+    )
+    codes, customers = _encode_customers(transactions_df["customer_id"], customers)
+    if codes.null_count():
+        # rows without a customer (kept by validate="report") add no customer
+        known = codes.is_not_null().to_numpy()
+        partition, codes = partition[known], codes.drop_nulls()
+    return partition, codes.to_numpy().astype(np.int64), customers
+
+
+# The "sets" sketches of all partitions: the sorted distinct codes of partition
+# i are codes[offsets[i]:offsets[i + 1]]
+CustomerSets = collections.namedtuple("CustomerSets", ["offsets", "codes"])
+
+
+def _pairs(partition, codes):
+    # distinct (partition, code) pairs as sortable 64-bit keys
+    return np.unique(partition.astype(np.int64) << 32 | codes.astype(np.int64))
+
+
+def _sets(partitions, keys):
+    partition = keys >> 32
+    return CustomerSets(np.searchsorted(partition, np.arange(partitions + 1)), (keys & 0xFFFFFFFF).astype(np.int32))
+
+
+def _set_pairs(sets):
+    # (partition, code) of every entry
+    return np.repeat(np.arange(len(sets.offsets) - 1), np.diff(sets.offsets)), sets.codes
+
+
+def _allocate(mode, precision, partitions, customers):
+    width = customers // 8 + 1 if mode == "bitmap" else 1 << precision
+    return np.zeros((partitions, width), dtype=np.uint8)
+
+
+def _fill(sketches, mode, precision, partition, codes):
+    if mode == "bitmap":
+        np.bitwise_or.at(sketches, (partition, codes >> 3), (1 << (codes & 7)).astype(np.uint8))
+    else:
+        index, rank = _hll_registers(codes, precision)
+        np.maximum.at(sketches, (partition, index), rank)
+
+
+def _hll_estimate(registers):
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        # small range correction (linear counting)
+        estimate = m * math.log(m / zeros)
+    return round(estimate)
+
+
+class SummaryPartials:
+    def __init__(self, frame, sketches, mode, precision=None, customers=None):
+        self.frame = frame  # partitions sorted by date
+        self.sketches = sketches  # CustomerSets, or one row of bytes per partition
+        self.mode = mode  # one of SKETCH_MODES
+        self.precision = precision
+        self.customers = customers  # customer ids in code order
+
+    @classmethod
+    def build(cls, transactions_df, mode=None, precision=None, customers=None):
+        # mode/precision default to what the budget allows for the batch;
+        # appended batches are built with the mode, precision and customers of
+        # the partials they merge into
+        frame = (
+            transactions_df.lazy()
+            .group_by(PARTITION_KEYS)
+            .agg(
+                pl.col("amount").sum().alias("amount"),
+                pl.len().cast(pl.Int64).alias("orders"),
+                pl.col("amount").filter(pl.col("status") == "completed").sum().alias("completed_amount"),
+                (pl.col("status") == "completed").sum().cast(pl.Int64).alias("completed_orders"),
+                pl.col("amount").filter(pl.col("status") == "refunded").sum().alias("refunded_amount"),
+            )
+            .sort(PARTITION_KEYS)
+            .collect()
+        )
+        partition, codes, customers = _partition_codes(frame, transactions_df, customers)
+        keys = _pairs(partition, codes)
+        budget = budget_for(transactions_df.height)
+        if mode is None:
+            mode, precision = _plan(frame.height, len(customers), len(keys), budget)
+        if mode == "hll" and precision is None:
+            precision = _plan(frame.height, math.inf, math.inf, budget)[1]
+
+        if mode == "sets":
+            sketches = _sets(frame.height, keys)
+        else:
+            sketches = _allocate(mode, precision, frame.height, len(customers))
+            _fill(sketches, mode, precision, partition, codes)
+        return cls(frame, sketches, mode, precision, customers)
+
+    @classmethod
+    def from_cube(cls, cube, batches, customers, budget=SKETCH_BUDGET):
+        # For transactions too large to hold at once (out-of-core mode): the
+        # sums come from the cube's cells, and the sketches, planned from its
+        # partitions, its row count and the distinct customer ids, are filled
+        # from the transactions one batch at a time
+        completed = pl.col("status") == "completed"
+        frame = (
+            cube.lazy()
+            .group_by(PARTITION_KEYS)
+            .agg(
+                pl.col("amount").sum().alias("amount"),
+                pl.col("orders").sum().cast(pl.Int64).alias("orders"),
+                pl.col("amount").filter(completed).sum().alias("completed_amount"),
+                pl.col("orders").filter(completed).sum().cast(pl.Int64).alias("completed_orders"),
+                pl.col("amount").filter(pl.col("status") == "refunded").sum().alias("refunded_amount"),
+            )
+            .sort(PARTITION_KEYS)
+            .collect()
+        )
+        rows = int(frame["orders"].sum())
+        # every transaction is at most one new (partition, customer) pair
+        mode, precision = _plan(frame.height, len(customers), rows, budget_for(rows, budget))
+        if mode == "sets":
+            keys = [_pairs(*_partition_codes(frame, batch, customers)[:2]) for batch in batches]
+            sketches = _sets(frame.height, np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.int64))
+        else:
+            sketches = _allocate(mode, precision, frame.height, len(customers))
+            for batch in batches:
+                _fill(sketches, mode, precision, *_partition_codes(frame, batch, customers)[:2])
+        return cls(frame, sketches, mode, precision, customers)
+
+    def cast(self, column, dtype):
+        return SummaryPartials(self.frame.with_columns(pl.col(column).cast(dtype)), self.sketches, self.mode, self.precision, self.customers)
+
+    def merge(self, other):
+        # partitions of both; the ones present in both are combined. other is
+        # built with customers=self.customers, so its codes extend these
+        rows = pl.concat([self.frame, other.frame.cast(self.frame.schema)])
+        frame = rows.group_by(PARTITION_KEYS).agg(pl.exclude(PARTITION_KEYS).sum()).sort(PARTITION_KEYS)
+        partition = (
+            rows.select(PARTITION_KEYS)
+            .join(frame.select(PARTITION_KEYS).with_row_index("partition"), on=PARTITION_KEYS, how="left", nulls_equal=True, maintain_order="left")
+            ["partition"].to_numpy().astype(np.int64)
+        )
+        customers = other.customers if len(other.customers) >= len(self.customers) else self.customers
+        if self.mode == "sets":
+            (mine, codes), (theirs, other_codes) = _set_pairs(self.sketches), _set_pairs(other.sketches)
+            keys = _pairs(np.concatenate([partition[mine], partition[self.frame.height + theirs]]), np.concatenate([codes, other_codes]))
+            return SummaryPartials(frame.select(self.frame.columns), _sets(frame.height, keys), self.mode, self.precision, customers)
+
+        width = max(self.sketches.shape[1], other.sketches.shape[1])
+        sketches = np.zeros((self.frame.height + other.frame.height, width), dtype=np.uint8)
+        sketches[:self.frame.height, :self.sketches.shape[1]] = self.sketches
+        sketches[self.frame.height:, :other.sketches.shape[1]] = other.sketches
+        merged = np.zeros((frame.height, width), dtype=np.uint8)
+        # union: bitwise or of bitmaps, element-wise max of HLL registers
+        (np.bitwise_or if self.mode == "bitmap" else np.maximum).at(merged, partition, sketches)
+        return SummaryPartials(frame.select(self.frame.columns), merged, self.mode, self.precision, customers)
+
+    def select(self, filters):
+        # row numbers of the partitions matching the filters; dates by binary search
+        dates = self.frame["date"]
+        first = dates.search_sorted(filters["start_date"], side="left")
+        last = dates.search_sorted(filters["end_date"], side="right")
+        predicate = (
+            (pl.col("region").is_in(filters["selected_regions"])) &
+            (pl.col("category").is_in(filters["selected_categories"]))
+        )
+        if filters["selected_segment"] != "All":
+            predicate = predicate & (pl.col("segment") == filters["selected_segment"])
+        return (
+            self.frame.with_row_index("partition")
+            .slice(first, max(last - first, 0))
+            .filter(predicate)
+        )
+
+    def count_customers(self, partitions):
+        if partitions.is_empty():
+            return 0
+        index = partitions["partition"].to_numpy()
+        # a contiguous run of partitions (all dimension values selected) is a view, not a copy
+        contiguous = index[-1] - index[0] + 1 == len(index)
+        if self.mode == "sets":
+            offsets, codes = self.sketches
+            if contiguous:
+                selected = codes[offsets[index[0]]:offsets[index[-1] + 1]]
+            else:
+                starts, lengths = offsets[index], offsets[index + 1] - offsets[index]
+                # positions of every selected entry: each run's start, then 0, 1, ... within it
+                selected = codes[np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())]
+            seen = np.zeros(len(self.customers), dtype=bool)
+            seen[selected] = True
+            return int(np.count_nonzero(seen))
+        rows = self.sketches[index[0]:index[-1] + 1] if contiguous else self.sketches[index]
+        if self.mode == "bitmap":
+            return int(np.bitwise_count(np.bitwise_or.reduce(rows, axis=0)).sum())
+        return _hll_estimate(np.maximum.reduce(rows, axis=0))
+
+    def compare(self, filters, daily_metrics_df):
+        # {period: (start, end, Summary)} for the periods of comparison_periods,
+        # from one aggregation over their partitions. Unlike summary(), the
+        # conversion rate is averaged over each period's days so the periods
+        # compare like for like.
+        periods = comparison_periods(filters["start_date"], filters["end_date"])
+        # the periods may overlap (ranges over a year), so each gets its own copy of its partitions
+        selected = pl.concat([
+            self.select({**filters, "start_date": start, "end_date": end}).with_columns(pl.lit(name).alias("period"))
+            for name, (start, end) in periods.items()
+        ]).lazy()
+        completed = selected.filter(pl.col("completed_orders") > 0)
+        totals, regions, categories = pl.collect_all([
+            selected.group_by("period").agg(
+                pl.col("completed_amount", "completed_orders", "refunded_amount").sum(),
+                pl.col("partition"),
+            ),
+            *[
+                completed.group_by("period", key).agg(pl.col("completed_amount").sum())
+                .sort("completed_amount", descending=True)
+                .group_by("period", maintain_order=True).first()
+                for key in ("region", "category")
+            ],
+        ])
+        totals = {row["period"]: row for row in totals.iter_rows(named=True)}
+        top_region = dict(zip(regions["period"], regions["region"]))
+        top_category = dict(zip(categories["period"], categories["category"]))
+
+        result = {}
+        for name, (start, end) in periods.items():
+            row = totals.get(name, {})
+            completed_revenue = row.get("completed_amount") or 0
+            completed_orders = row.get("completed_orders") or 0
+            days = daily_metrics_df.filter(pl.col("date").is_between(start, end))["conversionRate"]
+            result[name] = (start, end, Summary(
+                totalRevenue=completed_revenue,
+                averageOrderValue=completed_revenue / completed_orders if completed_orders else 0,
+                conversionRate=days.mean() if not days.is_empty() else 0,
+                totalCustomers=self.count_customers(pl.DataFrame({"partition": row.get("partition", [])})),
+                refundRate=((row.get("refunded_amount") or 0) / completed_revenue * 100) if completed_revenue > 0 else 0,
+                topRegion=top_region.get(name, "N/A"),
+                topCategory=top_category.get(name, "N/A"),
+            ))
+        return result
+
+    def summary(self, filters, daily_metrics_df):
+        # The dashboard's Summary (the only implementation), from the selected partitions only
+        partitions = self.select(filters)
+        completed = partitions.filter(pl.col("completed_orders") > 0)
+        completed_revenue = completed["completed_amount"].sum() if not completed.is_empty() else 0
+        completed_orders = completed["completed_orders"].sum()
+        refund_revenue = partitions["refunded_amount"].sum() if not partitions.is_empty() else 0
+
+        def top(key):
+            return completed.group_by(key).agg(pl.col("completed_amount").sum()).sort("completed_amount", descending=True)[key][0]
+
+        return Summary(
+            totalRevenue=completed_revenue,
+            averageOrderValue=completed_revenue / completed_orders if completed_orders else 0,
+            conversionRate=daily_metrics_df["conversionRate"].mean() if not daily_metrics_df.is_empty() else 0,
+            totalCustomers=self.count_customers(partitions),
+            refundRate=(refund_revenue / completed_revenue * 100) if completed_revenue > 0 else 0,
+            topRegion=top("region") if not completed.is_empty() else "N/A",
+            topCategory=top("category") if not completed.is_empty() else "N/A",
+        )
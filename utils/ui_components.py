@@ -1,86 +1,197 @@
 import datetime
-import plotly.express as px
+import json
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import streamlit as st
 import polars as pl
-import pandas as pd
 from dataclasses import asdict
+from utils.data_utils import PROFILE, RESULTS
+from utils.downsampling import BUCKET_LABELS, MAX_POINTS, downsample
+
+# timed on its own: converting to pandas for Plotly Express is a cost of its own
+@PROFILE.timed()
+def to_pandas(df):
+    return df.to_pandas()
+
+# "express" builds the charts with Plotly Express; "graph_objects" builds the
+# same charts from plain traces over numpy arrays, skipping Express' data frame
+# handling and the pandas conversion. Plotly and pandas are imported on first
+# use, so a worker starts without them (and without Express and pandas at all
+# with graph_objects)
+CHART_ENGINES = ("express", "graph_objects")
+CHART_ENGINE = os.environ.get("KPI_CHART_ENGINE", "express")
+_FIGURE_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix="chart-figures")
 
 class KPICards:
-    @staticmethod
-    def render_card(label, value, delta=None, help_text=None):
-        st.metric(label=label, value=value, delta=delta, help=help_text)
+    PERIOD_LABELS = {"previous": "Previous period", "last_year": "Same period last year"}
 
-    def display(self, summary, trend_label):
-        c1, c2, c3, c4 = st.columns(4)
-        
-        with c1:
-            self.render_card("Total Revenue", f"${summary.totalRevenue:,.0f}", delta=trend_label)
-        
-        with c2:
-            self.render_card("Avg Order Value", f"${summary.averageOrderValue:.2f}")
+    # delta of a period that cannot be compared, e.g. one before the first day of data
+    NO_DELTA = "n/a"
+
+    @staticmethod
+    def render_card(label, value, delta=None, help_text=None, delta_color="normal"):
+        arrow = "off" if delta == KPICards.NO_DELTA else "auto"
+        st.metric(label=label, value=value, delta=delta, help=help_text, delta_color=delta_color, delta_arrow=arrow)
 
-        with c3:
-            self.render_card("Top Region", summary.topRegion)
+    @classmethod
+    def compare(cls, comparison, field):
+        # (change against the previous period, help text listing both comparisons)
+        current = getattr(comparison["current"][2], field)
+        deltas, notes = {}, []
+        for name, label in cls.PERIOD_LABELS.items():
+            start, end, summary = comparison[name]
+            before = getattr(summary, field)
+            if isinstance(current, str):
+                # no completed order in the period: no top region/category to compare with
+                deltas[name] = cls.NO_DELTA if before == "N/A" else f"was {before}" if before != current else None
+                note = "no data" if before == "N/A" else "same" if before == current else before
+            else:
+                deltas[name] = f"{(current - before) / before * 100:+.1f}%" if before else cls.NO_DELTA
+                note = "no data" if deltas[name] == cls.NO_DELTA else deltas[name]
+            notes.append(f"{label} ({start:%Y-%m-%d} to {end:%Y-%m-%d}): {note}")
+        return deltas["previous"], "  \n".join(notes)
 
-        with c4:
-            self.render_card("Top Category", summary.topCategory)
+    def display(self, summary, trend_label=None, comparison=None):
+        # with a comparison (SummaryPartials.compare) every card shows its change
+        # against the previous period; without one revenue shows trend_label
+        cards = [
+            ("Total Revenue", f"${summary.totalRevenue:,.0f}", "totalRevenue"),
+            ("Avg Order Value", f"${summary.averageOrderValue:.2f}", "averageOrderValue"),
+            ("Top Region", summary.topRegion, "topRegion"),
+            ("Top Category", summary.topCategory, "topCategory"),
+        ]
+        for column, (label, value, field) in zip(st.columns(len(cards)), cards):
+            with column:
+                if comparison is not None:
+                    delta, help_text = self.compare(comparison, field)
+                    # a changed top region/category is neither good nor bad
+                    good_or_bad = field in ("totalRevenue", "averageOrderValue") and delta != self.NO_DELTA
+                    self.render_card(label, value, delta, help_text, "normal" if good_or_bad else "off")
+                else:
+                    self.render_card(label, value, delta=trend_label if field == "totalRevenue" else None)
 
 class ChartComponents:
+    def __init__(self, max_points=MAX_POINTS, engine=CHART_ENGINE):
+        if engine not in CHART_ENGINES:
+            raise ValueError(f"Unknown chart engine '{engine}', expected one of {CHART_ENGINES}")
+        self.max_points = max_points
+        self.engine = engine
+
     @staticmethod
-    def line_ch(data, **kw):
-        if data.is_empty(): return None
-        trend = data.group_by("date").agg(pl.col("amount").sum()).sort("date")
-        return px.line(trend.to_pandas(), x="date", y="amount", title=kw.get("title"))
+    def aggregate(data):
+        # inputs of all three charts from one collect_all; Polars runs the
+        # group_bys in parallel over a shared scan of data
+        lf = data.lazy()
+        trend, categories, regions = pl.collect_all([
+            lf.group_by("date").agg(pl.col("amount").sum()).sort("date"),
+            lf.group_by("category").agg(pl.col("amount").sum()),
+            lf.group_by("region").agg(pl.col("amount").sum()).sort("amount", descending=True),
+        ])
+        return {"trend": trend, "category": categories, "region": regions}
 
     @staticmethod
-    def pie_ch(data, **kw):
-        if data.is_empty(): return None
-        cat_data = data.group_by("category").agg(pl.col("amount").sum())
-        return px.pie(cat_data.to_pandas(), values="amount", names="category", hole=0.4, title=kw.get("title"))
+    def line_figure(trend, title=None, max_points=MAX_POINTS, engine="express"):
+        trend, bucket = downsample(trend, "date", "amount", max_points)
+        title = title if bucket == "1d" else f"{title} ({BUCKET_LABELS[bucket]})"
+        if engine == "graph_objects":
+            import plotly.graph_objects as go
+            fig = go.Figure(go.Scatter(x=trend["date"].to_numpy(), y=trend["amount"].to_numpy(), mode="lines"))
+            return fig.update_layout(title=title, xaxis_title="date", yaxis_title="amount")
+        import plotly.express as px
+        return px.line(to_pandas(trend), x="date", y="amount", title=title)
 
     @staticmethod
-    def bar_ch(data, **kw):
-        if data.is_empty(): return None
-        reg_df = (
-            data.group_by("region")
-            .agg(pl.col("amount").sum())
-            .sort("amount", descending=True)
-        )
+    def pie_figure(cat_data, title=None, engine="express"):
+        if engine == "graph_objects":
+            import plotly.graph_objects as go
+            fig = go.Figure(go.Pie(values=cat_data["amount"].to_numpy(), labels=cat_data["category"].to_list(), hole=0.4))
+            return fig.update_layout(title=title)
+        import plotly.express as px
+        return px.pie(to_pandas(cat_data), values="amount", names="category", hole=0.4, title=title)
+
+    @staticmethod
+    def bar_figure(reg_df, title=None, engine="express"):
+        if engine == "graph_objects":
+            import plotly.graph_objects as go
+            from plotly.colors import qualitative
+            # one trace per region, as Express does for color="region"
+            colors = qualitative.Plotly
+            fig = go.Figure([
+                go.Bar(x=[region], y=[amount], name=region, marker_color=colors[i % len(colors)], texttemplate="%{y:.2s}")
+                for i, (region, amount) in enumerate(reg_df.select("region", "amount").iter_rows())
+            ])
+            return fig.update_layout(title=title, xaxis_title="region", yaxis_title="amount", legend_title="region")
+        import plotly.express as px
         return px.bar(
-            reg_df.to_pandas(), 
+            to_pandas(reg_df), 
             x="region", 
             y="amount", 
-            title=kw.get("title"),
+            title=title,
             color="region",
             text_auto='.2s'
         )
+
+    @staticmethod
+    def _timed_figure(figure_func, part, title, *args):
+        # runs on the pool, so chart_figure (and to_pandas within it) is the build itself
+        with PROFILE.stage("chart_figure", chart=title, rows=part.height):
+            return figure_func(part, title, *args)
+
+    def _submit(self, figure_func, part, title, *args):
+        # the stages go to the caller's run rather than to the pool thread's (none)
+        return _FIGURE_POOL.submit(PROFILE.in_run(self._timed_figure), figure_func, part, title, *args)
+
+    def submit_figures(self, data):
+        # One aggregation pass, then the three figures are built on a thread
+        # pool while the page lays out; Polars and the pandas conversion release
+        # the GIL. Returns {title: Future of the figure, None without data}
+        titles = ["Revenue Trend", "Category Share", "Regional Performance"]
+        if data.is_empty():
+            empty = Future()
+            empty.set_result(None)
+            return dict.fromkeys(titles, empty)
+        with PROFILE.stage("chart_aggregate", rows=data.height):
+            parts = self.aggregate(data)
+        return dict(zip(titles, [
+            self._submit(self.line_figure, parts["trend"], titles[0], self.max_points, self.engine),
+            self._submit(self.pie_figure, parts["category"], titles[1], self.engine),
+            self._submit(self.bar_figure, parts["region"], titles[2], self.engine),
+        ]))
+
+    def build_figures(self, data):
+        return {title: future.result() for title, future in self.submit_figures(data).items()}
     
     @staticmethod
-    def wrapper(figure_func, *args, **kwargs):
-        title = kwargs.get("title", "Chart")
+    def wrapper(figure, title="Chart"):
+        # figure: a Plotly figure, a Future of one (submit_figures) or None
         st.subheader(title)
 
         placeholder = st.empty()
         placeholder.info(f"Loading {title}...")
 
         try:
-            fig = figure_func(*args, **kwargs)
+            fig = figure.result() if isinstance(figure, Future) else figure
             if fig is None: 
                 placeholder.warning(f"No data for {title}")
             else: 
-                placeholder.plotly_chart(fig, use_container_width=True)
+                # serializes the figure to JSON for the browser
+                with PROFILE.stage("chart_render", chart=title):
+                    placeholder.plotly_chart(fig, use_container_width=True)
         except Exception as e:
             st.error(f"Error rendering {title}: {e}")
 
     def display_grid(self, df):
-            self.wrapper(self.line_ch, df, title="Revenue Trend")
+            figures = self.submit_figures(df)
+            self.wrapper(figures["Revenue Trend"], title="Revenue Trend")
             st.markdown("---")
 
             col_l, col_r = st.columns(2)
             with col_l:
-                self.wrapper(self.pie_ch, df, title="Category Share")
+                self.wrapper(figures["Category Share"], title="Category Share")
             with col_r:
-                self.wrapper(self.bar_ch, df, title="Regional Performance")
+                self.wrapper(figures["Regional Performance"], title="Regional Performance")
 
 class FilterPanel:
     def __init__(self, dm):
@@ -141,6 +252,9 @@ class FilterPanel:
         }
 
 class Tables:
+    # Largest window ever sent to the browser; full results are offered as downloads
+    PAGE_SIZES = [20, 50, 100, 500]
+
     @staticmethod
     def render(df, summary, filtered_daily_metrics):
         t1, t2, t3 = st.tabs(["Summary", "Transactions", "Daily Metrics"])
@@ -170,6 +284,7 @@ class Tables:
 
                 formatted_data.append({"Metric": label, "Value": display_value})
 
+            import pandas as pd
             st.table(pd.DataFrame(formatted_data))
 
         with t2:
@@ -181,33 +296,159 @@ class Tables:
             Tables._render_paged_table(filtered_daily_metrics, "daily_metrics")
 
     @staticmethod
-    def _render_paged_table(data_df, key_prefix):
-        total_rows = len(data_df)
-        
-        if total_rows > 0:
-            col_size, col_page, col_info = st.columns([1, 1, 2])
-            
-            with col_size:
-                size_options = [20, 50, 100, "Unlimited"]
-                selected_size = st.selectbox("Rows per page", options=size_options, index=0, key=f"{key_prefix}_size")
-
-            if selected_size == "Unlimited":
-                if total_rows > 10000:
-                    st.warning("Large dataset: Showing all rows might slow down your browser.")
-                display_df = data_df
+    def _search_predicate(schema, column, term):
+        columns = list(schema.names()) if column == "All columns" else [column]
+        term = term.lower()
+        return pl.any_horizontal(
+            pl.col(name).cast(pl.String).str.to_lowercase().str.contains(term, literal=True)
+            for name in columns
+        )
+
+    @staticmethod
+    def _query(data, term, search_in, sort_by, descending):
+        query = data.lazy()
+        if term:
+            query = query.filter(Tables._search_predicate(query.collect_schema(), search_in, term))
+        if sort_by != "(none)":
+            query = query.sort(sort_by, descending=descending, maintain_order=True)
+        return query
+
+    # Row counts and pages are cached on the fingerprint of the filter query
+    # (or of the cached daily metrics), so paging back or rerunning with the
+    # same filters does not scan again
+    @staticmethod
+    @RESULTS.memoize
+    def _count(data, term, search_in):
+        return Tables._query(data, term, search_in, "(none)", False).select(pl.len()).collect().item()
+
+    @staticmethod
+    @RESULTS.memoize
+    def _page(data, term, search_in, sort_by, descending, offset, length):
+        return Tables._query(data, term, search_in, sort_by, descending).slice(offset, length).collect()
+
+    @staticmethod
+    def _export_bytes(query, suffix):
+        # Polars' streaming sinks write the file without building the full frame first
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            if suffix == ".csv":
+                query.sink_csv(path)
             else:
-                page_size = int(selected_size)
-                total_pages = max(1, (total_rows - 1) // page_size + 1)
-                
-                with col_page:
-                    current_page = st.number_input(f"Page (1-{total_pages})", min_value=1, max_value=total_pages, value=1, key=f"{key_prefix}_page")
-                
-                start_idx = (current_page - 1) * page_size
-                display_df = data_df.slice(start_idx, page_size)
-                
-                with col_info:
-                    st.write(f"Showing {start_idx + 1} to {min(start_idx + page_size, total_rows)} of {total_rows}")
-
-            st.dataframe(display_df.to_pandas(), use_container_width=True, height=500)
-        else:
-            st.warning("No data available for the current filters.")
\ No newline at end of file
+                query.sink_parquet(path)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.unlink(path)
+
+    # Runs as a fragment: paging, sorting and searching rerun only this table,
+    # not the filters, KPIs and charts. Only the visible window is collected.
+    # Rerunning on its own it is profiled as a run of its own, kept for the
+    # panel with the session's runs.
+    @staticmethod
+    @st.fragment
+    def _render_paged_table(data, key_prefix):
+        standalone = PROFILE.enabled and not PROFILE.running
+        if standalone:
+            PROFILE.start_run(fragment=key_prefix)
+        try:
+            Tables._paged_table(data, key_prefix)
+        finally:
+            if standalone:
+                run = PROFILE.finish_run()
+                ProfilePanel.keep(PROFILE, run)
+                st.caption(f"Table rerun: {run['seconds']:.3f}s")
+
+    @staticmethod
+    @PROFILE.timed("table")
+    def _paged_table(data, key_prefix):
+        schema = data.lazy().collect_schema()
+
+        col_search, col_in, col_sort, col_order = st.columns([2, 1, 1, 1])
+        with col_search:
+            term = st.text_input("Search", key=f"{key_prefix}_search")
+        with col_in:
+            search_in = st.selectbox("In", ["All columns"] + schema.names(), key=f"{key_prefix}_search_in")
+        with col_sort:
+            sort_by = st.selectbox("Sort by", ["(none)"] + schema.names(), key=f"{key_prefix}_sort")
+        with col_order:
+            descending = st.radio("Order", ["Asc", "Desc"], horizontal=True, key=f"{key_prefix}_order") == "Desc"
+
+        query = Tables._query(data, term, search_in, sort_by, descending)
+        total_rows = Tables._count(data, term, search_in)
+        PROFILE.annotate(table=key_prefix, rows=total_rows)
+        if total_rows == 0:
+            st.warning("No data available for the current filters.")
+            return
+
+        col_size, col_page, col_info = st.columns([1, 1, 2])
+        with col_size:
+            page_size = st.selectbox("Rows per page", options=Tables.PAGE_SIZES, index=0, key=f"{key_prefix}_size")
+
+        total_pages = max(1, (total_rows - 1) // page_size + 1)
+        page_key = f"{key_prefix}_page"
+        # keep the page in range when a search shrinks the result
+        st.session_state[page_key] = min(st.session_state.get(page_key, 1), total_pages)
+        with col_page:
+            current_page = st.number_input(f"Page (1-{total_pages})", min_value=1, max_value=total_pages, key=page_key)
+
+        start_idx = (current_page - 1) * page_size
+        with col_info:
+            st.write(f"Showing {start_idx + 1} to {min(start_idx + page_size, total_rows)} of {total_rows}")
+
+        # Polars frames go to the browser through Arrow, no pandas round trip
+        st.dataframe(Tables._page(data, term, search_in, sort_by, descending, start_idx, page_size), use_container_width=True, height=500)
+
+        col_csv, col_parquet, _ = st.columns([1, 1, 2])
+        with col_csv:
+            st.download_button(
+                "Download CSV", data=lambda: Tables._export_bytes(query, ".csv"),
+                file_name=f"{key_prefix}.csv", mime="text/csv", on_click="ignore", key=f"{key_prefix}_csv"
+            )
+        with col_parquet:
+            st.download_button(
+                "Download Parquet", data=lambda: Tables._export_bytes(query, ".parquet"),
+                file_name=f"{key_prefix}.parquet", mime="application/octet-stream", on_click="ignore", key=f"{key_prefix}_parquet"
+            )
+
+class ProfilePanel:
+    # Debug panel with the stage timings of this session's last rerun
+    # (KPI_PROFILE=1). The profiler is shared by every session, so the panel
+    # keeps the runs it is given in the session state rather than reading the
+    # profiler's latest run, which may be another session's. Table fragments
+    # rerunning on their own cannot redraw the sidebar: their runs are listed
+    # on the next full rerun.
+    @staticmethod
+    def keep(profile, run):
+        runs = st.session_state.setdefault("profile_runs", deque(maxlen=profile.runs.maxlen))
+        runs.append(run)
+        return runs
+
+    @staticmethod
+    def render(profile, run):
+        if run is None:
+            return
+        fragments = []
+        for past in reversed(st.session_state.get("profile_runs", ())):
+            if "fragment" not in past:
+                break
+            fragments.insert(0, past)
+        runs = ProfilePanel.keep(profile, run)
+        with st.sidebar.expander(f"Performance: {run['seconds']:.3f}s", expanded=False):
+            stages = pl.DataFrame(run["stages"], infer_schema_length=None)
+            st.dataframe(stages.drop("run"), use_container_width=True, hide_index=True)
+            if fragments:
+                st.caption("Table reruns since the previous full rerun")
+                stages = pl.DataFrame([stage for past in fragments for stage in past["stages"]], infer_schema_length=None)
+                st.dataframe(stages, use_container_width=True, hide_index=True)
+            if profile.cache is not None:
+                stats = profile.cache.stats()
+                st.caption(
+                    f"Result cache: {stats['hits']:,} hits, {stats['misses']:,} misses, "
+                    f"{stats['entries']:,} entries, {stats['bytes'] / 1024 / 1024:.1f} MB"
+                )
+            st.download_button(
+                "Download runs (JSON lines)",
+                data="".join(json.dumps(stage, default=str) + "\n" for past in runs for stage in past["stages"]),
+                file_name="profile.jsonl", mime="application/json", key="profile_download"
+            )
@@ -0,0 +1,107 @@
+import dataclasses
+import time
+import typing
+import polars as pl
+from models import Transaction
+
+# Columnar validation of parsed rows, derived from the dataclasses in models.py:
+# every field must be present with its type (the loaders read leniently, so a
+# mistyped value arrives as null), dates and timestamps must parse, and
+# dimension values must be listed in the Filters block. The checks are
+# expressions evaluated in one pass over the frame; only the failing rows are
+# labelled with the checks they failed, and go to a quarantine frame.
+NUMBERS = {float: pl.Float64, int: pl.Int64}
+FORMATS = {"date": "%Y-%m-%d", "timestamp": "%Y-%m-%dT%H:%M:%SZ"}
+# field path -> Filters attribute listing its allowed values
+ALLOWED = {"category": "availableCategories", "region": "availableRegions", "customer.segment": "availableSegments"}
+VALIDATION_MODES = ("quarantine", "report", "off")
+EXAMPLES = 5
+
+
+def _fields(model, schema, prefix="", expr=None):
+    # (path, expression, type, dtype in schema) of every leaf field; nested
+    # dataclasses are struct columns
+    hints = typing.get_type_hints(model)
+    for field in dataclasses.fields(model):
+        path = f"{prefix}{field.name}"
+        column = pl.col(field.name) if expr is None else expr.struct.field(field.name)
+        dtype = schema.get(field.name)
+        if dataclasses.is_dataclass(hints[field.name]):
+            nested = {item.name: item.dtype for item in dtype.fields} if isinstance(dtype, pl.Struct) else {}
+            yield from _fields(hints[field.name], nested, f"{path}.", column)
+        else:
+            yield path, column, hints[field.name], dtype
+
+
+def checks(filters_config, schema, model=Transaction):
+    # {check name: expression that is true for valid rows}; without a
+    # filters_config dimension values are not checked
+    result = {}
+    for path, column, kind, dtype in _fields(model, dict(schema)):
+        if dtype is None:
+            result[f"{path}:missing"] = pl.lit(False)
+            continue
+        if kind in NUMBERS:
+            # a mistyped value an inferring loader kept as text fails the cast
+            column = column.cast(NUMBERS[kind], strict=False)
+        ok = column.is_not_null()
+        if kind is float:
+            ok = ok & column.is_finite()
+        if path in FORMATS and dtype == pl.String:
+            # (date columns are parsed by the loaders; bad text is already null)
+            ok = ok & column.str.strptime(pl.Datetime, FORMATS[path], strict=False).is_not_null()
+        result[f"{path}:type"] = ok
+        if path in ALLOWED and filters_config is not None:
+            # compared in the column's own type, so categoricals compare codes
+            allowed = pl.Series(getattr(filters_config, ALLOWED[path]), dtype=pl.String).cast(dtype)
+            result[f"{path}:allowed"] = column.is_in(allowed.implode()).fill_null(True)
+    return result
+
+
+def validate(df, filters_config, model=Transaction, id_column="id"):
+    # Returns (valid rows, failing rows with an "errors" list column, report)
+    started = time.perf_counter()
+    rules = checks(filters_config, df.schema, model)
+    bad = df.select(~pl.all_horizontal(*rules.values())).to_series()
+    if bad.any():
+        valid = df.filter(~bad)
+        quarantine = df.filter(bad).with_columns(
+            pl.concat_list([pl.when(~ok).then(pl.lit(name)) for name, ok in rules.items()]).list.drop_nulls().alias("errors")
+        )
+    else:
+        valid = df
+        quarantine = df.clear().with_columns(pl.lit(None, dtype=pl.List(pl.String)).alias("errors"))
+
+    example = pl.col(id_column).cast(pl.String) if id_column in df.columns else pl.lit(None, dtype=pl.String)
+    errors = (
+        quarantine.select(example.alias("example"), "errors")
+        .explode("errors")
+        .group_by("errors")
+        .agg(pl.len().alias("count"), pl.col("example").head(EXAMPLES))
+        .sort("count", "errors", descending=[True, False])
+    )
+    seconds = time.perf_counter() - started
+    return valid, quarantine, {
+        "rows": df.height,
+        "valid": valid.height,
+        "quarantined": quarantine.height,
+        "errors": dict(zip(errors["errors"], errors["count"])),
+        "examples": dict(zip(errors["errors"], errors["example"].to_list())),
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(df.height / seconds) if seconds else None,
+    }
+
+
+def merge_reports(reports):
+    # one report for several validated frames (e.g. the partitions of a dataset directory)
+    merged = {"rows": 0, "valid": 0, "quarantined": 0, "errors": {}, "examples": {}, "seconds": 0.0}
+    for report in reports:
+        for key in ("rows", "valid", "quarantined", "seconds"):
+            merged[key] += report[key]
+        for name, count in report["errors"].items():
+            merged["errors"][name] = merged["errors"].get(name, 0) + count
+            merged["examples"][name] = (merged["examples"].get(name, []) + report["examples"].get(name, []))[:EXAMPLES]
+    merged["errors"] = dict(sorted(merged["errors"].items(), key=lambda item: (-item[1], item[0])))
+    merged["seconds"] = round(merged["seconds"], 4)
+    merged["rows_per_second"] = round(merged["rows"] / merged["seconds"]) if merged["seconds"] else None
+    return merged